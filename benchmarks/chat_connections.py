@@ -0,0 +1,82 @@
+"""Memory and CPU cost per channel of AsyncTrovoChat on one event loop.
+
+The stub chat server runs in the same process, so CPU figures include the
+server side of every frame and are best compared between runs.
+
+    python -m benchmarks.chat_connections [channels] [frames_per_channel]
+"""
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+
+import aiohttp
+
+from benchmarks.stub_api import StubAPIServer
+from benchmarks.stub_chat import StubChatServer, chat_frame
+from trovo.chat.async_chat_client import AsyncTrovoChat
+from trovo.client import async_trovo_client
+from trovo.client.async_trovo_client import AsyncTrovoClient
+
+
+async def main(channels: int = 200, frames: int = 50):
+    connected = asyncio.Event()
+    received = 0
+
+    async def push_frames(ws):
+        if len(server.connections) == channels:
+            connected.set()
+        await connected.wait()
+        for index in range(frames):
+            await ws.send_str(json.dumps(chat_frame(0, index)))
+
+    class CountingHandler:
+        def handle(self, message):
+            nonlocal received
+            received += 1
+
+    routes = {"/chat/channel-token": lambda path, data: {"token": "token"}}
+    with StubAPIServer(routes) as api:
+        api.patch(async_trovo_client)
+        async with StubChatServer(push_frames) as server:
+            trovo = AsyncTrovoClient("client-id")
+            ws_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            cpu = time.process_time()
+            chats = [
+                AsyncTrovoChat(
+                    trovo,
+                    channel_id,
+                    CountingHandler(),
+                    url=server.url,
+                    ws_session=ws_session,
+                )
+                for channel_id in range(channels)
+            ]
+            tasks = [asyncio.create_task(chat.run_forever()) for chat in chats]
+            await connected.wait()
+            connect_cpu = time.process_time() - cpu
+            memory = tracemalloc.get_traced_memory()[0] - baseline
+
+            cpu = time.process_time()
+            while received < channels * frames:
+                await asyncio.sleep(0.01)
+            message_cpu = time.process_time() - cpu
+            tracemalloc.stop()
+
+            for chat in chats:
+                await chat.close()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await ws_session.close()
+            await trovo.close()
+
+    print(f"channels          {channels}")
+    print(f"memory/channel    {memory / channels / 1024:.1f} KiB")
+    print(f"connect cpu/chan  {connect_cpu / channels * 1000:.2f} ms")
+    print(f"cpu/message       {message_cpu / (channels * frames) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*map(int, sys.argv[1:])))
@@ -0,0 +1,98 @@
+"""Write throughput and lookup latency of the chat log.
+
+    python -m benchmarks.chat_log [messages] [users]
+
+Writes ``messages`` chats through ChatLogWriter with group commit, then
+a few thousand with an fsync per message (flush after every append) for
+comparison. Then it times "last 20 messages of a user" through
+ChatLogReader against a scan that decodes every record.
+"""
+import random
+import sys
+import tempfile
+import time
+
+from trovo.chat.chat_log import ChatLogReader, ChatLogWriter, decode, list_segments
+from trovo.chat.chat_log import segment_path
+from trovo.chat.message import ChatMessage
+
+
+def chat(i: int, users: int, rng: random.Random) -> ChatMessage:
+    uid = int(rng.paretovariate(1.2)) % users
+    return ChatMessage(
+        100 + i % 10,
+        f"msg{i}",
+        0,
+        uid,
+        uid,
+        f"user{uid}",
+        f"viewer{uid}",
+        f"message number {i} in the chat",
+        1_690_000_000 + i // 50,
+        ["follower"],
+    )
+
+
+def scan_last_from_user(directory: str, uid: int, n: int):
+    found = []
+    for number in list_segments(directory):
+        with open(segment_path(directory, number), "rb") as f:
+            for line in f:
+                message = decode(line)
+                if message.uid == uid:
+                    found.append(message)
+    return found[-n:][::-1]
+
+
+def main(messages: int = 500_000, users: int = 5_000):
+    rng = random.Random(0)
+    corpus = [chat(i, users, rng) for i in range(messages)]
+    with tempfile.TemporaryDirectory() as directory:
+        writer = ChatLogWriter(directory, segment_size=16 * 1024 * 1024)
+        start = time.perf_counter()
+        for message in corpus:
+            writer.append(message)
+        writer.flush()
+        elapsed = time.perf_counter() - start
+        writer.close()
+        print(f"group commit        {messages / elapsed:>10.0f} msgs/s")
+
+        with tempfile.TemporaryDirectory() as other:
+            writer = ChatLogWriter(other, commit_interval=0)
+            count = min(messages, 2_000)
+            start = time.perf_counter()
+            for message in corpus[:count]:
+                writer.append(message)
+                writer.flush()
+            elapsed = time.perf_counter() - start
+            writer.close()
+            print(f"fsync per message   {count / elapsed:>10.0f} msgs/s")
+
+        uids = [rng.randrange(users) for _ in range(20)]
+        start = time.perf_counter()
+        with ChatLogReader(directory) as reader:
+            opened = time.perf_counter() - start
+            start = time.perf_counter()
+            indexed = [reader.last_from_user(uid, 20) for uid in uids]
+            first = (time.perf_counter() - start) / len(uids)
+            start = time.perf_counter()
+            for uid in uids:
+                reader.last_from_user(uid, 20)
+            warm = (time.perf_counter() - start) / len(uids)
+        print(
+            f"reader open         {opened * 1000:>10.2f} ms "
+            f"({len(list_segments(directory))} segments)"
+        )
+        print(f"last 20, first      {first * 1000:>10.2f} ms/query (builds indexes)")
+        print(f"last 20, indexed    {warm * 1000:>10.3f} ms/query")
+        start = time.perf_counter()
+        scanned = [scan_last_from_user(directory, uid, 20) for uid in uids[:3]]
+        scan = (time.perf_counter() - start) / 3
+        print(f"last 20, full scan  {scan * 1000:>10.2f} ms/query")
+        assert [[m.message_id for m in r] for r in scanned] == [
+            [m.message_id for m in r] for r in indexed[:3]
+        ]
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,54 @@
+"""Cost of TrovoChat.on_message instrumentation per frame.
+
+    python -m benchmarks.chat_metrics [frames]
+
+Compares the old handler (print every raw frame, then parse) with the
+instrumented one reporting to the no-op Metrics and to InMemoryMetrics,
+and prints the Prometheus text produced by the last run.
+"""
+import contextlib
+import os
+import sys
+import time
+
+from benchmarks.frame_parser import build_corpus
+from trovo.chat.chat_client import TrovoChat
+from trovo.metrics import InMemoryMetrics, Metrics, to_prometheus
+
+
+def legacy_on_message(chat: TrovoChat, message: str):
+    print(message)
+    try:
+        chat.pipeline.process(message)
+    except Exception:
+        pass
+
+
+def bench(name, on_message, corpus):
+    start = time.perf_counter()
+    for raw_message in corpus:
+        on_message(None, raw_message)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {len(corpus) / elapsed:>10.0f} frames/s", file=sys.stderr)
+
+
+def main(frames: int = 50_000):
+    corpus = build_corpus(frames)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        chat = TrovoChat("client-id", "token", 100, metrics=Metrics())
+        bench(
+            "print + parse (before)",
+            lambda ws, message: legacy_on_message(chat, message),
+            corpus,
+        )
+        chat.replay_filter.clear()
+        bench("no-op Metrics", chat.on_message, corpus)
+
+        metrics = InMemoryMetrics()
+        chat = TrovoChat("client-id", "token", 100, metrics=metrics)
+        bench("InMemoryMetrics", chat.on_message, corpus)
+    sys.stderr.write(to_prometheus(metrics))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,258 @@
+"""End-to-end load test: replay chat frames into TrovoChat and time the replies.
+
+    python -m benchmarks.chat_replay [--frames N] [--rate FRAMES_PER_S]
+        [--commands FRACTION] [--chats-per-frame N] [--replay FILE]
+        [--max-p99 MS] [--min-throughput FRAMES_PER_S]
+
+A child process runs the stub chat server and the stub open-api: it
+sends the frames to the bot at ``--rate`` (0 = as fast as possible) and
+timestamps every ``!hello``/``!help`` reply the bot posts to
+``/chat/send``. The bot process runs TrovoChat unchanged (command
+router, executor, send queue) except that the send queue is not rate
+limited, so the reply latency measures the bot and not Trovo's limit.
+CPU and memory figures therefore belong to the bot alone.
+
+``--replay`` reads recorded frames, one raw frame per line; without it
+the frames are synthetic chats of which ``--commands`` are ``!hello``.
+With ``--max-p99``/``--min-throughput`` the exit status is 1 when the
+run misses the budget, so the script can gate a deploy.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import re
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+from benchmarks.stub_api import StubAPIServer, patch_endpoints
+from benchmarks.stub_chat import StubChatServer, chat_frame
+from trovo.chat.chat_client import TrovoChat
+from trovo.client import trovo_client
+from trovo.metrics import InMemoryMetrics
+
+CHANNEL_ID = 100
+COMMANDS = ("!hello", "!help")
+# Replies of CommandHandler.hello_command and help_command.
+REPLY_PATTERN = re.compile(r"@(.+)!$|shortly, (.+)$")
+
+
+def synthetic_frames(
+    frames: int, commands: float = 0.1, chats_per_frame: int = 1, seed: int = 0
+) -> List[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for frame_index in range(frames):
+        first = frame_index * chats_per_frame
+        frame = chat_frame(CHANNEL_ID, first)
+        frame["data"]["chats"] = [
+            chat_frame(
+                CHANNEL_ID,
+                index,
+                "!hello" if rng.random() < commands else "just chatting here",
+            )["data"]["chats"][0]
+            for index in range(first, first + chats_per_frame)
+        ]
+        corpus.append(json.dumps(frame))
+    return corpus
+
+
+def load_frames(path: str) -> List[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def command_senders(raw_frame: str) -> List[str]:
+    """Nick names of the chats of ``raw_frame`` that the bot answers."""
+    frame = json.loads(raw_frame)
+    if frame.get("type") != "CHAT":
+        return []
+    return [
+        chat.get("nick_name", "")
+        for chat in frame.get("data", {}).get("chats", [])
+        if chat.get("content", "").split(" ", 1)[0] in COMMANDS
+    ]
+
+
+def serve(conn, frames: List[str], rate: float, reply_timeout: float):
+    asyncio.run(_serve(conn, frames, rate, reply_timeout))
+
+
+async def _serve(conn, frames: List[str], rate: float, reply_timeout: float):
+    loop = asyncio.get_running_loop()
+    prepared: List[Tuple[str, List[str]]] = [
+        (raw_frame, command_senders(raw_frame)) for raw_frame in frames
+    ]
+    expected = sum(len(senders) for _, senders in prepared)
+    sent_at: Dict[str, Deque[float]] = {}
+    latencies: List[float] = []
+    replied = asyncio.Event()
+    sending = loop.create_future()
+    if not expected:
+        replied.set()
+
+    def record(name: str, received_at: float):
+        pending = sent_at.get(name)
+        if pending:
+            latencies.append(received_at - pending.popleft())
+            if len(latencies) == expected:
+                replied.set()
+
+    def on_reply(path: str, data: dict) -> dict:
+        # Runs on the HTTP server thread.
+        match = REPLY_PATTERN.search(data.get("content", ""))
+        if match is not None:
+            name = match.group(1) or match.group(2)
+            loop.call_soon_threadsafe(record, name, time.perf_counter())
+        return {}
+
+    async def replay(ws):
+        if sending.done():
+            return
+        start = time.perf_counter()
+        for index, (raw_frame, senders) in enumerate(prepared):
+            if rate:
+                delay = start + index / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            now = time.perf_counter()
+            for name in senders:
+                sent_at.setdefault(name, deque()).append(now)
+            await ws.send_str(raw_frame)
+        sending.set_result(time.perf_counter() - start)
+
+    routes = {
+        "/validate": lambda path, data: {
+            "uid": "1",
+            "client_id": "client-id",
+            "nick_name": "bot",
+            "scopes": [],
+            "expire_ts": int(time.time()) + 86400,
+        },
+        "/chat/channel-token": lambda path, data: {"token": "token"},
+        "/chat/send": on_reply,
+    }
+    with StubAPIServer(routes) as api:
+        async with StubChatServer(replay) as chat:
+            conn.send((api.url, chat.url))
+            send_seconds = await sending
+            try:
+                await asyncio.wait_for(replied.wait(), reply_timeout)
+            except asyncio.TimeoutError:
+                pass
+            conn.send(
+                {
+                    "send_seconds": send_seconds,
+                    "expected": expected,
+                    "latencies": latencies,
+                }
+            )
+            # Keep serving until the bot has been closed.
+            await loop.run_in_executor(None, conn.recv)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--frames", type=int, default=20_000)
+    parser.add_argument("--rate", type=float, default=2_000.0)
+    parser.add_argument("--commands", type=float, default=0.1)
+    parser.add_argument("--chats-per-frame", type=int, default=1)
+    parser.add_argument("--replay", help="file with one raw frame per line")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-p99", type=float, help="reply p99 budget in ms")
+    parser.add_argument("--min-throughput", type=float, help="frames/s budget")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        frames = load_frames(args.replay)
+    else:
+        frames = synthetic_frames(args.frames, args.commands, args.chats_per_frame)
+    chat_frames = sum(1 for raw_frame in frames if '"CHAT"' in raw_frame)
+
+    conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(
+        target=serve, args=(child_conn, frames, args.rate, args.timeout), daemon=True
+    )
+    server.start()
+    api_url, chat_url = conn.recv()
+    patch_endpoints(api_url, trovo_client)
+
+    metrics = InMemoryMetrics()
+    chat = TrovoChat("client-id", "token", CHANNEL_ID, url=chat_url, metrics=metrics)
+    chat.send_queue.rate = chat.send_queue.burst = 1e9
+    first_frame = []
+    on_message = chat.on_message
+
+    def timed_on_message(ws, message):
+        if not first_frame:
+            first_frame.append(time.perf_counter())
+        on_message(ws, message)
+
+    chat.on_message = timed_on_message
+
+    cpu = time.process_time()
+    thread = threading.Thread(target=chat.run_forever, daemon=True)
+    thread.start()
+    results = conn.recv()
+    deadline = time.monotonic() + args.timeout
+    while (
+        metrics.counter("chat_frames_total", type="CHAT") < chat_frames
+        and time.monotonic() < deadline
+    ):
+        time.sleep(0.001)
+    processed_at = time.perf_counter()
+    cpu = time.process_time() - cpu
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    processed = metrics.counter("chat_frames_total", type="CHAT")
+    executor_stats = chat.executor.stats.snapshot()
+    chat.close()
+    thread.join(args.timeout)
+    conn.send("stop")
+    server.join(args.timeout)
+
+    latencies = results["latencies"]
+    throughput = processed / (processed_at - first_frame[0]) if first_frame else 0.0
+    print(f"frames            {len(frames)} ({results['expected']} commands)")
+    print(
+        f"send rate         {len(frames) / results['send_seconds']:.0f} frames/s"
+        f" (target {args.rate:g}, 0 = unlimited)"
+    )
+    print(f"processed         {processed:.0f}/{chat_frames} chat frames")
+    print(f"throughput        {throughput:.0f} frames/s")
+    print(f"replies           {len(latencies)}/{results['expected']}")
+    print(f"commands rejected {executor_stats['rejected']}")
+    p99 = None
+    if latencies:
+        p99 = percentile(latencies, 0.99) * 1000
+        print(f"reply p50         {percentile(latencies, 0.5) * 1000:.2f} ms")
+        print(f"reply p99         {p99:.2f} ms")
+        print(f"reply max         {max(latencies) * 1000:.2f} ms")
+    print(
+        f"cpu               {cpu:.2f} s ({cpu / max(processed, 1) * 1e6:.1f} us/frame)"
+    )
+    print(f"peak rss          {peak_rss:.1f} MiB")
+
+    failed = []
+    if args.max_p99 is not None and (p99 is None or p99 > args.max_p99):
+        failed.append(f"reply p99 over {args.max_p99:g} ms")
+    if args.min_throughput is not None and throughput < args.min_throughput:
+        failed.append(f"throughput under {args.min_throughput:g} frames/s")
+    if len(latencies) < results["expected"]:
+        failed.append("missing replies")
+    for reason in failed:
+        print("FAIL: " + reason)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Messages/second through command selection, mostly ordinary chat.
+
+    python -m benchmarks.command_router [messages] [command_ratio]
+"""
+import random
+import sys
+import time
+
+from trovo.chat.command_router import CommandRouter
+
+
+def noop(username, *arguments):
+    pass
+
+
+def legacy_select(commands, username, message):
+    # CommandHandler.select_command before the router.
+    if message.startswith("!"):
+        words = message.split()
+        command_to_execute = words[0]
+        if command_to_execute in commands:
+            commands[command_to_execute](username)
+
+
+def build_messages(total: int, command_ratio: float):
+    rng = random.Random(0)
+    words = "gg nice play lol what was that clip again pog hype chat".split()
+    messages = []
+    for _ in range(total):
+        if rng.random() < command_ratio:
+            messages.append(rng.choice(["!hello", "!help me", "!roll 20", "!unknown"]))
+        else:
+            messages.append(" ".join(rng.choices(words, k=rng.randint(3, 25))))
+    return messages
+
+
+def bench(name, select, messages):
+    start = time.perf_counter()
+    for message in messages:
+        select("viewer", message)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<8} {len(messages) / elapsed:>12.0f} messages/s")
+
+
+def main(total: int = 100_000, command_ratio: float = 0.05):
+    messages = build_messages(total, float(command_ratio))
+    commands = {"!hello": noop, "!help": noop, "!roll": noop}
+    bench("legacy", lambda u, m: legacy_select(commands, u, m), messages)
+
+    router = CommandRouter()
+    router.register("hello", noop, aliases=["hi"])
+    router.register("help", noop)
+    router.register("roll", noop, arguments=[int], user_cooldown=5)
+    bench("router", router.dispatch, messages)
+
+
+if __name__ == "__main__":
+    main(*(float(arg) if "." in arg else int(arg) for arg in sys.argv[1:]))
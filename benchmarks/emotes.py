@@ -0,0 +1,120 @@
+"""Messages/second through the emote tokenizer as the catalog grows.
+
+    python -m benchmarks.emotes [messages] [channels]
+
+The baseline looks for every emote of the channel in every message, as
+an overlay walking the raw get_emotes dict does; EmoteIndex.tokenize
+makes one regex pass per message and a dict lookup per ``:name``. About
+a third of the messages carry emotes. Then EmoteCatalog loads
+``channels`` channels from a stub API through TrovoClient, to time a
+full refresh.
+"""
+import random
+import sys
+import time
+
+from benchmarks.stub_api import StubAPIServer
+from trovo.chat.emotes import EmoteCatalog, EmoteIndex, parse_emotes
+from trovo.client import trovo_client
+from trovo.client.trovo_client import TrovoClient
+
+FILLER = "gg wp nice play lol hello chat 12:30 what a clutch".split()
+
+
+def emotes_response(channel_ids, custom: int, with_global: bool = True):
+    channels = {
+        "customizedEmotes": {
+            "channel": [
+                {
+                    "channel_id": str(channel_id),
+                    "emotes": [
+                        {"name": f"c{channel_id}e{i}", "url": f"https://e/{i}"}
+                        for i in range(custom)
+                    ],
+                }
+                for channel_id in channel_ids
+            ]
+        }
+    }
+    if with_global:
+        channels["globalEmotes"] = [
+            {"name": f"global{i}", "url": f"https://g/{i}"} for i in range(100)
+        ]
+        channels["eventEmotes"] = []
+    return {"channels": channels}
+
+
+def build_corpus(messages: int, names, rng: random.Random):
+    corpus = []
+    for _ in range(messages):
+        words = rng.choices(FILLER, k=rng.randint(3, 10))
+        if rng.random() < 0.3:
+            for _ in range(rng.randint(1, 3)):
+                words.insert(rng.randrange(len(words)), ":" + rng.choice(names))
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def naive_tokenize(content: str, emotes: dict):
+    found = []
+    for name, emote in emotes.items():
+        token = ":" + name
+        position = content.find(token)
+        while position >= 0:
+            end = position + len(token)
+            if end == len(content) or not content[end].isalnum():
+                found.append((position, end, emote))
+            position = content.find(token, end)
+    segments, start = [], 0
+    for position, end, emote in sorted(found, key=lambda item: item[0]):
+        if position > start:
+            segments.append(content[start:position])
+        segments.append(emote)
+        start = end
+    if start < len(content):
+        segments.append(content[start:])
+    return segments
+
+
+def bench(name, tokenize, corpus):
+    start = time.process_time()
+    found = sum(
+        1 for content in corpus for s in tokenize(content) if not isinstance(s, str)
+    )
+    elapsed = time.process_time() - start
+    print(f"{name:<28} {len(corpus) / elapsed:>10.0f} msgs/s  {found} emotes")
+
+
+def main(messages: int = 50_000, channels: int = 1_000):
+    rng = random.Random(0)
+    for custom in (100, 1_000, 5_000):
+        index = EmoteIndex()
+        index.watch(1)
+        index.load(emotes_response([1], custom), [1])
+        global_emotes, by_channel = parse_emotes(emotes_response([1], custom))
+        emotes = {**global_emotes, **by_channel[1]}
+        corpus = build_corpus(messages, list(emotes), rng)
+        print(f"{custom} custom emotes")
+        bench("  scan every emote", lambda c: naive_tokenize(c, emotes), corpus[:2000])
+        bench("  EmoteIndex.tokenize", lambda c: index.tokenize(c, 1), corpus)
+
+    def route(path, payload):
+        return emotes_response(
+            payload["channel_id"], 50, with_global=payload["emote_type"] != 1
+        )
+
+    with StubAPIServer({"/getemotes": route}) as server:
+        server.patch(trovo_client)
+        with TrovoClient("bench") as trovo:
+            catalog = EmoteCatalog(trovo, range(channels))
+            start = time.perf_counter()
+            catalog.refresh()
+            elapsed = time.perf_counter() - start
+    print(
+        f"full refresh, {channels} channels  {elapsed * 1000:>8.1f} ms "
+        f"({-(-channels // catalog.batch_size)} requests)"
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,63 @@
+"""Frame parsing: decode-everything (json.loads) against the fast path.
+
+    python -m benchmarks.frame_parser [frames]
+
+The corpus mimics a busy channel: mostly CHAT frames batching a few
+chats each, plus PONG, RESPONSE and gift/system frames.
+"""
+import json
+import random
+import sys
+import time
+
+from benchmarks.stub_chat import chat_frame
+from trovo.chat import helper_functions
+from trovo.chat.helper_functions import iter_chats
+
+
+def build_corpus(frames: int):
+    rng = random.Random(0)
+    corpus = []
+    for index in range(frames):
+        roll = rng.random()
+        if roll < 0.6:
+            frame = chat_frame(100, index, "some chat message " * rng.randint(1, 4))
+            frame["data"]["chats"] *= rng.randint(1, 5)
+        elif roll < 0.8:
+            frame = {"type": "PONG", "nonce": str(index), "data": {"gap": 30}}
+        else:
+            frame = {"type": "RESPONSE", "nonce": str(index), "data": {}}
+        corpus.append(json.dumps(frame))
+    return corpus
+
+
+def decode_all(raw_message: str):
+    # Behaviour of the original parser, extended to every chat of the frame.
+    message = json.loads(raw_message)
+    if message.get("type") == "CHAT" and message.get("channel_info") is not None:
+        yield from message["data"]["chats"]
+
+
+def bench(name, parse, corpus):
+    start = time.perf_counter()
+    chats = 0
+    for raw_message in corpus:
+        for _ in parse(raw_message):
+            chats += 1
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {len(corpus) / elapsed:>12.0f} frames/s  {chats} chats")
+
+
+def main(frames: int = 100_000):
+    corpus = build_corpus(frames)
+    bench("json.loads every frame", decode_all, corpus)
+    loads = helper_functions.json_loads
+    helper_functions.json_loads = json.loads
+    bench("fast path, json", iter_chats, corpus)
+    helper_functions.json_loads = loads
+    if loads is not json.loads:
+        bench("fast path, orjson", iter_chats, corpus)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,39 @@
+"""Requests/second of bare ``requests.post`` against the pooled TrovoClient.
+
+    python -m benchmarks.http_pool [number_of_requests]
+"""
+import sys
+import time
+
+import requests
+
+from benchmarks.stub_api import StubAPIServer
+from trovo.client.trovo_client import TrovoClient
+
+
+def bench(name: str, call, total: int):
+    start = time.perf_counter()
+    for _ in range(total):
+        call()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {total / elapsed:>10.1f} req/s")
+
+
+def main(total: int = 2000):
+    with StubAPIServer() as stub, TrovoClient("client-id") as client:
+        url = f"{stub.url}/chat/send"
+        data = {"content": "hello", "channel_id": 1}
+        bench(
+            "requests.post",
+            lambda: requests.post(url, headers=client.headers, json=data),
+            total,
+        )
+        bench(
+            "TrovoClient (pooled)",
+            lambda: client.process_post_method(url, data),
+            total,
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,86 @@
+"""Cold import time of the trovo modules, as reported by -X importtime.
+
+    python -m benchmarks.import_time [--runs N] [--scale X] [--check]
+
+Every module is imported ``runs`` times, each time in a fresh
+interpreter, and the best cumulative time is kept, along with the
+third-party packages the import pulled in. BUDGETS is the regression
+budget of each module in milliseconds; ``--check`` exits with status 1
+when a module goes over it (``--scale`` the budgets on slow machines)
+or imports one of the HEAVY packages.
+"""
+import argparse
+import subprocess
+import sys
+from typing import Dict, Set, Tuple
+
+# Milliseconds, about twice the measured time: before the lazy imports
+# every client module took 300-450 ms. The asyncio chat client pays for
+# asyncio itself (~50 ms), the others must not import it.
+BUDGETS: Dict[str, float] = {
+    "trovo.metrics": 15,
+    "trovo.chat.message": 20,
+    "trovo.chat.chat_log": 40,
+    "trovo.chat.moderation": 50,
+    "trovo.chat.emotes": 50,
+    "trovo.client.trovo_client": 60,
+    "trovo.client.async_trovo_client": 60,
+    "trovo.client.token_manager": 60,
+    "trovo.chat.chat_client": 80,
+    "trovo.chat.async_chat_client": 120,
+}
+# Loaded by a model or transport on first use only; importing any of them
+# is a regression whatever the timing.
+HEAVY = ("pydantic", "requests", "aiohttp", "websocket")
+
+
+def import_time(module: str) -> Tuple[float, Set[str]]:
+    """Cumulative import time of ``module`` in ms and the HEAVY packages loaded."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = None
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        name = name.strip()
+        if name in HEAVY:
+            loaded.add(name)
+        if name == module:
+            cumulative = int(total) / 1000
+    if cumulative is None:
+        raise RuntimeError(f"{module} not found in -X importtime output")
+    return cumulative, loaded
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args(argv)
+
+    over = []
+    for module, budget in BUDGETS.items():
+        best, loaded = min(import_time(module) for _ in range(args.runs))
+        budget *= args.scale
+        status = "ok" if best <= budget and not loaded else "OVER"
+        if status == "OVER":
+            over.append(module)
+        print(
+            f"{module:<34} {best:>8.1f} ms  budget {budget:>6.0f} ms  {status:<4}  "
+            f"{', '.join(sorted(loaded)) or '-'}"
+        )
+    if args.check and over:
+        print(f"over budget or heavy imports: {', '.join(over)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
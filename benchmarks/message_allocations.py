@@ -0,0 +1,52 @@
+"""tracemalloc figures for 10k chat messages as dicts and as ChatMessage.
+
+    python -m benchmarks.message_allocations [messages]
+
+"retained" keeps every record alive (e.g. a moderation backlog),
+"streamed" is the peak while the messages flow through a ChatPipeline.
+"""
+import json
+import sys
+import tracemalloc
+
+from benchmarks.stub_chat import chat_frame
+from trovo.chat.message import ChatMessage, ChatPipeline, iter_frame_messages
+
+FIELDS = ChatMessage.__slots__[1:]
+
+
+def dict_records(frames):
+    for frame in frames:
+        channel_id = int(frame["channel_info"]["channel_id"])
+        for chat in frame["data"]["chats"]:
+            record = {field: chat.get(field) for field in FIELDS}
+            record["channel_id"] = channel_id
+            yield record
+
+
+def message_records(frames):
+    for frame in frames:
+        yield from iter_frame_messages(frame)
+
+
+def measure(name, produce, frames):
+    tracemalloc.start()
+    records = list(produce(frames))
+    retained = tracemalloc.get_traced_memory()[0]
+    del records
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    ChatPipeline([lambda message: None]).run(produce(frames))
+    streamed = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    print(f"{name:<12} retained {retained / 1024:>8.1f} KiB  streamed {streamed:>6} B")
+
+
+def main(messages: int = 10_000):
+    frames = [json.loads(json.dumps(chat_frame(1, i))) for i in range(messages)]
+    measure("dict", dict_records, frames)
+    measure("ChatMessage", message_records, frames)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
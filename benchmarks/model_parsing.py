@@ -0,0 +1,118 @@
+"""CPU time and peak memory of building response models from JSON bytes.
+
+    python -m benchmarks.model_parsing [viewers] [repeat]
+
+"dict" is the default path (json -> dict -> Model(**dict)), "fast" the
+fast_models path (parse_model) and "json" Model.model_validate_json(bytes),
+the fast path used when orjson is not installed.
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from trovo.client.helper_functions import parse_model
+from trovo.client.models import GetChannelViewersResponse, TopChannelsResponse
+
+ROLES = [
+    "VIPS",
+    "ace",
+    "aceplus",
+    "admins",
+    "all",
+    "creators",
+    "editors",
+    "followers",
+    "moderators",
+    "subscribers",
+    "supermods",
+    "wardens",
+]
+
+
+def viewers_payload(viewers: int) -> bytes:
+    names = [f"viewer{i}" for i in range(viewers)]
+    chatters = {role: {"viewers": []} for role in ROLES}
+    chatters["all"]["viewers"] = names
+    chatters["followers"]["viewers"] = names[: viewers // 2]
+    chatters["subscribers"]["viewers"] = names[: viewers // 20]
+    return json.dumps(
+        {
+            "live_title": "title",
+            "total": str(viewers),
+            "nickname": "streamer",
+            "chatters": chatters,
+            "custome_roles": {},
+            "cursor": 0,
+            "total_page": 1,
+        }
+    ).encode()
+
+
+def top_channels_payload(channels: int) -> bytes:
+    channel = {
+        "is_live": True,
+        "category_id": "10",
+        "category_name": "Game",
+        "audi_type": "CHANNEL_AUDIENCE_TYPE_FAMILYFRIENDLY",
+        "language_code": "EN",
+        "thumbnail": "https://example.invalid/thumb.jpg",
+        "current_viewers": 123,
+        "profile_pic": "https://example.invalid/pic.jpg",
+        "username": "streamer",
+        "subscriber_num": 12,
+        "social_links": [{"type": "twitter", "url": "https://example.invalid"}],
+        "channel_id": "1",
+        "streamer_user_id": "1",
+        "channel_url": "https://trovo.live/streamer",
+        "title": "Playing a game",
+        "nick_name": "Streamer",
+        "stream_started_at": "1690000000",
+        "video_resolution": "1080p",
+        "channel_country": "US",
+        "num_followers": 1000,
+    }
+    return json.dumps(
+        {
+            "top_channels_lists": [channel] * channels,
+            "total_page": 1,
+            "token": "token",
+            "cursor": 0,
+        }
+    ).encode()
+
+
+def measure(name, build, body: bytes, repeat: int):
+    tracemalloc.start()
+    build(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.process_time()
+    for _ in range(repeat):
+        build(body)
+    cpu = (time.process_time() - start) / repeat
+    print(f"  {name:<5} {cpu * 1000:>8.2f} ms  peak {peak / 2**20:>7.2f} MiB")
+
+
+def main(viewers: int = 100_000, repeat: int = 5):
+    payloads = [
+        (
+            "GetChannelViewersResponse",
+            GetChannelViewersResponse,
+            viewers_payload(viewers),
+        ),
+        (
+            "TopChannelsResponse",
+            TopChannelsResponse,
+            top_channels_payload(viewers // 100),
+        ),
+    ]
+    for name, model, body in payloads:
+        print(f"{name} ({len(body) / 2**20:.1f} MiB)")
+        measure("dict", lambda raw: model(**json.loads(raw)), body, repeat)
+        measure("fast", lambda raw: parse_model(model, raw), body, repeat)
+        measure("json", model.model_validate_json, body, repeat)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,80 @@
+"""Per-endpoint cost of building a request body.
+
+    python -m benchmarks.request_building [calls]
+
+"model" validates and dumps a fresh request model on every call (the
+previous behaviour), "build_request" is the memoised path used by the
+clients now.
+"""
+import sys
+import time
+
+from trovo.client.models import (
+    CategorySearchRequest,
+    ChannelInfoRequest,
+    GetChannelFollowersRequest,
+    GetChannelViewersRequest,
+    GetClipsRequest,
+    GetSubsRequest,
+    TopChannelsRequest,
+)
+from trovo.client.request_builder import build_request
+
+CASES = [
+    (GetChannelViewersRequest, False, {"limit": 200, "cursor": 0}),
+    (
+        GetChannelFollowersRequest,
+        False,
+        {"limit": 100, "cursor": 0, "direction": "asc"},
+    ),
+    (GetSubsRequest, False, {"limit": 100, "offset": 0, "direction": "desc"}),
+    (CategorySearchRequest, False, {"query": "minecraft", "limit": 20}),
+    (ChannelInfoRequest, True, {"channel_id": "100", "username": None}),
+    (
+        TopChannelsRequest,
+        True,
+        {
+            "limit": 100,
+            "after": None,
+            "token": None,
+            "cursor": None,
+            "category_id": "1",
+        },
+    ),
+    (
+        GetClipsRequest,
+        True,
+        {
+            "channel_id": 100,
+            "category_id": None,
+            "period": "week",
+            "clip_id": None,
+            "limit": 100,
+            "cursor": 0,
+            "direction": "asc",
+        },
+    ),
+]
+
+
+def per_call(function, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main(calls: int = 50_000):
+    print(f"{'request model':<28} {'model':>9} {'build_request':>14}")
+    for model, exclude_none, fields in CASES:
+        fresh = per_call(
+            lambda: model(**fields).model_dump(exclude_none=exclude_none), calls
+        )
+        memoised = per_call(
+            lambda: build_request(model, exclude_none=exclude_none, **fields), calls
+        )
+        print(f"{model.__name__:<28} {fresh:>7.2f}us {memoised:>12.2f}us")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
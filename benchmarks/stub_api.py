@@ -0,0 +1,85 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import ModuleType
+from typing import Callable, Dict, Optional
+
+from trovo.client import endpoints
+
+API_PATH = "/openplatform"
+
+Route = Callable[[str, dict], dict]
+
+
+def patch_endpoints(api_url: str, *modules: ModuleType):
+    """Replace API_URL by ``api_url`` in the endpoint constants of ``modules``."""
+    for module in modules:
+        for name in dir(endpoints):
+            value = getattr(endpoints, name)
+            if isinstance(value, str) and value.startswith(endpoints.API_URL):
+                setattr(module, name, api_url + value[len(endpoints.API_URL) :])
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    routes: Dict[str, Route] = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body: Optional[bytes]):
+        payload = {}
+        if body:
+            payload = json.loads(body)
+        path = self.path.split("?", 1)[0][len(API_PATH) :]
+        response = {}
+        for prefix, route in self.routes.items():
+            if path.startswith(prefix):
+                response = route(path, payload)
+                break
+        data = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._reply(None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._reply(self.rfile.read(length))
+
+
+class StubAPIServer:
+    """Local stand-in for open-api.trovo.live.
+
+    ``routes`` maps an endpoint path prefix (``"/chat/send"`` for
+    ``CHAT_SEND_URL``) to a function taking the path and JSON body and
+    returning the JSON reply.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Route]] = None):
+        handler = type("Handler", (StubAPIHandler,), {"routes": routes or {}})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{API_PATH}"
+
+    def patch(self, *modules: ModuleType):
+        """Point the endpoint constants imported by ``modules`` at the stub."""
+        patch_endpoints(self.url, *modules)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,78 @@
+import asyncio
+import json
+from typing import Callable, List, Optional
+
+from aiohttp import web
+
+
+class StubChatServer:
+    """Local stand-in for open-chat.trovo.live.
+
+    Answers AUTH and PING frames like Trovo does and, once a connection is
+    authenticated, hands it to ``on_connect`` so a benchmark can push frames.
+    """
+
+    def __init__(self, on_connect: Optional[Callable] = None):
+        self.on_connect = on_connect
+        self.connections: List[web.WebSocketResponse] = []
+        self.runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def handle(self, request: web.Request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections.append(ws)
+        try:
+            async for msg in ws:
+                frame = json.loads(msg.data)
+                if frame["type"] == "AUTH":
+                    await ws.send_json({"type": "RESPONSE", "nonce": frame["nonce"]})
+                    if self.on_connect is not None:
+                        asyncio.ensure_future(self.on_connect(ws))
+                elif frame["type"] == "PING":
+                    await ws.send_json(
+                        {"type": "PONG", "nonce": frame["nonce"], "data": {"gap": 30}}
+                    )
+        finally:
+            self.connections.remove(ws)
+        return ws
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/chat", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = site._server.sockets[0].getsockname()[:2]
+        self.url = f"ws://{host}:{port}/chat"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for ws in list(self.connections):
+            await ws.close()
+        await self.runner.cleanup()
+
+
+def chat_frame(channel_id: int, index: int, content: str = "hello") -> dict:
+    return {
+        "type": "CHAT",
+        "channel_info": {"channel_id": str(channel_id)},
+        "data": {
+            "eid": str(index),
+            "chats": [
+                {
+                    "type": 0,
+                    "content": content,
+                    "nick_name": f"viewer{index}",
+                    "uid": index,
+                    "sender_id": index,
+                    "user_name": f"viewer{index}",
+                    "send_time": 1690000000 + index,
+                    "message_id": f"{1690000000 + index}_{index}",
+                    "medals": [],
+                    "roles": [],
+                }
+            ],
+        },
+    }
@@ -0,0 +1,64 @@
+"""API requests needed to resolve the chatters of a simulated busy chat.
+
+    python -m benchmarks.user_batching [lookups] [threads]
+
+Chatters follow a skewed distribution (a few regulars talk a lot) and are
+resolved from several threads, once with one get_users_by_username call
+per lookup and once through UserLoader.
+"""
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_api import StubAPIServer
+from trovo.client import trovo_client
+from trovo.client.trovo_client import TrovoClient
+from trovo.client.user_loader import UserLoader
+
+
+def run(name, lookup, usernames, threads, requests):
+    before = len(requests)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        resolved = sum(user is not None for user in pool.map(lookup, usernames))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<10} {len(requests) - before:>6} requests "
+        f"{elapsed:>7.2f} s  {resolved} resolved"
+    )
+
+
+def main(lookups: int = 5000, threads: int = 32):
+    requests = []
+    lock = threading.Lock()
+
+    def get_users(path, data):
+        with lock:
+            requests.append(len(data["users"]))
+        users = [
+            {"user_id": name, "username": name, "nickname": name, "channel_id": name}
+            for name in data["users"]
+        ]
+        return {"total": len(users), "users": users}
+
+    rng = random.Random(0)
+    usernames = [f"viewer{int(rng.paretovariate(1.2))}" for _ in range(lookups)]
+
+    with StubAPIServer({"/getusers": get_users}) as api:
+        api.patch(trovo_client)
+        client = TrovoClient("client-id", pool_maxsize=threads)
+        run(
+            "naive",
+            lambda name: client.get_users_by_username([name]).users[0],
+            usernames,
+            threads,
+            requests,
+        )
+        loader = UserLoader(client)
+        run("UserLoader", loader.load, usernames, threads, requests)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,133 @@
+"""CPU and memory of tracking viewer joins/leaves over many channels.
+
+    python -m benchmarks.viewer_diff [channels] [viewers_per_channel] [polls]
+
+"models" rebuilds GetChannelViewersResponse for every poll and diffs sets
+of names and role names kept per channel, as pollers did before;
+"watcher" is ViewerWatcher with interned ids. Viewers are drawn from a
+shared pool, so the same names show up in several channels, and about
+5% of every channel changes between polls. The first poll of every
+channel (building the state) and the later ones (diffing) are timed
+apart; memory is what the per-channel state holds after the last poll.
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from trovo.client.models import GetChannelViewersResponse
+from trovo.client.viewer_watcher import ROLES, ViewerWatcher
+
+
+def page(names, moderators):
+    chatters = {role: {"viewers": []} for role in ROLES}
+    chatters["all"] = {"viewers": names}
+    chatters["moderators"]["viewers"] = moderators
+    return {
+        "live_title": "title",
+        "total": str(len(names)),
+        "nickname": "streamer",
+        "chatters": chatters,
+        "custome_roles": {},
+        "total_page": 1,
+    }
+
+
+class Pages:
+    """Fake AsyncTrovoClient serving pre-encoded pages like the API would."""
+
+    def __init__(self):
+        self.pages = {}
+
+    async def get_channel_viewers(self, channel_id, limit=20, cursor=0, raw=False):
+        return json.loads(self.pages[channel_id])
+
+
+def simulate(channels, viewers, polls, seed=0):
+    """Encoded pages of every channel for every poll."""
+    rng = random.Random(seed)
+    pool = [f"viewer{i}" for i in range(channels * viewers // 4)]
+    current = {c: rng.sample(pool, viewers) for c in range(channels)}
+    rounds = []
+    for _ in range(polls):
+        encoded = {}
+        for channel_id, names in current.items():
+            for i in rng.sample(range(viewers), viewers // 20):
+                names[i] = rng.choice(pool)
+            encoded[channel_id] = json.dumps(page(names, names[:3]))
+        rounds.append(encoded)
+    return rounds
+
+
+def bench_models(rounds, marks):
+    state = {}
+    changes = 0
+    for encoded in rounds:
+        for channel_id, raw in encoded.items():
+            response = GetChannelViewersResponse(**json.loads(raw))
+            names = set(response.chatters.all.viewers)
+            roles = {}
+            for role, group in response.chatters:
+                if role != "all":
+                    for name in group.viewers:
+                        roles.setdefault(name, set()).add(role)
+            if channel_id in state:
+                old_names, old_roles = state[channel_id]
+                changes += len(names ^ old_names) + sum(
+                    roles.get(name) != old_roles.get(name) for name in names & old_names
+                )
+            state[channel_id] = (names, roles)
+        marks.append(time.process_time())
+    return state, changes
+
+
+def bench_watcher(rounds, marks):
+    pages = Pages()
+    watcher = ViewerWatcher(pages, rate=1e9, burst=1e9)
+    changes = 0
+
+    async def run():
+        nonlocal changes
+        for channel_id in rounds[0]:
+            watcher.watch(channel_id)
+        for encoded in rounds:
+            pages.pages = encoded
+            for channel_id in encoded:
+                delta = await watcher.poll(channel_id)
+                changes += (
+                    len(delta.joined) + len(delta.left) + len(delta.roles_changed)
+                )
+            marks.append(time.process_time())
+
+    asyncio.run(run())
+    return watcher, changes
+
+
+def measure(name, bench, rounds):
+    marks = [time.process_time()]
+    bench(rounds, marks)
+    baseline = marks[1] - marks[0]
+    steady = (marks[-1] - marks[1]) / (len(rounds) - 1)
+    tracemalloc.start()
+    state, changes = bench(rounds, [])
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del state
+    per_round = len(rounds[0])
+    print(
+        f"{name:<8} first poll {per_round / baseline:>7.0f} polls/s  "
+        f"later {per_round / steady:>7.0f} polls/s  "
+        f"{held / 2**20:>6.1f} MiB held  ({changes} changes)"
+    )
+
+
+def main(channels: int = 2000, viewers: int = 200, polls: int = 5):
+    rounds = simulate(channels, viewers, polls)
+    measure("models", bench_models, rounds)
+    measure("watcher", bench_watcher, rounds)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from trovo.client.cache import ResponseCache, TTLCache, cached
+
+
+class Client:
+    def __init__(self, cache, delay=0.0):
+        self.cache = cache
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    @cached
+    def get_channel_info_by_id(self, channel_id=None, username=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("boom")
+        return {"channel_id": channel_id, "call": self.calls}
+
+
+class AsyncClient:
+    def __init__(self, cache):
+        self.cache = cache
+        self.calls = 0
+        self.fail = False
+
+    @cached
+    async def get_channel_info_by_id(self, channel_id=None, username=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("boom")
+        return {"channel_id": channel_id, "call": self.calls}
+
+
+def test_ttl_cache_expires_and_evicts():
+    cache = TTLCache(maxsize=2, ttl=0.02)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.evictions == 1
+    time.sleep(0.03)
+    assert cache.get("a") == (False, None)
+    cache.set("d", 4, ttl=10)
+    assert cache.get("d") == (True, 4)
+
+
+def test_hits_share_arguments_bound_with_defaults():
+    client = Client(ResponseCache())
+    first = client.get_channel_info_by_id("1")
+    assert client.get_channel_info_by_id(channel_id="1", username=None) is first
+    assert client.get_channel_info_by_id("2") is not first
+    assert client.calls == 2
+    assert client.cache.stats()["get_channel_info_by_id"]["hits"] == 1
+
+
+def test_concurrent_misses_make_one_call():
+    client = Client(ResponseCache(), delay=0.05)
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(client.get_channel_info_by_id("1"))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.calls == 1
+    assert all(result is results[0] for result in results)
+    counters = client.cache.stats()["get_channel_info_by_id"]
+    assert counters["misses"] + counters["coalesced"] + counters["hits"] == 8
+
+
+def test_errors_are_not_cached():
+    client = Client(ResponseCache())
+    client.fail = True
+    with pytest.raises(RuntimeError):
+        client.get_channel_info_by_id("1")
+    client.fail = False
+    assert client.get_channel_info_by_id("1")["call"] == 2
+    assert not client.cache.in_flight
+
+
+def test_expiry_and_invalidate():
+    client = Client(ResponseCache({"get_channel_info_by_id": 0.02}))
+    client.get_channel_info_by_id("1")
+    time.sleep(0.03)
+    assert client.get_channel_info_by_id("1")["call"] == 2
+    client.cache.invalidate("get_emotes")
+    assert client.get_channel_info_by_id("1")["call"] == 2
+    client.cache.invalidate("get_channel_info_by_id")
+    assert client.get_channel_info_by_id("1")["call"] == 3
+    client.cache.invalidate()
+    assert client.get_channel_info_by_id("1")["call"] == 4
+
+
+def test_methods_without_ttl_or_cache_are_not_cached():
+    client = Client(ResponseCache({}))
+    client.get_channel_info_by_id("1")
+    client.get_channel_info_by_id("1")
+    client.cache = None
+    client.get_channel_info_by_id("1")
+    assert client.calls == 3
+
+
+def test_async_concurrent_misses_and_errors():
+    client = AsyncClient(ResponseCache())
+
+    async def run():
+        results = await asyncio.gather(
+            *(client.get_channel_info_by_id("1") for _ in range(5))
+        )
+        assert client.calls == 1
+        assert all(result is results[0] for result in results)
+        client.fail = True
+        errors = await asyncio.gather(
+            *(client.get_channel_info_by_id("2") for _ in range(3)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(error, RuntimeError) for error in errors)
+        assert client.calls == 2
+        client.fail = False
+        assert (await client.get_channel_info_by_id("2"))["call"] == 3
+
+    asyncio.run(run())
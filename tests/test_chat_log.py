@@ -0,0 +1,61 @@
+import errno
+
+import pytest
+
+from trovo.chat.chat_log import ChatLogReader, ChatLogWriter
+from trovo.chat.message import ChatMessage
+from trovo.metrics import InMemoryMetrics
+
+
+def message(number: int) -> ChatMessage:
+    return ChatMessage(1, str(number), 0, 7, 7, "user", "User", f"hi {number}", number)
+
+
+class DiskFull:
+    """Wraps a segment file; the first write stores a few bytes, then fails."""
+
+    def __init__(self, file):
+        self.file = file
+        self.failed = False
+
+    def write(self, data):
+        if not self.failed:
+            self.failed = True
+            self.file.write(data[:5])
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def test_failed_commit_is_rolled_back_and_reported(tmp_path):
+    metrics = InMemoryMetrics()
+    with ChatLogWriter(str(tmp_path), fsync=False, metrics=metrics) as writer:
+        writer.append(message(1))
+        assert writer.flush(timeout=1)
+        writer.file = DiskFull(writer.file)
+        writer.append(message(2))
+        assert not writer.flush(timeout=1)
+        assert (writer.committed, writer.lost) == (1, 1)
+        writer.append(message(3))
+        assert writer.flush(timeout=1)
+    assert metrics.counter("chat_log_errors_total") == 1
+    assert metrics.counter("chat_log_messages_total") == 2
+
+    with ChatLogReader(str(tmp_path)) as reader:
+        assert [m.content for m in reader] == ["hi 1", "hi 3"]
+        assert [m.content for m in reader.last_from_user(7)] == ["hi 3", "hi 1"]
+
+
+def test_one_writer_per_directory(tmp_path):
+    with ChatLogWriter(str(tmp_path), fsync=False) as writer:
+        writer.append(message(1))
+        assert writer.flush(timeout=1)
+        with pytest.raises(RuntimeError):
+            ChatLogWriter(str(tmp_path), fsync=False)
+        writer.append(message(2))
+    with ChatLogWriter(str(tmp_path), fsync=False) as writer:
+        writer.append(message(3))
+    with ChatLogReader(str(tmp_path)) as reader:
+        assert [m.content for m in reader] == ["hi 1", "hi 2", "hi 3"]
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from trovo.chat.command_executor import AsyncCommandExecutor, CommandExecutor
+from trovo.chat.command_router import Command
+from trovo.metrics import InMemoryMetrics, Metrics
+
+
+def outcomes(stats):
+    snapshot = stats.snapshot()
+    return {
+        name: snapshot[name]
+        for name in ("completed", "failed", "timed_out", "slow")
+        if snapshot[name]
+    }
+
+
+def test_slow_sync_command_counts_once_as_its_outcome():
+    def slow(username):
+        time.sleep(0.05)
+
+    def broken(username):
+        time.sleep(0.05)
+        raise ValueError(username)
+
+    metrics = InMemoryMetrics()
+    executor = CommandExecutor(workers=2, default_timeout=0.01, metrics=metrics)
+    executor.submit(Command("slow", slow), "a", [])
+    executor.submit(Command("broken", broken), "b", [])
+    executor.shutdown(timeout=1)
+    assert outcomes(executor.stats) == {"completed": 1, "failed": 1, "slow": 2}
+    assert metrics.counter("commands_total", command="slow", result="completed") == 1
+    assert metrics.counter("commands_slow_total", command="broken") == 1
+
+
+def test_async_command_cancelled_at_timeout_counts_only_as_timed_out():
+    async def slow(username):
+        await asyncio.sleep(1)
+
+    async def run():
+        executor = AsyncCommandExecutor(default_timeout=0.01, metrics=Metrics())
+        executor.submit(Command("slow", slow), "a", [])
+        await executor.join()
+        return executor
+
+    executor = asyncio.run(run())
+    assert outcomes(executor.stats) == {"timed_out": 1}
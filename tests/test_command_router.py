@@ -0,0 +1,91 @@
+import pytest
+
+from trovo.chat.command_router import CommandRouter, command
+from trovo.metrics import InMemoryMetrics
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, username, *arguments):
+        self.calls.append((username, *arguments))
+
+
+@pytest.fixture
+def router():
+    return CommandRouter(prefixes=("!", "?"))
+
+
+@pytest.mark.parametrize(
+    "message", ["!hello", "!hello there", "!hello\tthere", "!hello\n", "?hello  x"]
+)
+def test_any_whitespace_ends_the_command_name(router, message):
+    hello = Recorder()
+    router.register("hello", hello)
+    assert router.dispatch("viewer", message)
+    assert hello.calls == [("viewer",)]
+
+
+def test_messages_that_are_not_commands(router):
+    hello = Recorder()
+    router.register("hello", hello)
+    for message in ["hello", "! hello", "!hellothere", "#hello", "", "!"]:
+        assert not router.dispatch("viewer", message)
+    assert hello.calls == []
+
+
+def test_aliases_share_the_command(router):
+    hello = Recorder()
+    entry = router.register("hello", hello, aliases=["hi", "hey"])
+    assert router.match("?hi") == (entry, "")
+    assert router.dispatch("a", "!hey")
+    with pytest.raises(ValueError):
+        router.register("hi", Recorder())
+    router.unregister("hello")
+    assert router.match("!hi") is None
+
+
+def test_arguments_are_converted_from_the_rest(router):
+    roll = Recorder()
+    router.register("roll", roll, arguments=[int, str])
+    assert router.dispatch("a", "!roll\t20   for the\nwin")
+    assert not router.dispatch("a", "!roll twenty x")
+    assert not router.dispatch("a", "!roll 20")
+    assert roll.calls == [("a", 20, "for the\nwin")]
+
+
+def test_cooldowns():
+    metrics = InMemoryMetrics()
+    router = CommandRouter(metrics=metrics)
+    hello = Recorder()
+    router.register("hello", hello, user_cooldown=10, channel_cooldown=2)
+    assert router.dispatch("a", "!hello", now=100)
+    assert not router.dispatch("b", "!hello", now=101)
+    assert router.dispatch("b", "!hello", now=102)
+    assert not router.dispatch("a", "!hello", now=105)
+    assert router.dispatch("a", "!hello", now=110)
+    assert [user for user, in hello.calls] == ["a", "b", "a"]
+    assert metrics.counter("chat_commands_total", command="hello", result="cooldown")
+
+
+def test_expired_user_cooldowns_are_purged():
+    router = CommandRouter()
+    router.purge_threshold = 2
+    entry = router.register("hello", Recorder(), user_cooldown=1)
+    for number, user in enumerate("abc"):
+        router.dispatch(user, "!hello", now=number * 10)
+    assert list(entry.user_last_used) == ["c"]
+
+
+def test_register_plugin():
+    class Plugin:
+        @command("ping", aliases=["p"])
+        def ping(self, username):
+            self.pinged = username
+
+    plugin = Plugin()
+    router = CommandRouter()
+    router.register_plugin(plugin)
+    assert router.dispatch("a", "!p")
+    assert plugin.pinged == "a"
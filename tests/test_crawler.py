@@ -0,0 +1,57 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from trovo.client.crawler import TopChannelsCrawler
+
+
+class Channel(SimpleNamespace):
+    def model_dump_json(self):
+        return json.dumps({"channel_id": self.channel_id})
+
+
+class Client:
+    """Two pages per category; ``broken`` categories fail on the second."""
+
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+
+    async def get_top_channels(self, limit, token, cursor, category_id):
+        page = cursor or 0
+        if page and category_id in self.broken:
+            raise RuntimeError("boom")
+        return SimpleNamespace(
+            top_channels_lists=[Channel(channel_id=f"{category_id}-{page}")],
+            token="t",
+            total_page=2,
+        )
+
+
+def crawl(tmp_path, client, category_ids):
+    crawler = TopChannelsCrawler(client, str(tmp_path / "top.jsonl"), rate=1000)
+    return crawler, asyncio.run(crawler.run(category_ids))
+
+
+def lines(tmp_path):
+    return (tmp_path / "top.jsonl").read_text().splitlines()
+
+
+def test_completed_crawl_removes_checkpoint(tmp_path):
+    crawler, result = crawl(tmp_path, Client(), ["a", "b"])
+    assert result == {"channels": 4, "failed": {}}
+    assert not (tmp_path / "top.jsonl.checkpoint").exists()
+
+    _, result = crawl(tmp_path, Client(), ["a", "b"])
+    assert result["channels"] == 4
+    assert len(lines(tmp_path)) == 8
+
+
+def test_failed_crawl_resumes_from_checkpoint(tmp_path):
+    _, result = crawl(tmp_path, Client(broken={"b"}), ["a", "b"])
+    assert result == {"channels": 3, "failed": {"b": "boom"}}
+    assert (tmp_path / "top.jsonl.checkpoint").exists()
+
+    _, result = crawl(tmp_path, Client(), ["a", "b"])
+    assert result == {"channels": 1, "failed": {}}
+    assert len(lines(tmp_path)) == 4
+    assert not (tmp_path / "top.jsonl.checkpoint").exists()
@@ -0,0 +1,211 @@
+import asyncio
+import time
+
+from trovo.chat.emotes import (
+    ALL_EMOTES,
+    CHANNEL_EMOTES,
+    GLOBAL_EMOTES,
+    AsyncEmoteCatalog,
+    EmoteCatalog,
+    EmoteIndex,
+)
+from trovo.client.cache import ResponseCache, cached
+from trovo.metrics import Metrics
+
+
+def response(global_names=(), custom=None):
+    """A get_emotes response; ``custom`` maps channel ids to emote names."""
+    return {
+        "channels": {
+            "globalEmotes": [{"name": name, "url": "g"} for name in global_names],
+            "customizedEmotes": {
+                "channel": [
+                    {
+                        "channel_id": str(channel_id),
+                        "emotes": [{"name": name, "url": "c"} for name in names],
+                    }
+                    for channel_id, names in (custom or {}).items()
+                ]
+            },
+        }
+    }
+
+
+def index():
+    emotes = EmoteIndex()
+    emotes.watch(1)
+    emotes.load(response(["smile", "hype", "30x"], {1: ["hype", "wave"]}), [1])
+    return emotes
+
+
+def tokens(segments):
+    return [s if isinstance(s, str) else (s.name, s.kind) for s in segments]
+
+
+def test_tokenize_splits_text_and_emotes():
+    emotes = index()
+    assert tokens(emotes.tokenize("hi :smile there", 1)) == [
+        "hi ",
+        ("smile", "global"),
+        " there",
+    ]
+    assert tokens(emotes.tokenize(":smile:", 1)) == [("smile", "global")]
+    assert tokens(emotes.tokenize(":smile:hype", 1)) == [
+        ("smile", "global"),
+        ("hype", "custom"),
+    ]
+    assert tokens(emotes.tokenize(":smile::wave: !", 1)) == [
+        ("smile", "global"),
+        ("wave", "custom"),
+        " !",
+    ]
+
+
+def test_tokenize_leaves_unknown_names_and_times_as_text():
+    emotes = index()
+    assert emotes.tokenize("at 12:30 :nope", 1) == ["at 12:30 :nope"]
+    assert emotes.tokenize("no colon", 1) == ["no colon"]
+    assert emotes.tokenize("", 1) == []
+    assert tokens(emotes.tokenize(":smilex :smile", 1)) == [
+        ":smilex ",
+        ("smile", "global"),
+    ]
+
+
+def test_custom_emotes_shadow_global_ones_in_their_channel():
+    emotes = index()
+    assert emotes.get("hype", 1).kind == "custom"
+    assert emotes.get("hype", 2).kind == "global"
+    assert emotes.get("wave", 2) is None
+    assert tokens(emotes.tokenize(":wave", 2)) == [":wave"]
+
+
+def test_load_ignores_unwatched_channels():
+    emotes = EmoteIndex()
+    emotes.watch(1)
+    emotes.load(response(["smile"], {1: ["a"], 2: ["b"]}), [1, 2, 3])
+    assert set(emotes.channels) == {1}
+    emotes.unwatch(1)
+    assert emotes.channels == {}
+
+
+class Trovo:
+    def __init__(self):
+        self.cache = ResponseCache()
+        self.custom = {}
+        self.requests = []
+
+    @cached
+    def get_emotes(self, emote_type, channel_id):
+        self.requests.append((emote_type, list(channel_id)))
+        names = () if emote_type == CHANNEL_EMOTES else ["smile"]
+        custom = {i: self.custom[i] for i in channel_id if i in self.custom}
+        return response(names, custom)
+
+
+def catalog(trovo, channel_ids=(), **options):
+    return EmoteCatalog(
+        trovo,
+        channel_ids,
+        refresh_interval=100,
+        retry_interval=10,
+        metrics=Metrics(),
+        **options,
+    )
+
+
+def test_plan_full_then_pending_channels():
+    emotes = catalog(Trovo(), [2, 1])
+    assert emotes._plan(0.0) == ([1, 2], True)
+    emotes._done(0.0, True, None)
+    assert emotes.next_refresh == 100
+    assert emotes._plan(1.0) is None
+    emotes.watch(3)
+    assert emotes._plan(1.0) == ([3], False)
+    emotes._done(1.0, False, None)
+    assert emotes._plan(2.0) is None
+    assert emotes._plan(100.0) == ([1, 2, 3], True)
+
+
+def test_plan_retries_after_errors():
+    emotes = catalog(Trovo(), [1])
+    emotes._plan(0.0)
+    emotes._done(0.0, True, RuntimeError("down"))
+    assert emotes.next_refresh == 10
+    emotes._done(10.0, True, None)
+    emotes.watch(2)
+    emotes._plan(20.0)
+    emotes._done(20.0, False, RuntimeError("down"))
+    # A failed channel-only refresh brings the next full refresh forward.
+    assert emotes.next_refresh == 30
+
+
+def test_refresh_batches_requests():
+    trovo = Trovo()
+    emotes = catalog(trovo, [1, 2, 3])
+    emotes.batch_size = 2
+    emotes.refresh()
+    assert trovo.requests == [(ALL_EMOTES, [1, 2]), (CHANNEL_EMOTES, [3])]
+    trovo.requests.clear()
+    emotes.refresh([], global_=True)
+    assert trovo.requests == [(GLOBAL_EMOTES, [])]
+
+
+def test_rewatched_channel_is_not_served_from_the_client_cache():
+    trovo = Trovo()
+    trovo.custom = {1: ["old"]}
+    emotes = catalog(trovo)
+    emotes.refresh(*emotes._plan(0.0))
+    emotes._done(0.0, True, None)
+    emotes.watch(1)
+    emotes.refresh(*emotes._plan(1.0))
+    assert emotes.get("old", 1) is not None
+    emotes.unwatch(1)
+    trovo.custom = {1: ["new"]}
+    emotes.watch(1)
+    emotes.refresh(*emotes._plan(2.0))
+    assert emotes.get("new", 1) is not None
+    assert emotes.get("old", 1) is None
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_catalog_thread_loads_watched_channels():
+    trovo = Trovo()
+    trovo.custom = {1: ["a"], 2: ["b"]}
+    emotes = catalog(trovo, [1]).start()
+    try:
+        wait_for(lambda: emotes.get("a", 1) is not None)
+        emotes.watch(2)
+        wait_for(lambda: emotes.get("b", 2) is not None)
+    finally:
+        emotes.close()
+    assert emotes.get("smile") is not None
+
+
+def test_async_catalog_loads_watched_channels():
+    class AsyncTrovo(Trovo):
+        @cached
+        async def get_emotes(self, emote_type, channel_id):
+            return Trovo.get_emotes.__wrapped__(self, emote_type, channel_id)
+
+    trovo = AsyncTrovo()
+    trovo.custom = {1: ["a"], 2: ["b"]}
+    emotes = AsyncEmoteCatalog(trovo, [1], metrics=Metrics())
+
+    async def run():
+        task = asyncio.ensure_future(emotes.run())
+        while emotes.get("a", 1) is None:
+            await asyncio.sleep(0.005)
+        emotes.watch(2)
+        while emotes.get("b", 2) is None:
+            await asyncio.sleep(0.005)
+        emotes.stop()
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(run())
@@ -0,0 +1,25 @@
+from trovo.chat.helper_functions import frame_type, iter_chats
+
+
+def test_frame_type_reads_the_leading_type_key():
+    assert frame_type('{"type":"PONG","nonce":"1"}') == "PONG"
+    assert frame_type(' { "type" : "CHAT", "data": {}}') == "CHAT"
+
+
+def test_frame_type_ignores_nested_type_keys():
+    raw = '{"nonce":"1","data":{"type":"FOO"},"type":"CHAT"}'
+    assert frame_type(raw) == "CHAT"
+
+
+def test_frame_type_of_invalid_frames():
+    assert frame_type('{"nonce":"1","data":{"type":"FOO"}') is None
+    assert frame_type('["type"]') is None
+    assert frame_type('{"nonce":"1"}') is None
+
+
+def test_iter_chats_with_type_after_other_keys():
+    raw = (
+        '{"channel_info":{"channel_id":"1"},"data":{"chats":[{"type":0}]},'
+        '"type":"CHAT"}'
+    )
+    assert list(iter_chats(raw)) == [{"type": 0}]
@@ -0,0 +1,48 @@
+from trovo.chat.message import ChatMessage, ReplayFilter
+
+
+def chat(message_id, send_time, channel_id=1):
+    return ChatMessage(channel_id, message_id, 0, 7, 7, "user", "User", "hi", send_time)
+
+
+def passed(replay, chats):
+    return [message.message_id for message in chats if replay(message)]
+
+
+def test_reconnect_replay_is_dropped():
+    replay = ReplayFilter()
+    history = [chat("a", 100), chat("b", 101), chat("c", 101)]
+    assert passed(replay, history) == ["a", "b", "c"]
+    reconnect = history + [chat("d", 101), chat("e", 102)]
+    assert passed(replay, reconnect) == ["d", "e"]
+    assert replay.skipped == 3
+
+
+def test_out_of_order_chats_pass():
+    replay = ReplayFilter()
+    assert passed(replay, [chat("new", 105), chat("late", 103)]) == ["new", "late"]
+    assert passed(replay, [chat("late", 103)]) == []
+
+
+def test_channels_are_separate():
+    replay = ReplayFilter()
+    assert passed(replay, [chat("a", 100, 1), chat("a", 100, 2)]) == ["a", "a"]
+
+
+def test_since_drops_older_chats():
+    replay = ReplayFilter(since=100)
+    chats = [chat("old", 99), chat("edge", 100), chat("new", 101), chat("t", None)]
+    assert passed(replay, chats) == ["new", "t"]
+
+
+def test_window_bounds_memory():
+    replay = ReplayFilter(window=2)
+    assert passed(replay, [chat("a", 1), chat("b", 2), chat("c", 3)]) == list("abc")
+    assert list(replay.seen[1]) == ["b", "c"]
+    # Only chats still in the window are recognised.
+    assert passed(replay, [chat("c", 3), chat("a", 1)]) == ["a"]
+
+
+def test_chats_without_id_pass():
+    replay = ReplayFilter()
+    assert passed(replay, [chat(None, 1), chat(None, 1)]) == [None, None]
@@ -0,0 +1,14 @@
+from trovo.metrics import InMemoryMetrics, to_prometheus
+
+
+def test_label_order_does_not_split_series():
+    metrics = InMemoryMetrics()
+    metrics.inc("requests_total", endpoint="/a", status="200")
+    metrics.inc("requests_total", status="200", endpoint="/a")
+    metrics.observe("seconds", 0.1, b="2", a="1")
+    metrics.observe("seconds", 0.2, a="1", b="2")
+    assert metrics.counter("requests_total", status="200", endpoint="/a") == 2
+    assert metrics.histogram("seconds", a="1", b="2").count == 2
+    exported = to_prometheus(metrics)
+    assert exported.count('trovo_requests_total{endpoint="/a",status="200"}') == 1
+    assert exported.count('trovo_seconds_count{a="1",b="2"}') == 1
@@ -0,0 +1,125 @@
+import pytest
+
+from trovo.chat import moderation
+from trovo.chat.message import ChatMessage
+from trovo.chat.moderation import FloodDetector, Moderator, Rule, RuleSet
+from trovo.metrics import Metrics
+
+
+def message(content, nick_name="spammer", roles=None, channel_id=1):
+    return ChatMessage(
+        channel_id, "m", 0, 7, 7, nick_name.lower(), nick_name, content, roles=roles
+    )
+
+
+def test_rule_set_words_match_whole_words_only():
+    rules = RuleSet([Rule("bad", words=["scam"])])
+    assert rules.match("what a SCAM!").name == "bad"
+    assert rules.match("scamming") is None
+    assert rules.match("the scammer") is None
+
+
+def test_rule_set_words_with_non_word_characters():
+    rules = RuleSet([Rule("lang", words=["c++"]), Rule("money", words=["$$$"])])
+    assert rules.match("I love c++").name == "lang"
+    assert rules.match("c++, rust").name == "lang"
+    assert rules.match("free $$$ now").name == "money"
+    assert rules.match("abc++") is None
+    assert rules.match("$$$x") is None
+
+
+def test_rule_set_phrases_match_anywhere():
+    rules = RuleSet([Rule("link", phrases=["bit.ly/"])])
+    assert rules.match("see BIT.LY/xyz").name == "link"
+
+
+def test_rule_set_leftmost_literal_then_patterns():
+    rules = RuleSet(
+        [
+            Rule("first", words=["alpha"]),
+            Rule("second", words=["beta"]),
+            Rule("digits", patterns=[r"\d{6,}"]),
+        ]
+    )
+    assert rules.match("beta then alpha").name == "second"
+    # A literal rule is checked before every pattern rule.
+    assert rules.match("123456 alpha").name == "first"
+    assert rules.match("call 1234567").name == "digits"
+    assert rules.match("nothing here") is None
+
+
+def test_flood_detector_rate_and_duplicates():
+    flood = FloodDetector(window=10, max_repeats=3, max_messages=4)
+    assert flood.check("a", "hello", 0) is None
+    assert flood.check("a", "Hello ", 1) is None
+    assert flood.check("a", "HELLO", 2) == "duplicate"
+    assert flood.check("b", "one", 0) is None
+    for now, content in ((1, "two"), (2, "three"), (3, "four")):
+        assert flood.check("b", content, now) is None
+    assert flood.check("b", "five", 4) == "rate"
+    # Everything older than the window is forgotten.
+    assert flood.check("a", "hello", 20) is None
+    assert flood.check("b", "six", 20) is None
+
+
+def test_flood_detector_purges_idle_users():
+    flood = FloodDetector(window=10, max_repeats=2)
+    flood.purge_threshold = 2
+    flood.check("a", "hi", 0)
+    flood.check("b", "hi", 0)
+    assert flood.check("late", "hi", 30) is None
+    assert list(flood.history) == ["late"]
+    assert flood.check("late", "hi", 31) == "duplicate"
+
+
+class Trovo:
+    def __init__(self):
+        self.commands = []
+
+    def perform_chat_commannd(self, command, channel_id):
+        self.commands.append((command, channel_id))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(moderation.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_moderator_action_cooldown(clock):
+    trovo = Trovo()
+    rules = [Rule("bad", words=["scam"], action="timeout {nick_name} 600")]
+    moderator = Moderator(trovo, rules, action_cooldown=30, metrics=Metrics())
+    assert moderator(message("scam")) is False
+    clock[0] += 10
+    assert moderator(message("scam again")) is False
+    assert moderator(message("scam", nick_name="other")) is False
+    assert moderator(message("scam", channel_id=2)) is False
+    clock[0] += 30
+    assert moderator(message("scam")) is False
+    moderator.close()
+    assert trovo.commands == [
+        ("timeout spammer 600", 1),
+        ("timeout other 600", 1),
+        ("timeout spammer 600", 2),
+        ("timeout spammer 600", 1),
+    ]
+
+
+def test_moderator_exempt_roles_keep_and_flood(clock):
+    trovo = Trovo()
+    rules = [Rule("bad", words=["scam"]), Rule("meh", words=["meh"], drop=False)]
+    moderator = Moderator(
+        trovo,
+        rules,
+        flood=FloodDetector(max_repeats=2),
+        flood_action="timeout {nick_name} 60",
+        metrics=Metrics(),
+    )
+    assert moderator(message("scam", roles=["mod"])) is True
+    assert moderator(message("meh")) is True
+    assert moderator(message("spam spam")) is True
+    assert moderator(message("spam  SPAM")) is False
+    moderator.close()
+    assert trovo.commands == [("timeout spammer 60", 1)]
@@ -0,0 +1,164 @@
+import asyncio
+import gc
+from types import SimpleNamespace
+
+import pytest
+
+from trovo.client.async_trovo_client import AsyncTrovoClient
+from trovo.client.pagination import aiter_pages, by_total_page, iter_pages
+from trovo.client.trovo_client import TrovoClient
+
+
+def items(page):
+    return page.items
+
+
+class Pages:
+    """Pages of ``sizes`` items, with a total_page unless ``short`` is set."""
+
+    def __init__(self, sizes, short=False, broken=None):
+        self.sizes = sizes
+        self.short = short
+        self.broken = broken
+        self.fetched = []
+
+    def page(self, index):
+        self.fetched.append(index)
+        if index == self.broken:
+            raise RuntimeError(f"page {index}")
+        page = SimpleNamespace(items=[(index, i) for i in range(self.sizes[index])])
+        if not self.short:
+            page.total_page = len(self.sizes)
+        return page
+
+    def fetch(self, index, previous):
+        assert (previous is None) == (index == 0)
+        return self.page(index)
+
+    async def afetch(self, index, previous):
+        await asyncio.sleep(0)
+        return self.fetch(index, previous)
+
+
+def short_page(limit):
+    return lambda page, index: len(page.items) >= limit
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_stops_at_total_page(prefetch):
+    pages = Pages([2, 2, 2])
+    result = list(iter_pages(pages.fetch, items, by_total_page, prefetch))
+    assert len(result) == 6
+    assert pages.fetched == [0, 1, 2]
+
+
+@pytest.mark.parametrize("sizes", [[2, 2, 1], [2, 2, 0]])
+def test_stops_at_short_page(sizes):
+    pages = Pages(sizes, short=True)
+    result = list(iter_pages(pages.fetch, items, short_page(2)))
+    assert len(result) == sum(sizes)
+    assert pages.fetched == [0, 1, 2]
+
+
+def test_empty_page_stops_despite_total_page():
+    pages = Pages([2, 0, 2])
+    assert len(list(iter_pages(pages.fetch, items, by_total_page))) == 2
+    assert pages.fetched == [0, 1]
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_error_is_raised_after_the_previous_page(prefetch):
+    pages = Pages([2, 2, 2], broken=1)
+    seen = []
+    with pytest.raises(RuntimeError, match="page 1"):
+        for item in iter_pages(pages.fetch, items, by_total_page, prefetch):
+            seen.append(item)
+    assert seen == [(0, 0), (0, 1)]
+    assert pages.fetched == [0, 1]
+
+
+def test_client_viewers_stop_on_short_page(monkeypatch):
+    pages = Pages([3, 3, 1], short=True)
+
+    def get_channel_viewers(channel_id, limit, cursor):
+        page = pages.page(cursor)
+        return SimpleNamespace(
+            chatters=SimpleNamespace(all=SimpleNamespace(viewers=page.items))
+        )
+
+    client = TrovoClient("x")
+    monkeypatch.setattr(client, "get_channel_viewers", get_channel_viewers)
+    assert len(list(client.iter_channel_viewers(1, limit=3))) == 7
+    assert pages.fetched == [0, 1, 2]
+    client.close()
+
+
+def collect(iterator, limit=None):
+    async def run():
+        seen = []
+        async for item in iterator:
+            seen.append(item)
+            if len(seen) == limit:
+                break
+        await iterator.aclose()
+        return seen
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_async_stops_at_total_page_and_short_page(prefetch):
+    pages = Pages([2, 2, 2])
+    assert len(collect(aiter_pages(pages.afetch, items, by_total_page, prefetch))) == 6
+    assert pages.fetched == [0, 1, 2]
+    pages = Pages([2, 1], short=True)
+    assert len(collect(aiter_pages(pages.afetch, items, short_page(2), prefetch))) == 3
+    assert pages.fetched == [0, 1]
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_async_error_is_raised_after_the_previous_page(prefetch):
+    pages = Pages([2, 2, 2], broken=1)
+    seen = []
+
+    async def run():
+        async for item in aiter_pages(pages.afetch, items, by_total_page, prefetch):
+            seen.append(item)
+
+    with pytest.raises(RuntimeError, match="page 1"):
+        asyncio.run(run())
+    assert seen == [(0, 0), (0, 1)]
+
+
+def test_async_early_stop_retrieves_prefetch_error():
+    pages = Pages([2, 2], broken=1)
+    errors = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(
+            lambda loop, context: errors.append(context)
+        )
+        iterator = aiter_pages(pages.afetch, items, by_total_page)
+        async for _ in iterator:
+            await asyncio.sleep(0.01)
+            break
+        await iterator.aclose()
+        del iterator
+        gc.collect()
+
+    asyncio.run(run())
+    assert pages.fetched == [0, 1]
+    assert errors == []
+
+
+def test_async_client_followers_stop_at_total_page(monkeypatch):
+    pages = Pages([2, 2])
+
+    async def get_channel_followers(channel_id, limit, cursor, direction):
+        page = pages.page(cursor)
+        return SimpleNamespace(follower=page.items, total_page=page.total_page)
+
+    client = AsyncTrovoClient("x")
+    monkeypatch.setattr(client, "get_channel_followers", get_channel_followers)
+    assert len(collect(client.iter_channel_followers(1, limit=2))) == 4
+    assert pages.fetched == [0, 1]
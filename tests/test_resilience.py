@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from trovo.client.resilience import CircuitOpenError, Resilience
+
+URL = "https://open-api.trovo.live/openplatform/getusers"
+
+
+class Response:
+    status_code = 200
+    headers = {}
+
+
+def open_breaker(resilience):
+    def refused():
+        raise requests.exceptions.ConnectionError()
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        resilience.call(URL, refused)
+    with pytest.raises(CircuitOpenError):
+        resilience.call(URL, Response)
+    time.sleep(0.02)
+
+
+@pytest.mark.parametrize("error", [ValueError, KeyboardInterrupt])
+def test_unexpected_error_in_trial_does_not_keep_circuit_open(error):
+    resilience = Resilience(retry=None, failure_threshold=1, recovery_time=0.01)
+    open_breaker(resilience)
+
+    def broken():
+        raise error()
+
+    with pytest.raises(error):
+        resilience.call(URL, broken)
+    assert isinstance(resilience.call(URL, Response), Response)
+    assert resilience.breaker(URL).state == "closed"
+
+
+def test_cancelled_trial_does_not_keep_circuit_open():
+    resilience = Resilience(retry=None, failure_threshold=1, recovery_time=0.01)
+    open_breaker(resilience)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def ok():
+        return Response()
+
+    async def run():
+        task = asyncio.ensure_future(resilience.call_async(URL, hang))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await resilience.call_async(URL, ok)
+
+    assert isinstance(asyncio.run(run()), Response)
+
+
+def test_cancelled_hedged_call_cancels_both_requests():
+    resilience = Resilience(retry=None, hedge_after=0.01)
+    started = []
+
+    async def hang():
+        task = asyncio.current_task()
+        started.append(task)
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.ensure_future(resilience.call_async(URL, hang))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+        assert len(started) == 2
+        assert all(task.cancelled() for task in started)
+
+    asyncio.run(run())
+
+
+def attempts(*outcomes):
+    """send() whose n-th call waits, then returns a Response or raises."""
+    calls = iter(outcomes)
+
+    def send():
+        delay, error = next(calls)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return Response()
+
+    async def send_async():
+        delay, error = next(calls)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return Response()
+
+    return send, send_async
+
+
+def test_hedged_call_waits_for_a_success():
+    resilience = Resilience(retry=None, failure_threshold=None, hedge_after=0.01)
+    failure = (0.03, requests.exceptions.ConnectionError("first"))
+    send, send_async = attempts(failure, (0.05, None))
+    assert isinstance(resilience.call(URL, send), Response)
+    send, send_async = attempts(failure, (0.05, None))
+    assert isinstance(asyncio.run(resilience.call_async(URL, send_async)), Response)
+    resilience.close()
+
+
+def test_hedged_call_fails_when_both_attempts_fail():
+    resilience = Resilience(retry=None, failure_threshold=None, hedge_after=0.01)
+    first = (0.03, requests.exceptions.ConnectionError("first"))
+    second = (0.01, requests.exceptions.ConnectionError("second"))
+    send, _ = attempts(first, second)
+    with pytest.raises(requests.exceptions.ConnectionError, match="first"):
+        resilience.call(URL, send)
+    _, send_async = attempts(first, second)
+    with pytest.raises(requests.exceptions.ConnectionError, match="first"):
+        asyncio.run(resilience.call_async(URL, send_async))
+    resilience.close()
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from trovo.chat.send_queue import SendQueue
+from trovo.metrics import Metrics
+
+
+class Trovo:
+    """Records (time, content, channel); sends wait while ``gate`` is clear."""
+
+    def __init__(self):
+        self.sent = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+
+    def send_chat_to_selected_channel(self, content, channel_id):
+        self.started.set()
+        self.gate.wait(5)
+        if content == "boom":
+            raise RuntimeError("boom")
+        self.sent.append((time.monotonic(), content, channel_id))
+
+
+def queue(trovo, **options):
+    options.setdefault("metrics", Metrics())
+    return SendQueue(trovo, **options)
+
+
+def test_each_channel_has_its_own_rate_limit():
+    trovo = Trovo()
+    sends = queue(trovo, workers=2, rate=20, burst=1)
+    for content in ("a", "b", "c"):
+        sends.put(content, 1)
+    sends.put("x", 2)
+    assert sends.join(timeout=2)
+    sends.close()
+    times = {content: at for at, content, _ in trovo.sent}
+    assert times["c"] - times["a"] >= 0.09
+    assert times["b"] - times["a"] >= 0.04
+    # Channel 2 does not wait for the backlog of channel 1.
+    assert times["x"] < times["b"]
+
+
+def test_identical_pending_messages_are_coalesced():
+    trovo = Trovo()
+    sends = queue(trovo, workers=0)
+    assert sends.put("hi", 1)
+    assert sends.put("hi", 1)
+    assert sends.put("hi", 2)
+    assert sends.put("bye", 1)
+    stats = sends.stats()
+    assert (stats["queued"], stats["coalesced"], stats["depth"]) == (3, 1, 3)
+    sends.close(drain=False)
+
+
+def test_coalescing_can_be_turned_off():
+    sends = queue(Trovo(), workers=0, coalesce=False)
+    sends.put("hi", 1)
+    sends.put("hi", 1)
+    assert sends.stats()["depth"] == 2
+    sends.close(drain=False)
+
+
+def test_channels_take_turns():
+    trovo = Trovo()
+    trovo.gate.clear()
+    sends = queue(trovo, workers=1, burst=10)
+    sends.put("first", 1)
+    assert trovo.started.wait(2)
+    for content in ("a1", "a2", "a3"):
+        sends.put(content, 1)
+    sends.put("b1", 2)
+    sends.put("b2", 2)
+    trovo.gate.set()
+    assert sends.join(timeout=2)
+    sends.close()
+    assert [content for _, content, _ in trovo.sent] == [
+        "first",
+        "a1",
+        "b1",
+        "a2",
+        "b2",
+        "a3",
+    ]
+
+
+def test_full_queue_drops():
+    sends = queue(Trovo(), workers=0, maxsize=2)
+    assert sends.put("a", 1)
+    assert sends.put("b", 1)
+    assert not sends.put("c", 2, timeout=0.01)
+    assert sends.stats()["dropped"] == 1
+    sends.close(drain=False)
+
+
+def test_close_drains_or_discards():
+    trovo = Trovo()
+    sends = queue(trovo, rate=1000, burst=10)
+    for content in ("a", "boom", "b"):
+        sends.put(content, 1)
+    sends.close()
+    assert [content for _, content, _ in trovo.sent] == ["a", "b"]
+    stats = sends.stats()
+    assert (stats["sent"], stats["failed"], stats["depth"]) == (2, 1, 0)
+    assert not any(thread.is_alive() for thread in sends.threads)
+    with pytest.raises(RuntimeError):
+        sends.put("late", 1)
+
+    trovo = Trovo()
+    trovo.gate.clear()
+    sends = queue(trovo, workers=1)
+    sends.put("a", 1)
+    assert trovo.started.wait(2)
+    sends.put("b", 1)
+    sends.put("c", 2)
+    threading.Timer(0.05, trovo.gate.set).start()
+    sends.close(drain=False)
+    assert [content for _, content, _ in trovo.sent] == ["a"]
+    assert sends.stats()["dropped"] == 2
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+
+from trovo.client.token_manager import TokenManager
+from trovo.client.trovo_client import TrovoClient
+
+
+@pytest.fixture(autouse=True)
+def managers(monkeypatch):
+    monkeypatch.setattr(TokenManager, "managers", {})
+
+
+def test_accounts_of_one_application_get_their_own_manager():
+    first = TokenManager.shared("app", "token-a")
+    second = TokenManager.shared("app", "token-b")
+    assert first is not second
+    assert TokenManager.shared("app", "token-a") is first
+    assert first.cache is not second.cache
+
+
+def test_attach_keeps_the_token_of_another_account():
+    manager = TokenManager.shared("app", "token-a")
+    other = TrovoClient("app", "token-b")
+    with pytest.raises(ValueError):
+        manager.attach(other)
+    assert other.access_token == "token-b"
+    assert other not in manager.clients
+
+    anonymous = TrovoClient("app")
+    manager.attach(anonymous)
+    assert anonymous.access_token == "token-a"
+
+
+def test_refreshed_token_maps_to_the_same_manager():
+    manager = TokenManager.shared(
+        "app", "token-a", refresh_token="refresh", client_secret="secret"
+    )
+    manager.trovo.refresh_access_token = lambda secret, refresh: SimpleNamespace(
+        access_token="token-a2", refresh_token="refresh2", expires_in=3600
+    )
+    chat_client = TrovoClient("app", "token-a")
+    manager.attach(chat_client)
+    manager.refresh()
+    manager.close()
+    assert chat_client.access_token == "token-a2"
+    assert TokenManager.shared("app", "token-a2") is manager
+    manager.attach(TrovoClient("app", "token-a"))
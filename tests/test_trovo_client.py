@@ -0,0 +1,58 @@
+import asyncio
+
+from trovo.client.async_trovo_client import AsyncTrovoClient
+from trovo.client.endpoints import GAME_CATEGORIES_URL
+from trovo.client.resilience import RetryPolicy, Resilience
+from trovo.client.trovo_client import TrovoClient
+from trovo.metrics import InMemoryMetrics
+
+ENDPOINT = Resilience.endpoint(GAME_CATEGORIES_URL)
+
+
+class Response:
+    headers = {}
+
+    def __init__(self, status):
+        self.status_code = self.status = status
+
+    async def read(self):
+        return b"{}"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class Session:
+    """Answers 503 once, then 200."""
+
+    closed = False
+
+    def __init__(self):
+        self.statuses = [503, 200]
+
+    def request(self, method, url, **kwargs):
+        return Response(self.statuses.pop(0))
+
+    def close(self):
+        pass
+
+
+def test_default_resilience_reports_to_client_metrics():
+    metrics = InMemoryMetrics()
+    client = TrovoClient("x", metrics=metrics, session=Session())
+    assert client.resilience.metrics is metrics
+    client.resilience.retry = RetryPolicy(backoff=0.001)
+    assert client._get(GAME_CATEGORIES_URL).status_code == 200
+    assert metrics.counter("api_retries_total", endpoint=ENDPOINT) == 1
+
+
+def test_async_default_resilience_reports_to_client_metrics():
+    metrics = InMemoryMetrics()
+    client = AsyncTrovoClient("x", metrics=metrics, session=Session())
+    assert client.resilience.metrics is metrics
+    client.resilience.retry = RetryPolicy(backoff=0.001)
+    assert asyncio.run(client._request("GET", GAME_CATEGORIES_URL)) == {}
+    assert metrics.counter("api_retries_total", endpoint=ENDPOINT) == 1
@@ -0,0 +1,50 @@
+import asyncio
+import gc
+from types import SimpleNamespace
+
+from trovo.client.user_loader import AsyncUserLoader
+
+
+class Client:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_users_by_username(self, usernames):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        gc.collect()
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(
+            users=[SimpleNamespace(username=name.upper()) for name in usernames]
+        )
+
+
+def test_async_batch_survives_garbage_collection():
+    client = Client()
+    loader = AsyncUserLoader(client, window=0.001)
+
+    async def run():
+        users = await asyncio.wait_for(loader.load_many(["a", "b", "a"]), 1)
+        assert not loader._tasks
+        return users
+
+    users = asyncio.run(run())
+    assert [user.username for user in users] == ["A", "B", "A"]
+    assert client.calls == 1
+
+
+def test_cancelled_batch_cancels_waiting_loads():
+    loader = AsyncUserLoader(Client(), window=0.001)
+
+    async def run():
+        load = asyncio.ensure_future(loader.load("a"))
+        await asyncio.sleep(0.005)
+        for task in list(loader._tasks):
+            task.cancel()
+        try:
+            await asyncio.wait_for(load, 1)
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(run())
@@ -0,0 +1,159 @@
+import asyncio
+
+from trovo.client.viewer_watcher import Interner, ViewerWatcher
+from trovo.metrics import InMemoryMetrics
+
+
+class Trovo:
+    """Serves ``channels[channel_id]`` (viewers and {name: roles}) in pages."""
+
+    def __init__(self):
+        self.channels = {}
+        self.requests = []
+        self.total_page = True
+
+    def set(self, channel_id, viewers, roles=None):
+        self.channels[channel_id] = (list(viewers), roles or {})
+
+    async def get_channel_viewers(self, channel_id, limit, cursor, raw):
+        assert raw
+        self.requests.append((channel_id, cursor))
+        viewers, roles = self.channels[channel_id]
+        names = viewers[cursor * limit : (cursor + 1) * limit]
+        chatters = {"all": {"viewers": names}}
+        custom = {}
+        for name in names:
+            for role in roles.get(name, ()):
+                group = chatters if role.islower() or role == "VIPS" else custom
+                group.setdefault(role, {"viewers": []})["viewers"].append(name)
+        page = {"chatters": chatters, "custome_roles": custom}
+        if self.total_page:
+            page["total_page"] = max(1, -(-len(viewers) // limit))
+        return page
+
+
+def watcher(trovo, **options):
+    options.setdefault("metrics", InMemoryMetrics())
+    return ViewerWatcher(trovo, page_size=2, rate=1000, burst=1000, **options)
+
+
+def poll(watch, channel_id=1):
+    return asyncio.run(watch.poll(channel_id))
+
+
+def test_first_poll_is_the_baseline():
+    trovo = Trovo()
+    trovo.set(1, ["a", "b", "c"], {"a": ["moderators"]})
+    watch = watcher(trovo)
+    watch.watch(1)
+    delta = poll(watch)
+    assert not delta
+    assert watch.viewers(1) == {"a", "b", "c"}
+    assert watch.roles_of(1, "a") == {"moderators"}
+    assert watch.channels[1].pages == 2
+
+
+def test_joins_leaves_and_role_changes():
+    trovo = Trovo()
+    trovo.set(1, ["a", "b", "c"], {"a": ["moderators"], "b": ["subscribers"]})
+    watch = watcher(trovo)
+    watch.watch(1)
+    poll(watch)
+    trovo.set(
+        1,
+        ["a", "b", "d"],
+        {"a": ["moderators", "VIPS"], "d": ["Custom"]},
+    )
+    delta = poll(watch)
+    assert delta.joined == ["d"]
+    assert delta.left == ["c"]
+    assert delta.joined_roles == {"d": {"Custom"}}
+    assert delta.roles_changed == {
+        "a": ({"moderators"}, {"moderators", "VIPS"}),
+        "b": ({"subscribers"}, frozenset()),
+    }
+    assert not poll(watch)
+    assert watch.metrics.counter("viewer_joins_total") == 1
+
+
+def test_names_are_shared_and_released():
+    trovo = Trovo()
+    trovo.set(1, ["a", "b"])
+    trovo.set(2, ["b", "c"])
+    watch = watcher(trovo)
+    for channel_id in (1, 2):
+        watch.watch(channel_id)
+        poll(watch, channel_id)
+    assert watch.interner.refs == {"a": 1, "b": 2, "c": 1}
+    watch.unwatch(1)
+    assert watch.interner.refs == {"b": 1, "c": 1}
+    trovo.set(2, ["c"])
+    poll(watch, 2)
+    watch.unwatch(2)
+    assert len(watch.interner) == 0
+    assert watch.interner.refs == {}
+
+
+def test_interner_returns_one_object_per_name():
+    interner = Interner()
+    first = interner.acquire(["".join(["na", "me"])])[0]
+    second = interner.acquire(["".join(["nam", "e"])])[0]
+    assert first is second
+    interner.release([first, second])
+    assert len(interner) == 0
+
+
+def test_pages_end_on_a_short_page_without_total_page():
+    trovo = Trovo()
+    trovo.total_page = False
+    trovo.set(1, ["a", "b", "c", "d", "e"])
+    watch = watcher(trovo)
+    watch.watch(1)
+    poll(watch)
+    assert trovo.requests == [(1, 0), (1, 1), (1, 2)]
+    assert len(watch.viewers(1)) == 5
+
+
+def test_max_pages_truncation_reports_no_leaves():
+    trovo = Trovo()
+    trovo.set(1, ["a", "b", "c", "d", "e"], {"a": ["moderators"]})
+    watch = watcher(trovo, max_pages=2)
+    watch.watch(1)
+    poll(watch)
+    assert trovo.requests == [(1, 0), (1, 1)]
+    assert watch.viewers(1) == {"a", "b", "c", "d"}
+
+    # "a" moved to the third page, which is not read.
+    trovo.set(1, ["x", "b", "c", "d", "a"], {"a": ["moderators"]})
+    delta = poll(watch)
+    assert delta.joined == ["x"]
+    assert delta.left == []
+    assert watch.roles_of(1, "a") == {"moderators"}
+    assert watch.viewers(1) == {"a", "b", "c", "d", "x"}
+    assert watch.metrics.counter("viewer_truncated_polls_total") == 2
+
+    watch.max_pages = 50
+    trovo.set(1, ["b", "c", "d", "x", "a"], {"a": ["moderators"]})
+    delta = poll(watch)
+    assert (delta.joined, delta.left, delta.roles_changed) == ([], [], {})
+
+
+def test_run_polls_and_reports_deltas():
+    trovo = Trovo()
+    trovo.set(1, ["a"])
+    deltas = []
+    watch = watcher(trovo, on_delta=deltas.append, min_interval=0.01)
+
+    async def run():
+        watch.watch(1)
+        task = asyncio.ensure_future(watch.run())
+        while not watch.channels[1].polls:
+            await asyncio.sleep(0.005)
+        trovo.set(1, ["a", "b"])
+        while not deltas:
+            await asyncio.sleep(0.005)
+        watch.stop()
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(run())
+    assert deltas[0].joined == ["b"]
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import string
+import time
+from typing import Callable, Iterable, Optional
+
+from trovo.client.async_trovo_client import AsyncTrovoClient
+from trovo.client.endpoints import CHAT_WS_URL
+from trovo.client.helper_functions import LazyModule
+from trovo.client.resilience import RetryPolicy
+from trovo.chat.chat_log import ChatLogWriter
+from trovo.chat.command_executor import AsyncCommandExecutor
+from trovo.chat.command_handler import CommandHandler
+from trovo.chat.helper_functions import frame_type, json_loads
+from trovo.chat.message import ChatMessage, ChatPipeline, ReplayFilter
+from trovo.chat.moderation import Moderator
+from trovo.metrics import Metrics, SampledLogger
+
+log = logging.getLogger(__name__)
+
+aiohttp = LazyModule("aiohttp")
+
+__all__ = ["AsyncTrovoChat", "run_chats"]
+
+
+class AsyncTrovoChat:
+    """Chat connection for one channel running on the asyncio event loop.
+
+    Many instances can share one :class:`AsyncTrovoClient` (and so one
+    connection pool) and run side by side with :func:`run_chats`; each
+    connection costs two tasks instead of two OS threads. Websockets are
+    long-lived, so they are opened from ``ws_session`` rather than the API
+    pool, where they would starve the REST calls of connections.
+    Metrics go to ``metrics``, by default those of the client. Chats go
+    through ``moderator`` and are appended to ``chat_log`` if given; both
+    can be shared by several chats.
+    """
+
+    def __init__(
+        self,
+        trovo: AsyncTrovoClient,
+        channel_id: Optional[int],
+        handler: Optional[CommandHandler] = None,
+        *,
+        url: str = CHAT_WS_URL,
+        ping_interval: float = 30.0,
+        ws_session: Optional[aiohttp.ClientSession] = None,
+        reconnect: bool = True,
+        backoff: Optional[RetryPolicy] = None,
+        metrics: Optional[Metrics] = None,
+        frame_log_rate: float = 0.0,
+        chat_log: Optional[ChatLogWriter] = None,
+        moderator: Optional[Moderator] = None,
+    ):
+        self.token = None
+        self.trovo = trovo
+        self.channel_id = channel_id
+        self.metrics = metrics or trovo.metrics
+        self.frame_log = SampledLogger(log, frame_log_rate)
+        if handler is None and channel_id is not None:
+            handler = CommandHandler(
+                self.trovo,
+                self.channel_id,
+                executor=AsyncCommandExecutor(metrics=self.metrics),
+                metrics=self.metrics,
+            )
+        self.handler = handler
+        self.replay_filter = ReplayFilter()
+        self.pipeline = ChatPipeline(
+            [handler.handle] if handler is not None else [],
+            [self.replay_filter, self.count_message],
+        )
+        self.moderator = moderator
+        if moderator is not None:
+            if moderator.trovo is None:
+                moderator.trovo = self.trovo
+            self.pipeline.add_filter(moderator)
+        self.chat_log = chat_log
+        if chat_log is not None:
+            self.pipeline.add_handler(chat_log.append)
+        self.url = url
+        self.ping_interval = ping_interval
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.ws_session = ws_session
+        self._owns_ws_session = ws_session is None
+        self.reconnect = reconnect
+        self.backoff = backoff or RetryPolicy(backoff=1.0, max_backoff=60.0)
+        self.closed = False
+        self.failures = 0
+        self.reconnects = 0
+
+    async def generate_chat_token(self):
+        response = await self.trovo.get_chat_channel_token(self.channel_id)
+        self.token = response["token"]
+
+    def generate_nonce(self, length: int = 8):
+        """Generate pseudorandom number."""
+        return "".join(
+            random.choice(string.ascii_uppercase + string.digits) for _ in range(length)
+        )
+
+    async def send_frame(self, data: dict):
+        await self.ws.send_str(json.dumps(data))
+
+    async def authenticate(self):
+        await self.send_frame(
+            {
+                "type": "AUTH",
+                "nonce": self.generate_nonce(),
+                "data": {"token": self.token},
+            }
+        )
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await self.send_frame({"type": "PING", "nonce": self.generate_nonce()})
+
+    def count_message(self, message: ChatMessage) -> bool:
+        self.metrics.inc("chat_messages_total", channel_id=message.channel_id)
+        return True
+
+    def dispatch(self, frame: dict):
+        self.pipeline.process_frame(frame)
+
+    async def on_message(self, message: str):
+        self.frame_log.log(logging.DEBUG, "Frame: %s", message)
+        kind = frame_type(message)
+        self.metrics.inc("chat_frames_total", type=kind)
+        if kind == "CHAT":
+            start = time.perf_counter()
+            frame = json_loads(message)
+            parsed = time.perf_counter()
+            self.dispatch(frame)
+            self.metrics.observe("chat_frame_parse_seconds", parsed - start)
+            self.metrics.observe("chat_dispatch_seconds", time.perf_counter() - parsed)
+        elif kind == "PONG":
+            # The server tells us when it expects the next PING.
+            gap = json_loads(message).get("data", {}).get("gap")
+            if gap:
+                self.ping_interval = gap
+        elif kind == "RESPONSE":
+            error = json_loads(message).get("error")
+            if error:
+                # AUTH was refused: drop cached tokens so the next connect
+                # fetches fresh ones.
+                log.warning("Chat AUTH refused: %s", error)
+                if self.trovo.tokens is not None:
+                    self.trovo.tokens.invalidate_chat_tokens()
+                await self.ws.close()
+            else:
+                self.failures = 0
+
+    async def receive(self):
+        async for msg in self.ws:
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                try:
+                    await self.on_message(msg.data)
+                except Exception:
+                    self.metrics.inc("chat_errors_total")
+                    log.debug("Failed to process frame", exc_info=True)
+            elif msg.type == aiohttp.WSMsgType.ERROR:
+                log.warning("Chat websocket error: %s", self.ws.exception())
+                break
+
+    async def connect(self):
+        # The token is fetched (or taken from the token cache) before the
+        # handshake, so AUTH goes out as soon as the socket is open.
+        await self.generate_chat_token()
+        async with self.ws_session.ws_connect(self.url) as ws:
+            self.ws = ws
+            await self.authenticate()
+            heartbeat = asyncio.create_task(self.heartbeat())
+            try:
+                await self.receive()
+            finally:
+                heartbeat.cancel()
+                self.ws = None
+
+    async def run_forever(self):
+        """Stay connected, reconnecting with backoff until :meth:`close`."""
+        if self.ws_session is None or self.ws_session.closed:
+            self.ws_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0)
+            )
+        while not self.closed:
+            try:
+                await self.connect()
+            except Exception as e:
+                log.warning("Chat connection failed: %s", e)
+            if not self.reconnect or self.closed:
+                return
+            delay = self.backoff.delay(min(self.failures, 16))
+            self.failures += 1
+            self.reconnects += 1
+            self.metrics.inc("chat_reconnects_total", channel_id=self.channel_id)
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        self.closed = True
+        if self.ws is not None:
+            await self.ws.close()
+        if self._owns_ws_session and self.ws_session is not None:
+            await self.ws_session.close()
+
+
+async def run_chats(
+    trovo: AsyncTrovoClient,
+    channel_ids: Iterable[int],
+    handler_factory: Optional[Callable[[int], CommandHandler]] = None,
+):
+    """Run one chat connection per channel concurrently on the current loop."""
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=0)
+    ) as ws_session:
+        chats = [
+            AsyncTrovoChat(
+                trovo,
+                channel_id,
+                handler_factory(channel_id) if handler_factory else None,
+                ws_session=ws_session,
+            )
+            for channel_id in channel_ids
+        ]
+        await asyncio.gather(*(chat.run_forever() for chat in chats))
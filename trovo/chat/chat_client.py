@@ -1,19 +1,106 @@
-import websocket
+from __future__ import annotations
+
 import json
+import logging
 import threading
-import time
 import random
+import time
 import string
+from typing import Optional
+from trovo.client.endpoints import CHAT_WS_URL
+from trovo.client.helper_functions import LazyModule
+from trovo.client.resilience import RetryPolicy
+from trovo.client.token_manager import TokenManager
 from trovo.client.trovo_client import TrovoClient
+from trovo.metrics import Metrics, SampledLogger, get_metrics
+from trovo.chat.chat_log import ChatLogWriter
+from trovo.chat.command_executor import CommandExecutor
 from trovo.chat.command_handler import CommandHandler
-from trovo.chat.helper_functions import extract_message_type_contents
+from trovo.chat.send_queue import SendQueue
+from trovo.chat.helper_functions import frame_type, json_loads
+from trovo.chat.message import ChatMessage, ChatPipeline, ReplayFilter
+from trovo.chat.moderation import Moderator
+
+log = logging.getLogger(__name__)
+
+# Imported on first connect, tools using only the pipeline never need it.
+websocket = LazyModule("websocket")
+
+__all__ = ["TrovoChat"]
+
 
 class TrovoChat:
-    def __init__(self, client_id: str, access_token: str, channel_id: int):
+    """Chat bot for one channel, reconnecting until :meth:`close` is called.
+
+    After a dropped connection it waits a jittered, exponentially growing
+    delay (``backoff``, reset once the server accepts AUTH) and connects
+    again with the chat token fetched in the meantime. Chats replayed by
+    the server on reconnect are skipped by ``replay_filter``.
+
+    Frames, parse/dispatch latency and reconnects are reported to
+    ``metrics``; raw frames are logged at DEBUG for a ``frame_log_rate``
+    fraction of them only. A ``moderator`` filters chats before the
+    command handler; chats that pass the filters are appended to
+    ``chat_log`` when given. The caller owns (and closes) both.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        access_token: str,
+        channel_id: int,
+        *,
+        url: str = CHAT_WS_URL,
+        reconnect: bool = True,
+        backoff: Optional[RetryPolicy] = None,
+        ping_interval: float = 30.0,
+        metrics: Optional[Metrics] = None,
+        frame_log_rate: float = 0.0,
+        chat_log: Optional[ChatLogWriter] = None,
+        moderator: Optional[Moderator] = None,
+    ):
         self.token = None
+        self.metrics = metrics or get_metrics()
+        self.frame_log = SampledLogger(log, frame_log_rate)
         self.channel_id = channel_id
-        self.trovo = TrovoClient(client_id=client_id, access_token=access_token)
-        self.handler = CommandHandler(self.trovo, self.channel_id)
+        self.trovo = TrovoClient(
+            client_id=client_id, access_token=access_token, metrics=self.metrics
+        )
+        # Shared with every chat of this account (client_id and token): one
+        # refresh timer and one chat token cache, so reconnects reuse the
+        # cached channel token.
+        self.tokens = TokenManager.shared(client_id, access_token)
+        self.tokens.attach(self.trovo)
+        self.send_queue = SendQueue(self.trovo, metrics=self.metrics)
+        self.executor = CommandExecutor(metrics=self.metrics)
+        self.handler = CommandHandler(
+            self.trovo,
+            self.channel_id,
+            self.send_queue,
+            self.executor,
+            metrics=self.metrics,
+        )
+        self.replay_filter = ReplayFilter()
+        self.pipeline = ChatPipeline(
+            [self.handler.handle], [self.replay_filter, self.count_message]
+        )
+        self.moderator = moderator
+        if moderator is not None:
+            if moderator.trovo is None:
+                moderator.trovo = self.trovo
+            self.pipeline.add_filter(moderator)
+        self.chat_log = chat_log
+        if chat_log is not None:
+            self.pipeline.add_handler(chat_log.append)
+        self.url = url
+        self.reconnect = reconnect
+        self.backoff = backoff or RetryPolicy(backoff=1.0, max_backoff=60.0)
+        self.ping_interval = ping_interval
+        self.ws: Optional[websocket.WebSocketApp] = None
+        self.heartbeat_stop: Optional[threading.Event] = None
+        self.stopped = threading.Event()
+        self.failures = 0
+        self.reconnects = 0
 
     def generate_chat_token(self):
         response = self.trovo.get_chat_channel_token(self.channel_id)
@@ -25,47 +112,112 @@ class TrovoChat:
             random.choice(string.ascii_uppercase + string.digits) for _ in range(length)
         )
 
+    def count_message(self, message: ChatMessage) -> bool:
+        self.metrics.inc("chat_messages_total", channel_id=message.channel_id)
+        return True
+
     def on_message(self, ws, message):
-        print(message)
+        self.frame_log.log(logging.DEBUG, "Frame: %s", message)
+        kind = frame_type(message)
+        self.metrics.inc("chat_frames_total", type=kind)
+        if kind == "RESPONSE":
+            error = json_loads(message).get("error")
+            if error:
+                # AUTH was refused: reconnect with a freshly fetched token.
+                log.warning("Chat AUTH refused: %s", error)
+                self.tokens.invalidate_chat_tokens()
+                ws.close()
+            else:
+                self.failures = 0
+            return
+        if kind == "PONG":
+            gap = json_loads(message).get("data", {}).get("gap")
+            if gap:
+                self.ping_interval = gap
+            return
+        if kind != "CHAT":
+            return
+        start = time.perf_counter()
         try:
-            username, content = extract_message_type_contents(message)  # type: ignore
-            print(username, content)
-            self.handler.select_command(username, content)
-        except Exception as e:
-            pass
+            frame = json_loads(message)
+            parsed = time.perf_counter()
+            self.pipeline.process_frame(frame)
+        except Exception:
+            self.metrics.inc("chat_errors_total")
+            log.debug("Failed to process frame", exc_info=True)
+            return
+        self.metrics.observe("chat_frame_parse_seconds", parsed - start)
+        self.metrics.observe("chat_dispatch_seconds", time.perf_counter() - parsed)
 
     def on_error(self, ws, error):
-        print("Error: " + str(error))
+        log.warning("Chat websocket error: %s", error)
 
-    def on_close(self, ws):
-        print("### Connection closed ###")
+    def on_close(self, ws, close_status_code=None, close_msg=None):
+        log.info("Chat connection closed (%s %s)", close_status_code, close_msg)
+        if self.heartbeat_stop is not None:
+            self.heartbeat_stop.set()
 
-    def on_open(self, ws):
-        def run():
-            # Authentication
-            self.generate_chat_token()
-            auth_data = {
-                "type": "AUTH",
-                "nonce": self.generate_nonce(),
-                "data": {"token": self.token},
-            }
-            ws.send(json.dumps(auth_data))
-
-            # Keeping connection alive
-            while True:
-                time.sleep(30)
-                ping_data = {"type": "PING", "nonce": self.generate_nonce()}
+    def heartbeat(self, ws, stop: threading.Event):
+        # Keeping connection alive
+        while not stop.wait(self.ping_interval):
+            ping_data = {"type": "PING", "nonce": self.generate_nonce()}
+            try:
                 ws.send(json.dumps(ping_data))
+            except websocket.WebSocketException:
+                return
 
-        threading.Thread(target=run).start()
+    def on_open(self, ws):
+        # Authentication, with the token fetched before connecting
+        auth_data = {
+            "type": "AUTH",
+            "nonce": self.generate_nonce(),
+            "data": {"token": self.token},
+        }
+        ws.send(json.dumps(auth_data))
 
-    def run_forever(self):
-        websocket.enableTrace(False)
-        ws = websocket.WebSocketApp(
-            "wss://open-chat.trovo.live/chat",
+        self.heartbeat_stop = threading.Event()
+        threading.Thread(
+            target=self.heartbeat, args=(ws, self.heartbeat_stop), daemon=True
+        ).start()
+
+    def connect(self):
+        self.generate_chat_token()
+        self.ws = websocket.WebSocketApp(
+            self.url,
             on_message=self.on_message,
             on_error=self.on_error,
             on_close=self.on_close,
         )
-        ws.on_open = self.on_open
-        ws.run_forever()
+        self.ws.on_open = self.on_open
+        # No websocket-level pings (Trovo uses PING frames); ping_timeout only
+        # wakes the read loop every second so a close() from another thread
+        # is noticed.
+        self.ws.run_forever(ping_timeout=1)
+
+    def run_forever(self):
+        websocket.enableTrace(False)
+        try:
+            self.tokens.start()
+        except Exception as e:
+            log.warning("Could not validate the access token: %s", e)
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self.connect()
+                except Exception as e:
+                    log.warning("Chat connection failed: %s", e)
+                if not self.reconnect or self.stopped.is_set():
+                    break
+                delay = self.backoff.delay(min(self.failures, 16))
+                self.failures += 1
+                self.reconnects += 1
+                self.metrics.inc("chat_reconnects_total", channel_id=self.channel_id)
+                self.stopped.wait(delay)
+        finally:
+            self.executor.shutdown()
+            self.send_queue.close()
+
+    def close(self):
+        self.stopped.set()
+        if self.ws is not None:
+            self.ws.close()
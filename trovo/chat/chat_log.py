@@ -0,0 +1,534 @@
+import bisect
+import logging
+import mmap
+import os
+import threading
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from trovo.client.helper_functions import json_dumps, json_loads
+from trovo.metrics import Metrics, get_metrics
+from trovo.chat.message import ChatMessage
+
+log = logging.getLogger(__name__)
+
+__all__ = [
+    "SEGMENT_SUFFIX",
+    "INDEX_SUFFIX",
+    "LOCK_FILE",
+    "ROW",
+    "MISSING",
+    "encode",
+    "decode",
+    "index_row",
+    "segment_path",
+    "list_segments",
+    "scan_segment",
+    "write_index",
+    "lock_directory",
+    "seal_segment",
+    "ChatLogWriter",
+    "Segment",
+    "ChatLogReader",
+]
+
+SEGMENT_SUFFIX = ".log"
+INDEX_SUFFIX = ".idx"
+LOCK_FILE = "writer.lock"
+# An index holds one (offset, send_time, channel_id, uid) row of int64 per
+# record; missing values are stored as -1.
+ROW = 4
+MISSING = -1
+
+
+def encode(message: ChatMessage) -> bytes:
+    """One NDJSON line: the ChatMessage fields as an array, in slot order."""
+    return (
+        json_dumps([getattr(message, slot) for slot in ChatMessage.__slots__]) + b"\n"
+    )
+
+
+def decode(line: bytes) -> ChatMessage:
+    return ChatMessage(*json_loads(line))
+
+
+def _int(value) -> int:
+    if value is None:
+        return MISSING
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def index_row(offset: int, message: ChatMessage) -> Tuple[int, int, int, int]:
+    return (
+        offset,
+        _int(message.send_time),
+        _int(message.channel_id),
+        _int(message.uid),
+    )
+
+
+def segment_path(directory: str, number: int) -> str:
+    return os.path.join(directory, f"{number:010d}{SEGMENT_SUFFIX}")
+
+
+def list_segments(directory: str) -> List[int]:
+    return sorted(
+        int(name[: -len(SEGMENT_SUFFIX)])
+        for name in os.listdir(directory)
+        if name.endswith(SEGMENT_SUFFIX) and name[: -len(SEGMENT_SUFFIX)].isdigit()
+    )
+
+
+def scan_segment(data, start: int = 0) -> Tuple[array, int]:
+    """Index the complete records of ``data`` from ``start``.
+
+    Returns the index rows and the offset just past the last complete
+    record; an unreadable record is skipped with a warning.
+    """
+    index = array("q")
+    offset = start
+    while True:
+        newline = data.find(b"\n", offset)
+        if newline < 0:
+            return index, offset
+        try:
+            index.extend(index_row(offset, decode(data[offset:newline])))
+        except (TypeError, ValueError):
+            log.warning("Skipping unreadable chat log record at offset %d", offset)
+        offset = newline + 1
+
+
+def write_index(path: str, index: array):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        index.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def lock_directory(directory: str):
+    """Lock ``directory`` for one writer; the lock ends when the file closes."""
+    lock = open(os.path.join(directory, LOCK_FILE), "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock.close()
+        raise RuntimeError(f"{directory} is used by another ChatLogWriter") from None
+    return lock
+
+
+def seal_segment(path: str) -> array:
+    """Cut a torn last record off ``path`` and write its index next to it."""
+    with open(path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                index, end = scan_segment(data)
+        else:
+            index, end = array("q"), 0
+        if end < size:
+            log.warning("Truncating %d torn bytes from %s", size - end, path)
+            f.truncate(end)
+    write_index(path[: -len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, index)
+    return index
+
+
+class ChatLogWriter:
+    """Append chat messages to a segmented NDJSON log in ``directory``.
+
+    Use ``append`` as a :class:`ChatPipeline` handler (``chat_log=`` of the
+    chat clients): it only buffers the encoded line, and a background
+    thread writes everything buffered every ``commit_interval`` seconds,
+    or as soon as ``max_batch`` bytes are waiting, with one write and one
+    fsync (group commit). ``flush`` waits until the messages appended so
+    far are on disk. Messages a commit could not write are dropped and
+    logged, the next ``flush`` then returns False.
+
+    A segment is closed once it reaches ``segment_size`` bytes and gets a
+    ``.idx`` file with the offset, send time, channel and uid of each
+    record for :class:`ChatLogReader`. Each writer starts a new segment; a
+    segment left without index by a crash is repaired and indexed when
+    the directory is opened again. Only one writer may use a directory at
+    a time (processes included), another one raises RuntimeError.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        segment_size: int = 64 * 1024 * 1024,
+        commit_interval: float = 0.05,
+        max_batch: int = 1024 * 1024,
+        fsync: bool = True,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.metrics = metrics or get_metrics()
+        os.makedirs(directory, exist_ok=True)
+        # A live writer's segment has no index yet and must not be sealed.
+        self.lock = lock_directory(directory)
+        try:
+            segments = list_segments(directory)
+            for number in segments:
+                path = segment_path(directory, number)
+                if not os.path.exists(path[: -len(SEGMENT_SUFFIX)] + INDEX_SUFFIX):
+                    seal_segment(path)
+            self.number = segments[-1] + 1 if segments else 0
+            self.file = open(segment_path(directory, self.number), "ab", buffering=0)
+        except BaseException:
+            self.lock.close()
+            raise
+        self.position = 0
+        self.index = array("q")
+        self.condition = threading.Condition()
+        self.pending: List[Tuple[bytes, ChatMessage]] = []
+        self.pending_bytes = 0
+        self.urgent = False
+        self.appended = 0
+        self.committed = 0
+        self.lost = 0
+        self.reported_lost = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def append(self, message: ChatMessage):
+        line = encode(message)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("ChatLogWriter is closed")
+            self.pending.append((line, message))
+            self.pending_bytes += len(line)
+            self.appended += 1
+            if len(self.pending) == 1:
+                self.condition.notify_all()
+            elif self.pending_bytes >= self.max_batch and not self.urgent:
+                self.urgent = True
+                self.condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything appended so far is committed.
+
+        False on timeout, or if messages were lost since the last flush.
+        """
+        with self.condition:
+            target = self.appended
+            if self.pending:
+                self.urgent = True
+                self.condition.notify_all()
+            if not self.condition.wait_for(
+                lambda: self.committed + self.lost >= target, timeout=timeout
+            ):
+                return False
+            if self.lost > self.reported_lost:
+                self.reported_lost = self.lost
+                return False
+            return True
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.closed)
+                if not self.urgent and not self.closed:
+                    # Let more messages join this commit.
+                    self.condition.wait_for(
+                        lambda: self.urgent or self.closed, self.commit_interval
+                    )
+                batch, self.pending = self.pending, []
+                self.pending_bytes = 0
+                self.urgent = False
+                closed = self.closed
+            if batch:
+                written = self._commit(batch)
+                with self.condition:
+                    self.committed += written
+                    self.lost += len(batch) - written
+                    self.condition.notify_all()
+            if closed:
+                return
+
+    def _commit(self, batch: List[Tuple[bytes, ChatMessage]]) -> int:
+        """Write ``batch`` and return how many of its messages were written."""
+        start = time.perf_counter()
+        written = 0
+        # What the segment looked like after the last successful write.
+        mark = self.position, len(self.index)
+        chunks = []
+        try:
+            for line, message in batch:
+                if self.position and self.position + len(line) > self.segment_size:
+                    self._write(chunks)
+                    written += len(chunks)
+                    chunks = []
+                    mark = self.position, len(self.index)
+                    self._roll()
+                    mark = 0, 0
+                self.index.extend(index_row(self.position, message))
+                chunks.append(line)
+                self.position += len(line)
+            self._write(chunks)
+            written += len(chunks)
+        except OSError:
+            self._rollback(*mark)
+            self.metrics.inc("chat_log_errors_total")
+            log.exception("Could not write %d chat messages", len(batch) - written)
+        self.metrics.inc("chat_log_messages_total", written)
+        self.metrics.observe("chat_log_commit_seconds", time.perf_counter() - start)
+        return written
+
+    def _rollback(self, position: int, rows: int):
+        self.position = position
+        del self.index[rows:]
+        try:
+            # Cut what a failed write left behind, the next record starts
+            # at ``position``.
+            os.ftruncate(self.file.fileno(), position)
+        except (OSError, ValueError):
+            pass
+
+    def _write(self, chunks: List[bytes]):
+        if not chunks:
+            return
+        data = memoryview(b"".join(chunks))
+        while data:
+            data = data[self.file.write(data) :]
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def _seal(self):
+        self.file.close()
+        path = segment_path(self.directory, self.number)
+        write_index(path[: -len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, self.index)
+
+    def _roll(self):
+        self._seal()
+        self.number += 1
+        self.file = open(segment_path(self.directory, self.number), "ab", buffering=0)
+        self.position = 0
+        self.index = array("q")
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        if self.position:
+            self._seal()
+        else:
+            self.file.close()
+            os.remove(segment_path(self.directory, self.number))
+        self.lock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Segment:
+    """A memory-mapped segment and its index, as seen by a reader."""
+
+    def __init__(self, directory: str, number: int):
+        self.number = number
+        self.path = segment_path(directory, number)
+        self.index_path = self.path[: -len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+        self.file = None
+        self.data: Optional[mmap.mmap] = None
+        self.size = 0
+        self.index_file = None
+        self.index_data: Optional[mmap.mmap] = None
+        self.index = array("q")
+        self.sealed = False
+        self.scanned = 0
+        self.by_user: Optional[Dict[int, List[int]]] = None
+        self.by_channel: Optional[Dict[int, Tuple[List[int], List[int]]]] = None
+
+    def __len__(self) -> int:
+        return len(self.index) // ROW
+
+    def refresh(self) -> bool:
+        """Map what was written since the last call; True if anything was."""
+        if self.sealed:
+            return False
+        size = os.path.getsize(self.path)
+        if os.path.exists(self.index_path):
+            self._map(size)
+            self._unmap_index()
+            self.index_file = open(self.index_path, "rb")
+            if os.fstat(self.index_file.fileno()).st_size:
+                self.index_data = mmap.mmap(
+                    self.index_file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+                self.index = memoryview(self.index_data).cast("q")
+            else:
+                self.index = array("q")
+            self.sealed = True
+        elif size > self.size:
+            # Still being written: index the records appended since.
+            self._map(size)
+            rows, self.scanned = scan_segment(self.data, self.scanned)
+            self.index.extend(rows)
+        else:
+            return False
+        self.by_user = self.by_channel = None
+        return True
+
+    def _map(self, size: int):
+        if size == self.size:
+            return
+        if self.data is not None:
+            self.data.close()
+        if self.file is None:
+            self.file = open(self.path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = size
+
+    def _unmap_index(self):
+        if isinstance(self.index, memoryview):
+            self.index.release()
+        if self.index_data is not None:
+            self.index_data.close()
+            self.index_data = None
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+
+    def message(self, record: int) -> ChatMessage:
+        offset = self.index[record * ROW]
+        return decode(self.data[offset : self.data.find(b"\n", offset)])
+
+    def users(self) -> Dict[int, List[int]]:
+        if self.by_user is None:
+            by_user: Dict[int, List[int]] = {}
+            index = self.index
+            for record in range(len(self)):
+                uid = index[record * ROW + 3]
+                if uid != MISSING:
+                    by_user.setdefault(uid, []).append(record)
+            self.by_user = by_user
+        return self.by_user
+
+    def channels(self) -> Dict[int, Tuple[List[int], List[int]]]:
+        """channel_id -> (send times, records), ordered by send time."""
+        if self.by_channel is None:
+            rows: Dict[int, List[Tuple[int, int]]] = {}
+            index = self.index
+            for record in range(len(self)):
+                base = record * ROW
+                rows.setdefault(index[base + 2], []).append((index[base + 1], record))
+            by_channel = {}
+            for channel_id, channel_rows in rows.items():
+                channel_rows.sort()
+                by_channel[channel_id] = (
+                    [send_time for send_time, _ in channel_rows],
+                    [record for _, record in channel_rows],
+                )
+            self.by_channel = by_channel
+        return self.by_channel
+
+    def close(self):
+        self._unmap_index()
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ChatLogReader:
+    """Query a :class:`ChatLogWriter` directory through memory maps.
+
+    Only the segment indexes are read up front; per-user and per-channel
+    lookups are built from them on first use, and a query then decodes
+    just the records it returns, so "the last 20 messages of uid X" does
+    not read whole segments. Call :meth:`refresh` to see messages written
+    after the reader was opened.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.segments: List[Segment] = []
+        self.refresh()
+
+    def refresh(self):
+        known = {segment.number for segment in self.segments}
+        for number in list_segments(self.directory):
+            if number not in known:
+                self.segments.append(Segment(self.directory, number))
+        self.segments.sort(key=lambda segment: segment.number)
+        for segment in self.segments:
+            segment.refresh()
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+    def __iter__(self) -> Iterator[ChatMessage]:
+        for segment in self.segments:
+            for record in range(len(segment)):
+                yield segment.message(record)
+
+    def last_from_user(
+        self, uid: int, n: int = 20, channel_id: Optional[int] = None
+    ) -> List[ChatMessage]:
+        """The ``n`` newest messages of ``uid``, newest first."""
+        found: List[ChatMessage] = []
+        for segment in reversed(self.segments):
+            records = segment.users().get(uid, ())
+            for record in reversed(records):
+                if (
+                    channel_id is not None
+                    and segment.index[record * ROW + 2] != channel_id
+                ):
+                    continue
+                found.append(segment.message(record))
+                if len(found) >= n:
+                    return found
+        return found
+
+    def messages(
+        self,
+        channel_id: int,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Iterator[ChatMessage]:
+        """Messages of ``channel_id`` with ``start <= send_time < end``."""
+        for segment in self.segments:
+            times, records = segment.channels().get(channel_id, ((), ()))
+            first = 0 if start is None else bisect.bisect_left(times, start)
+            last = len(times) if end is None else bisect.bisect_left(times, end)
+            for position in range(first, last):
+                yield segment.message(records[position])
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
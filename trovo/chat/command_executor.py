@@ -0,0 +1,259 @@
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Optional, Set
+
+from trovo.chat.command_router import Command
+from trovo.client.helper_functions import LazyModule
+from trovo.metrics import Metrics, get_metrics
+
+log = logging.getLogger(__name__)
+
+asyncio = LazyModule("asyncio")
+
+__all__ = ["CommandStats", "Task", "CommandExecutor", "AsyncCommandExecutor"]
+
+
+class CommandStats:
+    """Counters shared by the command executors."""
+
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "expired": 0,
+            "timed_out": 0,
+            "slow": 0,
+        }
+        self.pending = 0
+        self.running = 0
+        # command name -> [calls, total seconds, max seconds]
+        self.latency: Dict[str, list] = {}
+
+    def count(self, counter: str, pending: int = 0, running: int = 0):
+        with self.lock:
+            self.counters[counter] += 1
+            self.pending += pending
+            self.running += running
+            self.lock.notify_all()
+
+    def start(self):
+        with self.lock:
+            self.pending -= 1
+            self.running += 1
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self.lock:
+            return self.lock.wait_for(
+                lambda: not self.pending and not self.running, timeout
+            )
+
+    def observe(self, name: str, seconds: float):
+        with self.lock:
+            latency = self.latency.setdefault(name, [0, 0.0, 0.0])
+            latency[0] += 1
+            latency[1] += seconds
+            latency[2] = max(latency[2], seconds)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                **self.counters,
+                "pending": self.pending,
+                "running": self.running,
+                "latency": {
+                    name: {"calls": calls, "mean": total / calls, "max": worst}
+                    for name, (calls, total, worst) in self.latency.items()
+                },
+            }
+
+
+class Task:
+    __slots__ = ("entry", "username", "arguments", "submitted_at")
+
+    def __init__(self, entry: Command, username: str, arguments: list):
+        self.entry = entry
+        self.username = username
+        self.arguments = arguments
+        self.submitted_at = time.monotonic()
+
+
+class CommandExecutor:
+    """Run command callbacks on a bounded thread pool.
+
+    At most ``max_pending`` commands wait or run at once, further ones are
+    rejected so a raid can not queue unbounded work. Commands registered
+    with ``ordered=True`` run one at a time per user in arrival order.
+    A thread can not be interrupted, so ``timeout`` drops a command that
+    waited longer than that before starting; one that ran longer still
+    counts as ``completed`` or ``failed`` and is also counted as ``slow``.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_pending: int = 100,
+        default_timeout: Optional[float] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="trovo-command")
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.stats = CommandStats()
+        self.metrics = metrics or get_metrics()
+        self.lock = threading.Lock()
+        self.ordered: Dict[str, Deque[Task]] = {}
+
+    def timeout_of(self, entry: Command) -> Optional[float]:
+        return entry.timeout if entry.timeout is not None else self.default_timeout
+
+    def submit(self, entry: Command, username: str, arguments: list) -> bool:
+        if self.stats.pending + self.stats.running >= self.max_pending:
+            self.stats.count("rejected")
+            return False
+        task = Task(entry, username, arguments)
+        self.stats.count("submitted", pending=1)
+        if entry.ordered:
+            with self.lock:
+                queue = self.ordered.setdefault(username, deque())
+                queue.append(task)
+                if len(queue) > 1:
+                    # The running command of this user submits it when done.
+                    return True
+        self.pool.submit(self._run, task)
+        return True
+
+    def _run(self, task: Task):
+        entry = task.entry
+        timeout = self.timeout_of(entry)
+        started = time.monotonic()
+        try:
+            if timeout is not None and started - task.submitted_at > timeout:
+                self.stats.count("expired", pending=-1)
+                return
+            self.stats.start()
+            try:
+                entry.callback(task.username, *task.arguments)
+                counter = "completed"
+            except Exception:
+                log.exception("Command %s failed", entry.name)
+                counter = "failed"
+            elapsed = time.monotonic() - started
+            self.stats.observe(entry.name, elapsed)
+            if timeout is not None and elapsed > timeout:
+                self.stats.count("slow")
+                self.metrics.inc("commands_slow_total", command=entry.name)
+            self.stats.count(counter, running=-1)
+            self.metrics.observe("command_seconds", elapsed, command=entry.name)
+            self.metrics.inc("commands_total", command=entry.name, result=counter)
+        finally:
+            if entry.ordered:
+                self._next_ordered(task.username)
+
+    def _next_ordered(self, username: str):
+        with self.lock:
+            queue = self.ordered[username]
+            queue.popleft()
+            if not queue:
+                del self.ordered[username]
+                return
+            task = queue[0]
+        self.pool.submit(self._run, task)
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None):
+        """Stop the pool; with ``wait`` queued commands are run first."""
+        if wait:
+            self.stats.wait_idle(timeout)
+        self.pool.shutdown(wait=wait)
+
+
+class AsyncCommandExecutor:
+    """Run command callbacks as tasks on the event loop.
+
+    Coroutine callbacks are awaited with the command timeout and cancelled
+    when it expires, counting as ``timed_out`` only; plain callbacks are
+    called in the task. ``workers`` bounds the commands running at once
+    and ``max_pending`` the ones waiting or running; ``ordered=True``
+    commands run one at a time per user in arrival order.
+    """
+
+    def __init__(
+        self,
+        workers: int = 50,
+        max_pending: int = 1000,
+        default_timeout: Optional[float] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.stats = CommandStats()
+        self.metrics = metrics or get_metrics()
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        # username -> (lock, ordered commands waiting or running)
+        self.locks: Dict[str, list] = {}
+        self.tasks: Set[asyncio.Task] = set()
+
+    def timeout_of(self, entry: Command) -> Optional[float]:
+        return entry.timeout if entry.timeout is not None else self.default_timeout
+
+    def submit(self, entry: Command, username: str, arguments: list) -> bool:
+        if len(self.tasks) >= self.max_pending:
+            self.stats.count("rejected")
+            return False
+        self.stats.count("submitted", pending=1)
+        task = asyncio.ensure_future(self._run(Task(entry, username, arguments)))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return True
+
+    async def _run(self, task: Task):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.workers)
+        if not task.entry.ordered:
+            async with self.semaphore:
+                await self._call(task)
+            return
+        slot = self.locks.setdefault(task.username, [asyncio.Lock(), 0])
+        slot[1] += 1
+        try:
+            async with slot[0], self.semaphore:
+                await self._call(task)
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self.locks[task.username]
+
+    async def _call(self, task: Task):
+        entry = task.entry
+        timeout = self.timeout_of(entry)
+        started = time.monotonic()
+        if timeout is not None and started - task.submitted_at > timeout:
+            self.stats.count("expired", pending=-1)
+            return
+        self.stats.start()
+        try:
+            result = entry.callback(task.username, *task.arguments)
+            if inspect.isawaitable(result):
+                await asyncio.wait_for(result, timeout)
+            counter = "completed"
+        except asyncio.TimeoutError:
+            counter = "timed_out"
+        except Exception:
+            log.exception("Command %s failed", entry.name)
+            counter = "failed"
+        elapsed = time.monotonic() - started
+        self.stats.observe(entry.name, elapsed)
+        self.stats.count(counter, running=-1)
+        self.metrics.observe("command_seconds", elapsed, command=entry.name)
+        self.metrics.inc("commands_total", command=entry.name, result=counter)
+
+    async def join(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
@@ -1,16 +1,48 @@
+import inspect
+from typing import Optional
+from trovo.client.helper_functions import LazyModule
 from trovo.client.trovo_client import TrovoClient
+from trovo.chat.command_router import CommandRouter
+from trovo.chat.message import ChatMessage
+from trovo.chat.send_queue import SendQueue
+from trovo.metrics import Metrics
+
+asyncio = LazyModule("asyncio")
+
+__all__ = ["CommandHandler"]
+
 
 class CommandHandler:
-    def __init__(self, trovo_client: TrovoClient, channel_id: int):
+    def __init__(
+        self,
+        trovo_client: TrovoClient,
+        channel_id: int,
+        send_queue: Optional[SendQueue] = None,
+        executor=None,
+        metrics: Optional[Metrics] = None,
+    ):
         self.trovo = trovo_client
         self.channel_id = channel_id
+        self.send_queue = send_queue
+        self._pending = set()
         self.commands = {
             "!help": self.help_command,
             "!hello": self.hello_command,
         }
+        self.router = CommandRouter(executor=executor, metrics=metrics)
+        for name, callback in self.commands.items():
+            self.router.register(name.lstrip("!"), callback)
 
     def send_message(self, message):
-        self.trovo.send_chat_to_selected_channel(message, self.channel_id)
+        if self.send_queue is not None:
+            self.send_queue.put(message, self.channel_id)
+            return
+        result = self.trovo.send_chat_to_selected_channel(message, self.channel_id)
+        if inspect.isawaitable(result):
+            # AsyncTrovoClient: schedule the send on the running event loop.
+            task = asyncio.ensure_future(result)
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
     
     def help_command(self, username: str):
         message = f"The help will be here shortly, {username}"
@@ -21,8 +53,7 @@ class CommandHandler:
         self.send_message(message)
 
     def select_command(self, username: str, message: str):
-        if message.startswith("!"):
-            words = message.split()
-            command_to_execute = words[0]
-            if command_to_execute in self.commands:
-                self.commands[command_to_execute](username)
+        self.router.dispatch(username, message)
+
+    def handle(self, message: ChatMessage):
+        self.select_command(message.nick_name, message.content)
@@ -0,0 +1,210 @@
+import time
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from trovo.metrics import Metrics, get_metrics
+
+__all__ = ["Command", "command", "CommandRouter"]
+
+
+class Command:
+    __slots__ = (
+        "name",
+        "callback",
+        "aliases",
+        "arguments",
+        "user_cooldown",
+        "channel_cooldown",
+        "last_used",
+        "user_last_used",
+        "purge_size",
+        "timeout",
+        "ordered",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        callback: Callable,
+        aliases: Iterable[str] = (),
+        arguments: Sequence[Callable[[str], object]] = (),
+        user_cooldown: float = 0,
+        channel_cooldown: float = 0,
+        timeout: Optional[float] = None,
+        ordered: bool = False,
+    ):
+        self.name = name
+        self.callback = callback
+        self.aliases = tuple(aliases)
+        self.arguments = tuple(arguments)
+        self.user_cooldown = user_cooldown
+        self.channel_cooldown = channel_cooldown
+        self.last_used = float("-inf")
+        self.user_last_used: Dict[str, float] = {}
+        self.purge_size = 0
+        self.timeout = timeout
+        self.ordered = ordered
+
+
+def command(name: str, **options):
+    """Mark a method of a plugin class as a command, see ``register_plugin``."""
+
+    def decorator(callback):
+        callback.__trovo_command__ = (name, options)
+        return callback
+
+    return decorator
+
+
+class CommandRouter:
+    """Map chat messages to command callbacks for one channel.
+
+    Messages without a command prefix are rejected with a single
+    ``startswith``, so ordinary chat is never split; the command name
+    ends at the first whitespace. Names and aliases share one dict.
+    A command is called as ``callback(username, *arguments)`` where each
+    entry of ``arguments`` converts one whitespace separated word (the last
+    one receives the rest of the message); a message whose arguments are
+    missing or fail to convert is ignored. Cooldowns are in seconds and
+    checked per channel and per user.
+
+    With an ``executor`` (see :mod:`trovo.chat.command_executor`) callbacks
+    are submitted to it instead of running on the caller's thread;
+    ``timeout`` and ``ordered`` are options for the executor.
+    """
+
+    # Expired per-user cooldown entries are purged when a dict grows past this.
+    purge_threshold = 10_000
+
+    def __init__(
+        self,
+        prefixes: Iterable[str] = ("!",),
+        executor=None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.prefixes: Tuple[str, ...] = tuple(prefixes)
+        self.routes: Dict[str, Command] = {}
+        self.executor = executor
+        self.metrics = metrics or get_metrics()
+
+    def register(
+        self,
+        name: str,
+        callback: Callable,
+        *,
+        aliases: Iterable[str] = (),
+        arguments: Sequence[Callable[[str], object]] = (),
+        user_cooldown: float = 0,
+        channel_cooldown: float = 0,
+        timeout: Optional[float] = None,
+        ordered: bool = False,
+    ) -> Command:
+        entry = Command(
+            name,
+            callback,
+            aliases,
+            arguments,
+            user_cooldown,
+            channel_cooldown,
+            timeout,
+            ordered,
+        )
+        for key in (name, *entry.aliases):
+            if key in self.routes:
+                raise ValueError(f"Command {key!r} is already registered")
+        for key in (name, *entry.aliases):
+            self.routes[key] = entry
+        return entry
+
+    def unregister(self, name: str):
+        entry = self.routes[name]
+        for key in (entry.name, *entry.aliases):
+            del self.routes[key]
+
+    def command(self, name: str, **options):
+        def decorator(callback):
+            self.register(name, callback, **options)
+            return callback
+
+        return decorator
+
+    def register_plugin(self, plugin: object):
+        """Register every method of ``plugin`` decorated with :func:`command`."""
+        for attribute in dir(plugin):
+            callback = getattr(plugin, attribute)
+            spec = getattr(callback, "__trovo_command__", None)
+            if spec is not None:
+                name, options = spec
+                self.register(name, callback, **options)
+
+    def match(self, message: str) -> Optional[Tuple[Command, str]]:
+        if not message.startswith(self.prefixes):
+            return None
+        for prefix in self.prefixes:
+            if message.startswith(prefix):
+                # Any whitespace ends the name, as in message.split().
+                words = message[len(prefix) :].split(None, 1)
+                if not words or message[len(prefix)].isspace():
+                    continue
+                entry = self.routes.get(words[0])
+                if entry is not None:
+                    return entry, words[1] if len(words) > 1 else ""
+        return None
+
+    def parse_arguments(self, entry: Command, rest: str) -> Optional[list]:
+        if not entry.arguments:
+            return []
+        words = rest.split(None, len(entry.arguments) - 1)
+        if len(words) < len(entry.arguments):
+            return None
+        try:
+            return [convert(word) for convert, word in zip(entry.arguments, words)]
+        except ValueError:
+            return None
+
+    def on_cooldown(self, entry: Command, username: str, now: float) -> bool:
+        if now - entry.last_used < entry.channel_cooldown:
+            return True
+        if entry.user_cooldown:
+            last_used = entry.user_last_used.get(username)
+            if last_used is not None and now - last_used < entry.user_cooldown:
+                return True
+        return False
+
+    def mark_used(self, entry: Command, username: str, now: float):
+        entry.last_used = now
+        if entry.user_cooldown:
+            used = entry.user_last_used
+            used[username] = now
+            if len(used) > max(self.purge_threshold, entry.purge_size):
+                expired = now - entry.user_cooldown
+                for user in [user for user, at in used.items() if at <= expired]:
+                    del used[user]
+                # Purge again only once the dict has doubled: amortised O(1).
+                entry.purge_size = 2 * len(used)
+
+    def dispatch(self, username: str, message: str, now: Optional[float] = None):
+        """Run the command of ``message`` if any; return whether one ran."""
+        if not message.startswith(self.prefixes):
+            return False
+        matched = self.match(message)
+        if matched is None:
+            return False
+        entry, rest = matched
+        now = time.monotonic() if now is None else now
+        if self.on_cooldown(entry, username, now):
+            self.metrics.inc(
+                "chat_commands_total", command=entry.name, result="cooldown"
+            )
+            return False
+        arguments = self.parse_arguments(entry, rest)
+        if arguments is None:
+            self.metrics.inc(
+                "chat_commands_total", command=entry.name, result="invalid"
+            )
+            return False
+        self.mark_used(entry, username, now)
+        self.metrics.inc("chat_commands_total", command=entry.name, result="dispatched")
+        if self.executor is not None:
+            return self.executor.submit(entry, username, arguments)
+        entry.callback(username, *arguments)
+        return True
@@ -0,0 +1,357 @@
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from trovo.client.helper_functions import LazyModule
+from trovo.metrics import Metrics, get_metrics
+
+log = logging.getLogger(__name__)
+
+asyncio = LazyModule("asyncio")
+
+__all__ = [
+    "EMOTE_PATTERN",
+    "ALL_EMOTES",
+    "CHANNEL_EMOTES",
+    "GLOBAL_EMOTES",
+    "Emote",
+    "parse_emotes",
+    "EmoteIndex",
+    "EmoteCatalog",
+    "AsyncEmoteCatalog",
+]
+
+# ``:name`` as Trovo sends emotes in chat, ``:name:`` accepted too. A colon
+# directly followed by a word character starts the next emote instead.
+EMOTE_PATTERN = re.compile(r":(\w+)(?::(?!\w))?")
+
+# emote_type of get_emotes.
+ALL_EMOTES, CHANNEL_EMOTES, GLOBAL_EMOTES = 0, 1, 2
+
+_NO_EMOTES: Dict[str, "Emote"] = {}
+
+
+class Emote:
+    """One emote of the catalog; ``channel_id`` is None for global emotes."""
+
+    __slots__ = ("name", "url", "kind", "channel_id", "gifp", "webp")
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        kind: str = "global",
+        channel_id: Optional[int] = None,
+        gifp: Optional[str] = None,
+        webp: Optional[str] = None,
+    ):
+        self.name = name
+        self.url = url
+        self.kind = kind
+        self.channel_id = channel_id
+        self.gifp = gifp
+        self.webp = webp
+
+    def __repr__(self) -> str:
+        return f"Emote({self.name!r}, kind={self.kind!r})"
+
+
+def _emote(raw: dict, kind: str, channel_id: Optional[int] = None) -> Emote:
+    return Emote(
+        raw["name"],
+        raw.get("url", ""),
+        kind,
+        channel_id,
+        raw.get("gifp"),
+        raw.get("webp"),
+    )
+
+
+def parse_emotes(
+    response: dict,
+) -> Tuple[Dict[str, Emote], Dict[int, Dict[str, Emote]]]:
+    """Emotes of a ``get_emotes`` response by name: global, then per channel.
+
+    Event emotes are stored with the global ones.
+    """
+    channels = response.get("channels") or {}
+    global_emotes = {}
+    for kind, key in (("global", "globalEmotes"), ("event", "eventEmotes")):
+        for raw in channels.get(key) or ():
+            global_emotes[raw["name"]] = _emote(raw, kind)
+    custom = {}
+    for entry in (channels.get("customizedEmotes") or {}).get("channel") or ():
+        channel_id = int(entry["channel_id"])
+        custom[channel_id] = {
+            raw["name"]: _emote(raw, "custom", channel_id)
+            for raw in entry.get("emotes") or ()
+        }
+    return global_emotes, custom
+
+
+class EmoteIndex:
+    """Emotes by name, global and per channel, and the message tokenizer.
+
+    :meth:`tokenize` finds every ``:name`` candidate with one precompiled
+    regex pass and resolves it with two dict lookups (the channel's custom
+    emotes first, then the global ones), so its cost depends on the length
+    of the message, not on the number of emotes.
+    """
+
+    def __init__(self):
+        self.global_emotes: Dict[str, Emote] = {}
+        self.channels: Dict[int, Dict[str, Emote]] = {}
+        self.watched: Set[int] = set()
+        self.lock = threading.Lock()
+
+    def get(self, name: str, channel_id: Optional[int] = None) -> Optional[Emote]:
+        emote = self.channels.get(channel_id, _NO_EMOTES).get(name)
+        return emote if emote is not None else self.global_emotes.get(name)
+
+    def tokenize(
+        self, content: str, channel_id: Optional[int] = None
+    ) -> List[Union[str, Emote]]:
+        """Split ``content`` into text (``str``) and :class:`Emote` segments."""
+        if ":" not in content:
+            return [content] if content else []
+        custom = self.channels.get(channel_id, _NO_EMOTES)
+        global_emotes = self.global_emotes
+        segments: List[Union[str, Emote]] = []
+        start = 0
+        for match in EMOTE_PATTERN.finditer(content):
+            name = match.group(1)
+            emote = custom.get(name)
+            if emote is None:
+                emote = global_emotes.get(name)
+                if emote is None:
+                    continue
+            if match.start() > start:
+                segments.append(content[start : match.start()])
+            segments.append(emote)
+            start = match.end()
+        if start < len(content):
+            segments.append(content[start:])
+        return segments
+
+    def load(self, response: dict, channel_ids: Iterable[int] = (), global_=True):
+        """Store a ``get_emotes`` response asked for ``channel_ids``.
+
+        Watched channels of the request missing from the response have no
+        custom emotes; unwatched ones are ignored.
+        """
+        global_emotes, custom = parse_emotes(response)
+        with self.lock:
+            if global_:
+                self.global_emotes = global_emotes
+            for channel_id in channel_ids:
+                if channel_id in self.watched:
+                    self.channels[channel_id] = custom.get(channel_id, {})
+
+    def watch(self, channel_id: int):
+        with self.lock:
+            self.watched.add(channel_id)
+
+    def unwatch(self, channel_id: int):
+        with self.lock:
+            self.watched.discard(channel_id)
+            self.channels.pop(channel_id, None)
+
+
+class _Catalog(EmoteIndex):
+    batch_size = 100
+
+    def __init__(
+        self,
+        trovo,
+        channel_ids: Iterable[int] = (),
+        *,
+        refresh_interval: float = 600.0,
+        retry_interval: float = 60.0,
+        metrics: Optional[Metrics] = None,
+    ):
+        super().__init__()
+        self.trovo = trovo
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.metrics = metrics or get_metrics()
+        self.pending: Set[int] = set()
+        self.next_refresh = 0.0
+        self.stopped = False
+        for channel_id in channel_ids:
+            self.watch(channel_id)
+
+    def watch(self, channel_id: int):
+        """Load the emotes of ``channel_id`` soon and refresh them with the rest."""
+        with self.lock:
+            if channel_id in self.watched:
+                return
+            self.watched.add(channel_id)
+            self.pending.add(channel_id)
+        self._wake()
+
+    def _wake(self):
+        pass
+
+    def _batches(
+        self, channel_ids: List[int], global_: bool
+    ) -> List[Tuple[int, List[int]]]:
+        size = self.batch_size
+        batches = [
+            (CHANNEL_EMOTES, channel_ids[i : i + size])
+            for i in range(0, len(channel_ids), size)
+        ]
+        if global_:
+            if batches:
+                batches[0] = (ALL_EMOTES, batches[0][1])
+            else:
+                batches.append((GLOBAL_EMOTES, []))
+        return batches
+
+    def _plan(self, now: float) -> Optional[Tuple[List[int], bool]]:
+        """(channels to fetch, with global emotes) of the next refresh, if due."""
+        with self.lock:
+            if now < self.next_refresh:
+                if not self.pending:
+                    return None
+                channel_ids, self.pending = sorted(self.pending), set()
+                return channel_ids, False
+            self.pending.clear()
+            channel_ids = sorted(self.watched)
+        return channel_ids, True
+
+    def _invalidate(self):
+        cache = getattr(self.trovo, "cache", None)
+        if cache is not None:
+            # The client's response cache would serve batches fetched before,
+            # e.g. for a channel unwatched and watched again.
+            cache.invalidate("get_emotes")
+
+    def _done(self, now: float, global_: bool, error: Optional[Exception]):
+        if error is None:
+            self.metrics.inc("emote_refresh_total", result="ok")
+            if global_:
+                self.next_refresh = now + self.refresh_interval
+        else:
+            self.metrics.inc("emote_refresh_total", result="error")
+            log.warning("Refreshing emotes failed: %s", error)
+            # The next full refresh also retries channels that failed alone.
+            retry_at = now + self.retry_interval
+            if global_ or retry_at < self.next_refresh:
+                self.next_refresh = retry_at
+        self.metrics.set("emote_channels", len(self.channels))
+
+    def _timeout(self, error: bool) -> float:
+        if self.pending and not error:
+            return 0.0
+        return max(0.0, self.next_refresh - time.monotonic())
+
+
+class EmoteCatalog(_Catalog):
+    """Emotes of the watched channels and global emotes for TrovoClient.
+
+    :meth:`start` loads the catalog in a background thread and refreshes
+    it every ``refresh_interval`` seconds (``retry_interval`` after a
+    failure); channels watched later are loaded on the next wakeup. Until
+    then :meth:`tokenize` simply sees fewer emotes. Channels are fetched
+    ``batch_size`` per request.
+    """
+
+    def __init__(self, trovo, channel_ids: Iterable[int] = (), **kwargs):
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        super().__init__(trovo, channel_ids, **kwargs)
+
+    def _wake(self):
+        self.wakeup.set()
+
+    def refresh(self, channel_ids: Optional[Iterable[int]] = None, global_=True):
+        """Fetch the given (default: all watched) channels now."""
+        if channel_ids is None:
+            with self.lock:
+                channel_ids = list(self.watched)
+        self._invalidate()
+        for emote_type, batch in self._batches(sorted(channel_ids), global_):
+            response = self.trovo.get_emotes(emote_type, batch)
+            self.load(response, batch, global_=emote_type != CHANNEL_EMOTES)
+
+    def _run(self):
+        while not self.stopped:
+            self.wakeup.clear()
+            now = time.monotonic()
+            plan = self._plan(now)
+            error = None
+            if plan is not None:
+                try:
+                    self.refresh(*plan)
+                except Exception as e:
+                    error = e
+                self._done(now, plan[1], error)
+            self.wakeup.wait(self._timeout(error is not None))
+
+    def start(self):
+        if self.thread is None:
+            self.stopped = False
+            self.thread = threading.Thread(
+                target=self._run, name="trovo-emotes", daemon=True
+            )
+            self.thread.start()
+        return self
+
+    def close(self):
+        self.stopped = True
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+class AsyncEmoteCatalog(_Catalog):
+    """asyncio version of :class:`EmoteCatalog` for AsyncTrovoClient."""
+
+    def __init__(self, trovo, channel_ids: Iterable[int] = (), **kwargs):
+        self.wakeup = None
+        super().__init__(trovo, channel_ids, **kwargs)
+
+    def _wake(self):
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def refresh(self, channel_ids: Optional[Iterable[int]] = None, global_=True):
+        if channel_ids is None:
+            channel_ids = list(self.watched)
+        self._invalidate()
+        for emote_type, batch in self._batches(sorted(channel_ids), global_):
+            response = await self.trovo.get_emotes(emote_type, batch)
+            self.load(response, batch, global_=emote_type != CHANNEL_EMOTES)
+
+    async def run(self):
+        """Keep the catalog fresh until :meth:`stop` is called."""
+        self.stopped = False
+        self.wakeup = asyncio.Event()
+        try:
+            while not self.stopped:
+                self.wakeup.clear()
+                now = time.monotonic()
+                plan = self._plan(now)
+                error = None
+                if plan is not None:
+                    try:
+                        await self.refresh(*plan)
+                    except Exception as e:
+                        error = e
+                    self._done(now, plan[1], error)
+                try:
+                    await asyncio.wait_for(
+                        self.wakeup.wait(), self._timeout(error is not None)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.wakeup = None
+
+    def stop(self):
+        self.stopped = True
+        if self.wakeup is not None:
+            self.wakeup.set()
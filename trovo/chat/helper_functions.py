@@ -1,14 +1,56 @@
-import json
+import re
+from typing import Iterator, Optional
 
+from trovo.client.helper_functions import json_loads
 
-def extract_message_type_contents(raw_message: str):
+__all__ = [
+    "FRAME_TYPE_PATTERN",
+    "frame_type",
+    "iter_frame_chats",
+    "iter_chats",
+    "extract_message_type_contents",
+]
+
+# Trovo sends the top-level "type" as the first key of every frame. Only that
+# position is trusted, a nested object may carry a "type" key of its own.
+FRAME_TYPE_PATTERN = re.compile(r'\s*\{\s*"type"\s*:\s*"([A-Z_]+)"')
+
+
+def frame_type(raw_message: str) -> Optional[str]:
+    """Return the frame type ("CHAT", "PONG", ...).
+
+    The frame is only decoded when "type" is not its first key.
+    """
+    match = FRAME_TYPE_PATTERN.match(raw_message)
+    if match is not None:
+        return match.group(1)
     try:
-        message = json.loads(raw_message)
-        if message.get("type") == "CHAT" and message.get("channel_info") is not None:
-            chats = message.get("data").get("chats")
-            username = chats[0]["nick_name"]
-            content = chats[0]["content"]
-
-            return username, content
-    except json.JSONDecodeError as e:
+        message = json_loads(raw_message)
+    except ValueError:
         return None
+    if isinstance(message, dict):
+        kind = message.get("type")
+        if isinstance(kind, str):
+            return kind
+    return None
+
+
+def iter_frame_chats(message: dict) -> Iterator[dict]:
+    if message.get("type") == "CHAT" and message.get("channel_info") is not None:
+        yield from (message.get("data") or {}).get("chats") or ()
+
+
+def iter_chats(raw_message: str) -> Iterator[dict]:
+    """Yield every chat of a raw CHAT frame; other frames are never decoded."""
+    if frame_type(raw_message) != "CHAT":
+        return
+    try:
+        message = json_loads(raw_message)
+    except ValueError:
+        return
+    yield from iter_frame_chats(message)
+
+
+def extract_message_type_contents(raw_message: str):
+    for chat in iter_chats(raw_message):
+        return chat["nick_name"], chat["content"]
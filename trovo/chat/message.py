@@ -0,0 +1,196 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from trovo.chat.helper_functions import frame_type, iter_frame_chats, json_loads
+
+__all__ = [
+    "ChatMessage",
+    "iter_frame_messages",
+    "iter_messages",
+    "MessageFilter",
+    "MessageHandler",
+    "ChatPipeline",
+    "ReplayFilter",
+]
+
+
+class ChatMessage:
+    """One chat of a CHAT frame.
+
+    A slotted record holding references to the decoded values (``roles``
+    and ``medals`` are the lists of the frame, not copies).
+    """
+
+    __slots__ = (
+        "channel_id",
+        "message_id",
+        "type",
+        "uid",
+        "sender_id",
+        "user_name",
+        "nick_name",
+        "content",
+        "send_time",
+        "roles",
+        "medals",
+        "sub_lv",
+        "sub_tier",
+    )
+
+    def __init__(
+        self,
+        channel_id: Optional[int],
+        message_id: Optional[str],
+        type: int,
+        uid: Optional[int],
+        sender_id: Optional[int],
+        user_name: Optional[str],
+        nick_name: str,
+        content: str,
+        send_time: Optional[int] = None,
+        roles: Optional[List[str]] = None,
+        medals: Optional[List[str]] = None,
+        sub_lv: Optional[str] = None,
+        sub_tier: Optional[str] = None,
+    ):
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.type = type
+        self.uid = uid
+        self.sender_id = sender_id
+        self.user_name = user_name
+        self.nick_name = nick_name
+        self.content = content
+        self.send_time = send_time
+        self.roles = roles
+        self.medals = medals
+        self.sub_lv = sub_lv
+        self.sub_tier = sub_tier
+
+    @classmethod
+    def from_chat(cls, chat: dict, channel_id: Optional[int] = None) -> "ChatMessage":
+        get = chat.get
+        return cls(
+            channel_id,
+            get("message_id"),
+            get("type", 0),
+            get("uid"),
+            get("sender_id"),
+            get("user_name"),
+            get("nick_name", ""),
+            get("content", ""),
+            get("send_time"),
+            get("roles"),
+            get("medals"),
+            get("sub_lv"),
+            get("sub_tier"),
+        )
+
+    def __repr__(self):
+        return (
+            f"ChatMessage(channel_id={self.channel_id!r}, "
+            f"nick_name={self.nick_name!r}, content={self.content!r})"
+        )
+
+
+def iter_frame_messages(frame: dict) -> Iterator[ChatMessage]:
+    channel_id = (frame.get("channel_info") or {}).get("channel_id")
+    if channel_id is not None:
+        channel_id = int(channel_id)
+    for chat in iter_frame_chats(frame):
+        yield ChatMessage.from_chat(chat, channel_id)
+
+
+def iter_messages(raw_message: str) -> Iterator[ChatMessage]:
+    if frame_type(raw_message) != "CHAT":
+        return
+    try:
+        frame = json_loads(raw_message)
+    except ValueError:
+        return
+    yield from iter_frame_messages(frame)
+
+
+MessageFilter = Callable[[ChatMessage], bool]
+MessageHandler = Callable[[ChatMessage], None]
+
+
+class ChatPipeline:
+    """frame -> messages -> filters -> handlers, one message at a time.
+
+    Messages are pulled lazily through the filters, so nothing is
+    collected per frame and a message dropped by a filter never reaches
+    the handlers.
+    """
+
+    def __init__(
+        self,
+        handlers: Iterable[MessageHandler] = (),
+        filters: Iterable[MessageFilter] = (),
+    ):
+        self.handlers: List[MessageHandler] = list(handlers)
+        self.filters: List[MessageFilter] = list(filters)
+
+    def add_handler(self, handler: MessageHandler):
+        self.handlers.append(handler)
+
+    def add_filter(self, message_filter: MessageFilter):
+        self.filters.append(message_filter)
+
+    def run(self, messages: Iterable[ChatMessage]):
+        for message_filter in self.filters:
+            messages = filter(message_filter, messages)
+        for message in messages:
+            for handler in self.handlers:
+                handler(message)
+
+    def process(self, raw_message: str):
+        self.run(iter_messages(raw_message))
+
+    def process_frame(self, frame: dict):
+        self.run(iter_frame_messages(frame))
+
+
+class ReplayFilter:
+    """Pipeline filter dropping chats that were already seen.
+
+    On every connect Trovo replays the recent chat history. The ids of
+    the last ``window`` chats of each channel are remembered, so replayed
+    ones are dropped while chats arriving out of order still pass; the
+    window must be longer than the replayed history. ``since`` (a unix
+    timestamp) also drops chats sent up to then, e.g. the history of the
+    first connect. Chats without a message_id are never dropped as
+    replays.
+    """
+
+    def __init__(self, since: Optional[int] = None, window: int = 1000):
+        self.since = since
+        self.window = window
+        self.seen: Dict[Optional[int], "OrderedDict[str, None]"] = {}
+        self.skipped = 0
+
+    def __call__(self, message: ChatMessage) -> bool:
+        since = self.since
+        if (
+            since is not None
+            and message.send_time is not None
+            and message.send_time <= since
+        ):
+            self.skipped += 1
+            return False
+        message_id = message.message_id
+        if message_id is None:
+            return True
+        seen = self.seen.get(message.channel_id)
+        if seen is None:
+            seen = self.seen[message.channel_id] = OrderedDict()
+        elif message_id in seen:
+            self.skipped += 1
+            return False
+        seen[message_id] = None
+        if len(seen) > self.window:
+            seen.popitem(last=False)
+        return True
+
+    def clear(self):
+        self.seen.clear()
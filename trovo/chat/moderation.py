@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import inspect
+import logging
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from trovo.client.helper_functions import LazyModule
+from trovo.metrics import Metrics, get_metrics
+from trovo.chat.message import ChatMessage
+
+log = logging.getLogger(__name__)
+
+# Loaded with the asyncio client, which is the only one needing it.
+asyncio = LazyModule("asyncio")
+
+__all__ = [
+    "EXEMPT_ROLES",
+    "Rule",
+    "literal_pattern",
+    "RuleSet",
+    "normalize",
+    "FloodDetector",
+    "Moderator",
+]
+
+# Roles (as sent in ChatMessage.roles) that are never moderated.
+EXEMPT_ROLES = ("streamer", "mod", "supermod", "admin", "warden")
+
+
+class Rule:
+    """A moderation rule and what to do when a message breaks it.
+
+    ``words`` match when not part of a longer word (``c++`` and ``$$$``
+    too), ``phrases`` anywhere in the text, both case-insensitively;
+    ``patterns`` are regular expressions (without backreferences, they
+    are combined with the other rules). ``action`` is a chat command
+    sent with ``perform_chat_commannd``, formatted with ``nick_name``,
+    ``user_name`` and ``uid`` of the message, e.g.
+    ``"timeout {nick_name} 600"``; ``drop`` keeps the message from the
+    command handlers.
+    """
+
+    __slots__ = ("name", "words", "phrases", "patterns", "action", "drop")
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        words: Iterable[str] = (),
+        phrases: Iterable[str] = (),
+        patterns: Iterable[str] = (),
+        action: Optional[str] = None,
+        drop: bool = True,
+    ):
+        self.name = name
+        self.words = tuple(words)
+        self.phrases = tuple(phrases)
+        self.patterns = tuple(patterns)
+        self.action = action
+        self.drop = drop
+
+
+def literal_pattern(literals: Iterable[str]) -> str:
+    """A regex matching any of ``literals``, built from their prefix trie.
+
+    The alternation shares prefixes, so the regex engine looks at each
+    character of the text once per trie level instead of once per literal.
+    """
+    trie: dict = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = None
+    return _trie_pattern(trie)
+
+
+def _trie_pattern(node: dict) -> str:
+    branches = [
+        re.escape(char) + _trie_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ""
+    optional = "" in node
+    if len(branches) == 1 and not optional:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")" + ("?" if optional else "")
+
+
+class RuleSet:
+    """Every rule compiled into two regular expressions.
+
+    Words and phrases of all rules go into one trie alternation searched
+    in the lowercased text, and the rule is found from the matched text;
+    regex rules are combined into a second expression with a named group
+    each. A message is searched at most twice whatever the number of
+    rules: literals first, the leftmost one deciding, and patterns only
+    when no word or phrase matched, so a literal rule wins over a pattern
+    rule even when the pattern matches earlier in the text.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.rules: List[Rule] = list(rules)
+        self.compile()
+
+    def add(self, rule: Rule):
+        self.rules.append(rule)
+        self.compile()
+
+    def compile(self):
+        self.literals: Dict[str, Rule] = {}
+        self.groups: Dict[str, Rule] = {}
+        words, phrases, literal_parts, pattern_parts = [], [], [], []
+        for rule in self.rules:
+            for literal in rule.words:
+                words.append(literal.lower())
+                self.literals.setdefault(literal.lower(), rule)
+            for literal in rule.phrases:
+                phrases.append(literal.lower())
+                self.literals.setdefault(literal.lower(), rule)
+        if words:
+            # Not \b: it needs a word character next to it, so it would
+            # never match around words like "c++" or "$$$".
+            literal_parts.append(rf"(?<!\w){literal_pattern(words)}(?!\w)")
+        if phrases:
+            literal_parts.append(literal_pattern(phrases))
+        for number, rule in enumerate(self.rules):
+            if rule.patterns:
+                group = f"rule{number}"
+                self.groups[group] = rule
+                pattern_parts.append(
+                    f"(?P<{group}>"
+                    + "|".join(f"(?:{pattern})" for pattern in rule.patterns)
+                    + ")"
+                )
+        # Case-sensitive on lowercased text: IGNORECASE makes the engine
+        # skip its literal optimisations.
+        self.literal_regex = (
+            re.compile("|".join(literal_parts)) if literal_parts else None
+        )
+        self.pattern_regex = (
+            re.compile("|".join(pattern_parts), re.IGNORECASE)
+            if pattern_parts
+            else None
+        )
+
+    def match(self, content: str) -> Optional[Rule]:
+        if self.literal_regex is not None:
+            found = self.literal_regex.search(content.lower())
+            if found is not None:
+                return self.literals.get(found.group())
+        if self.pattern_regex is not None:
+            found = self.pattern_regex.search(content)
+            if found is not None:
+                return self.groups.get(found.lastgroup)
+        return None
+
+
+def normalize(content: str) -> str:
+    """Lowercase and collapse whitespace, so trivial variants hash alike."""
+    return " ".join(content.lower().split())
+
+
+class FloodDetector:
+    """Per-user message rate and repeated messages over a sliding window.
+
+    Each user keeps the (time, hash of the normalized text) of its last
+    messages within ``window`` seconds, at most ``max_messages + 1`` of
+    them; ``check`` reports ``"rate"`` beyond ``max_messages`` messages
+    and ``"duplicate"`` when the same text was sent ``max_repeats``
+    times. Idle users are purged once the table grows past
+    ``purge_threshold``.
+    """
+
+    purge_threshold = 10_000
+
+    def __init__(
+        self, window: float = 30.0, max_repeats: int = 3, max_messages: int = 20
+    ):
+        self.window = window
+        self.max_repeats = max_repeats
+        self.max_messages = max_messages
+        self.history: Dict[object, Deque[Tuple[float, int]]] = {}
+        self.purge_size = 0
+
+    def check(self, user, content: str, now: float) -> Optional[str]:
+        digest = hash(normalize(content))
+        history = self.history.get(user)
+        if history is None:
+            # Before inserting: the new, still empty history would be purged.
+            if len(self.history) >= max(self.purge_threshold, self.purge_size):
+                self.purge(now)
+            history = self.history[user] = deque(maxlen=self.max_messages + 1)
+        expired = now - self.window
+        while history and history[0][0] <= expired:
+            history.popleft()
+        history.append((now, digest))
+        if len(history) > self.max_messages:
+            return "rate"
+        if self.max_repeats and len(history) >= self.max_repeats:
+            repeats = 0
+            for _, seen in history:
+                if seen == digest:
+                    repeats += 1
+            if repeats >= self.max_repeats:
+                return "duplicate"
+        return None
+
+    def purge(self, now: float):
+        expired = now - self.window
+        for user in [
+            user
+            for user, history in self.history.items()
+            if not history or history[-1][0] <= expired
+        ]:
+            del self.history[user]
+        # Purge again only once the table has doubled: amortised O(1).
+        self.purge_size = 2 * len(self.history)
+
+
+class Moderator:
+    """Chat pipeline filter applying a :class:`RuleSet` and flood limits.
+
+    Add it to a pipeline (``moderator=`` of the chat clients) after the
+    replay filter: a message matching a rule, or flagged by ``flood``,
+    triggers the rule's action and is dropped unless the rule says
+    otherwise. Users with one of ``exempt_roles`` are not checked. The
+    same action is sent at most once per ``action_cooldown`` seconds for
+    a user; the blocking client sends actions from a worker thread, the
+    asyncio client from a task, so the chat is never held up by the API.
+    A chat client given a moderator without ``trovo`` sets its own client.
+    """
+
+    purge_threshold = 10_000
+
+    def __init__(
+        self,
+        trovo,
+        rules: Union[RuleSet, Iterable[Rule]] = (),
+        *,
+        flood: Optional[FloodDetector] = None,
+        flood_action: Optional[str] = "timeout {nick_name} 60",
+        exempt_roles: Iterable[str] = EXEMPT_ROLES,
+        action_cooldown: float = 30.0,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.trovo = trovo
+        self.rules = rules if isinstance(rules, RuleSet) else RuleSet(rules)
+        self.flood = flood
+        self.flood_rules = {
+            reason: Rule(f"flood_{reason}", action=flood_action)
+            for reason in ("rate", "duplicate")
+        }
+        self.exempt_roles = frozenset(exempt_roles)
+        self.action_cooldown = action_cooldown
+        self.metrics = metrics or get_metrics()
+        self.last_action: Dict[Tuple[str, Optional[int], str], float] = {}
+        self.purge_size = 0
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self._tasks = set()
+
+    def __call__(self, message: ChatMessage) -> bool:
+        roles = message.roles
+        if roles and not self.exempt_roles.isdisjoint(roles):
+            return True
+        rule = self.rules.match(message.content)
+        now = time.monotonic()
+        if rule is None and self.flood is not None:
+            user = message.uid if message.uid is not None else message.nick_name
+            reason = self.flood.check((message.channel_id, user), message.content, now)
+            if reason is not None:
+                rule = self.flood_rules[reason]
+        if rule is None:
+            return True
+        self.metrics.inc("moderation_matches_total", rule=rule.name)
+        if rule.action is not None:
+            self.act(rule, message, now)
+        return not rule.drop
+
+    def act(self, rule: Rule, message: ChatMessage, now: float):
+        key = (rule.action, message.channel_id, message.nick_name)
+        last = self.last_action.get(key)
+        if last is not None and now - last < self.action_cooldown:
+            return
+        self.last_action[key] = now
+        if len(self.last_action) > max(self.purge_threshold, self.purge_size):
+            expired = now - self.action_cooldown
+            for stale in [k for k, at in self.last_action.items() if at <= expired]:
+                del self.last_action[stale]
+            self.purge_size = 2 * len(self.last_action)
+        command = rule.action.format(
+            nick_name=message.nick_name, user_name=message.user_name, uid=message.uid
+        )
+        self.perform(command, message.channel_id, rule.name)
+
+    def perform(self, command: str, channel_id: int, rule_name: str = ""):
+        if inspect.iscoroutinefunction(self.trovo.perform_chat_commannd):
+            task = asyncio.ensure_future(
+                self.trovo.perform_chat_commannd(command, channel_id)
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(1, thread_name_prefix="moderation")
+            task = self.pool.submit(
+                self.trovo.perform_chat_commannd, command, channel_id
+            )
+        task.add_done_callback(lambda done: self._performed(done, command, rule_name))
+
+    def _performed(self, done: Union[Future, asyncio.Future], command: str, rule_name):
+        if done.cancelled():
+            return
+        error = done.exception()
+        if error is None:
+            self.metrics.inc("moderation_actions_total", rule=rule_name, result="ok")
+        else:
+            self.metrics.inc("moderation_actions_total", rule=rule_name, result="error")
+            log.warning("Moderation command %r failed: %s", command, error)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
@@ -0,0 +1,173 @@
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from trovo.client.rate_limit import TokenBucket
+from trovo.client.trovo_client import TrovoClient
+from trovo.metrics import Metrics, get_metrics
+
+log = logging.getLogger(__name__)
+
+__all__ = ["SendQueue"]
+
+
+class SendQueue:
+    """Outbound chat messages sent by background workers.
+
+    ``put`` only appends to a per-channel queue, so the websocket thread
+    never waits on the API. Each channel is throttled by its own
+    :class:`TokenBucket`, a message already waiting in a channel is not
+    queued twice and ``maxsize`` bounds the total backlog (``put`` blocks
+    up to ``timeout`` seconds, then drops the message).
+    """
+
+    def __init__(
+        self,
+        trovo: TrovoClient,
+        *,
+        workers: int = 2,
+        rate: float = 1.0,
+        burst: float = 5.0,
+        maxsize: int = 1000,
+        coalesce: bool = True,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.trovo = trovo
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.coalesce = coalesce
+        self.metrics = metrics or get_metrics()
+        self.condition = threading.Condition()
+        self.pending: Dict[int, Deque[str]] = {}
+        self.pending_contents: Dict[int, Set[str]] = {}
+        self.buckets: Dict[int, TokenBucket] = {}
+        # (ready_at, channel_id) of every channel with pending messages.
+        self.schedule: List[Tuple[float, int]] = []
+        self.size = 0
+        self.in_flight = 0
+        self.closed = False
+        self.counters = {
+            "queued": 0,
+            "sent": 0,
+            "failed": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "max_depth": 0,
+        }
+        self.threads = [
+            threading.Thread(target=self._worker, daemon=True) for _ in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, content: str, channel_id: int, timeout: Optional[float] = 0) -> bool:
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("SendQueue is closed")
+            contents = self.pending_contents.setdefault(channel_id, set())
+            if self.coalesce and content in contents:
+                self.counters["coalesced"] += 1
+                self.metrics.inc("send_queue_messages_total", result="coalesced")
+                return True
+            if not self.condition.wait_for(
+                lambda: self.size < self.maxsize, timeout=timeout
+            ):
+                self.counters["dropped"] += 1
+                self.metrics.inc("send_queue_messages_total", result="dropped")
+                return False
+            queue = self.pending.setdefault(channel_id, deque())
+            if not queue:
+                heapq.heappush(self.schedule, (time.monotonic(), channel_id))
+            queue.append(content)
+            contents.add(content)
+            self.size += 1
+            self.counters["queued"] += 1
+            self.counters["max_depth"] = max(self.counters["max_depth"], self.size)
+            self.metrics.set("send_queue_depth", self.size)
+            self.condition.notify_all()
+            return True
+
+    def _next(self) -> Optional[Tuple[str, int]]:
+        while True:
+            if not self.schedule:
+                if self.closed:
+                    return None
+                self.condition.wait()
+                continue
+            ready_at, channel_id = self.schedule[0]
+            now = time.monotonic()
+            if ready_at > now:
+                self.condition.wait(ready_at - now)
+                continue
+            heapq.heappop(self.schedule)
+            bucket = self.buckets.get(channel_id)
+            if bucket is None:
+                bucket = self.buckets[channel_id] = TokenBucket(self.rate, self.burst)
+            wait = bucket.try_acquire(now)
+            if wait:
+                heapq.heappush(self.schedule, (now + wait, channel_id))
+                continue
+            queue = self.pending[channel_id]
+            content = queue.popleft()
+            self.pending_contents[channel_id].discard(content)
+            if queue:
+                heapq.heappush(self.schedule, (now, channel_id))
+            self.size -= 1
+            self.in_flight += 1
+            self.metrics.set("send_queue_depth", self.size)
+            self.condition.notify_all()
+            return content, channel_id
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                item = self._next()
+            if item is None:
+                return
+            content, channel_id = item
+            try:
+                self.trovo.send_chat_to_selected_channel(content, channel_id)
+                counter = "sent"
+            except Exception as e:
+                log.warning("Sending to channel %s failed: %s", channel_id, e)
+                counter = "failed"
+            self.metrics.inc("send_queue_messages_total", result=counter)
+            with self.condition:
+                self.in_flight -= 1
+                self.counters[counter] += 1
+                self.condition.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self.condition:
+            return {**self.counters, "depth": self.size, "in_flight": self.in_flight}
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued message has been sent."""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.size == 0 and self.in_flight == 0, timeout=timeout
+            )
+
+    def close(self, drain: bool = True, timeout: Optional[float] = None):
+        """Stop accepting messages and stop the workers.
+
+        With ``drain`` the messages still queued are sent first (rate limits
+        included), otherwise they are discarded.
+        """
+        if drain:
+            self.join(timeout)
+        with self.condition:
+            self.closed = True
+            if not drain:
+                self.counters["dropped"] += self.size
+                self.pending.clear()
+                self.pending_contents.clear()
+                self.schedule.clear()
+                self.size = 0
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
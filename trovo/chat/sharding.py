@@ -0,0 +1,177 @@
+import asyncio
+import multiprocessing
+import os
+from typing import Callable, Dict, Iterable, List, Optional
+
+from trovo.chat.async_chat_client import AsyncTrovoChat
+from trovo.chat.command_handler import CommandHandler
+from trovo.chat.message import ChatMessage
+from trovo.client.async_trovo_client import AsyncTrovoClient
+from trovo.client.helper_functions import LazyModule
+
+aiohttp = LazyModule("aiohttp")
+
+__all__ = [
+    "HandlerFactory",
+    "assign_shard",
+    "split_channels",
+    "ShardChat",
+    "run_shards",
+    "ShardedChatRunner",
+]
+
+HandlerFactory = Callable[[AsyncTrovoClient, int], CommandHandler]
+
+
+def assign_shard(channel_id: int, total_shard: int) -> int:
+    return int(channel_id) % total_shard
+
+
+def split_channels(channel_ids: Iterable[int], total_shard: int) -> List[List[int]]:
+    shards: List[List[int]] = [[] for _ in range(total_shard)]
+    for channel_id in channel_ids:
+        shards[assign_shard(channel_id, total_shard)].append(int(channel_id))
+    return shards
+
+
+class ShardChat(AsyncTrovoChat):
+    """One chat connection authenticated with a shard token.
+
+    The connection receives the chat of every channel in the shard and
+    routes each message by its ``channel_id`` to the handler of that
+    channel; messages of channels without a handler are dropped.
+    """
+
+    def __init__(
+        self,
+        trovo: AsyncTrovoClient,
+        total_shard: int,
+        current_shard: int,
+        handlers: Dict[int, CommandHandler],
+        **kwargs,
+    ):
+        super().__init__(trovo, None, **kwargs)
+        self.total_shard = total_shard
+        self.current_shard = current_shard
+        self.handlers = handlers
+        self.pipeline.add_handler(self.route)
+
+    async def generate_chat_token(self):
+        response = await self.trovo.get_chat_shard_token(
+            self.total_shard, self.current_shard
+        )
+        self.token = response["token"]
+
+    def route(self, message: ChatMessage):
+        handler = self.handlers.get(message.channel_id)
+        if handler is not None:
+            handler.handle(message)
+
+
+async def run_shards(
+    client_id: str,
+    access_token: str,
+    total_shard: int,
+    shards: Dict[int, List[int]],
+    handler_factory: HandlerFactory = CommandHandler,
+):
+    """Run the given ``{current_shard: channel_ids}`` on the current loop."""
+    async with AsyncTrovoClient(client_id, access_token) as trovo:
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0)
+        ) as ws_session:
+            chats = [
+                ShardChat(
+                    trovo,
+                    total_shard,
+                    current_shard,
+                    {
+                        channel_id: handler_factory(trovo, channel_id)
+                        for channel_id in channel_ids
+                    },
+                    ws_session=ws_session,
+                )
+                for current_shard, channel_ids in shards.items()
+            ]
+            await asyncio.gather(*(chat.run_forever() for chat in chats))
+
+
+def _run_worker(
+    client_id: str,
+    access_token: str,
+    total_shard: int,
+    shards: Dict[int, List[int]],
+    handler_factory: HandlerFactory,
+):
+    asyncio.run(
+        run_shards(client_id, access_token, total_shard, shards, handler_factory)
+    )
+
+
+class ShardedChatRunner:
+    """Spread the chat of many channels over shards and worker processes.
+
+    Channels are assigned to ``total_shard`` shards by ``channel_id %
+    total_shard``, each shard gets one websocket authenticated with its own
+    shard token and the shards are dealt round-robin to ``processes``
+    workers, so message handling is not bound to a single GIL.
+    ``handler_factory(trovo, channel_id)`` builds the handler of a channel
+    inside its worker and must be picklable (e.g. a module-level class).
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        access_token: str,
+        channel_ids: Iterable[int],
+        *,
+        total_shard: Optional[int] = None,
+        processes: Optional[int] = None,
+        handler_factory: HandlerFactory = CommandHandler,
+    ):
+        self.client_id = client_id
+        self.access_token = access_token
+        self.processes = processes or os.cpu_count() or 1
+        self.total_shard = total_shard or self.processes
+        self.handler_factory = handler_factory
+        self.shards = split_channels(channel_ids, self.total_shard)
+        self.workers: List[multiprocessing.Process] = []
+
+    def worker_shards(self) -> List[Dict[int, List[int]]]:
+        workers: List[Dict[int, List[int]]] = [{} for _ in range(self.processes)]
+        for current_shard, channel_ids in enumerate(self.shards):
+            if channel_ids:
+                workers[current_shard % self.processes][current_shard] = channel_ids
+        return [shards for shards in workers if shards]
+
+    def start(self):
+        for shards in self.worker_shards():
+            worker = multiprocessing.Process(
+                target=_run_worker,
+                args=(
+                    self.client_id,
+                    self.access_token,
+                    self.total_shard,
+                    shards,
+                    self.handler_factory,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            self.workers.append(worker)
+
+    def join(self):
+        for worker in self.workers:
+            worker.join()
+
+    def terminate(self):
+        for worker in self.workers:
+            worker.terminate()
+        self.join()
+
+    def run_forever(self):
+        self.start()
+        try:
+            self.join()
+        except KeyboardInterrupt:
+            self.terminate()
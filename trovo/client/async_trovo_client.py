@@ -0,0 +1,562 @@
+from __future__ import annotations
+
+import time
+from typing import List, Optional, Tuple
+
+from trovo.metrics import Metrics, get_metrics
+from .cache import ResponseCache, cached
+from .endpoints import *
+from .helper_functions import LazyModule, json_loads, parse_model
+from .request_builder import build_request
+from .resilience import Resilience, is_idempotent
+from .pagination import aiter_pages, by_total_page
+
+aiohttp = LazyModule("aiohttp")
+models = LazyModule("trovo.client.models")
+
+__all__ = ["AsyncTrovoClient"]
+
+
+class AsyncTrovoClient:
+    """asyncio counterpart of :class:`TrovoClient` built on aiohttp.
+
+    Every method is a coroutine with the same arguments and return type as
+    the blocking client, so one event loop can keep hundreds of API calls
+    in flight over a single pooled connector.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        access_token: Optional[str] = None,
+        *,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        timeout: Optional[float] = 10.0,
+        cache: Optional[ResponseCache] = None,
+        fast_models: bool = False,
+        resilience: Optional[Resilience] = None,
+        metrics: Optional[Metrics] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+    ):
+        self.client_id = client_id
+        self.access_token = access_token
+        self.headers = {"Accept": "application/json", "Client-ID": self.client_id}
+        self.auth = {"Authorization": f"OAuth {self.access_token}"}
+        self.headers_with_auth = {**self.headers, **self.auth}
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.cache = cache
+        self.fast_models = fast_models
+        self.tokens = None
+        self.token_cache: Optional[ResponseCache] = None
+        self.metrics = metrics or get_metrics()
+        if resilience is None:
+            resilience = Resilience(metrics=self.metrics)
+        self.resilience = resilience
+        self._session = session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # The session binds to the running loop, so it is created on first use.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __check_access_token(self):
+        if self.access_token is None:
+            raise ValueError("Access token is required for this operation")
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        raise_for_status: bool = False,
+        read_body: bool = True,
+        **kwargs,
+    ):
+        r, body = await self._send(method, url, **kwargs)
+        if raise_for_status:
+            r.raise_for_status()
+        if read_body:
+            return json_loads(body) if body.strip() else None
+
+    async def _send(
+        self, method: str, url: str, **kwargs
+    ) -> Tuple[aiohttp.ClientResponse, bytes]:
+        # The body is read before the connection goes back to the pool, so
+        # a failed attempt can be retried and the winner of a hedged call
+        # is complete.
+        async def send():
+            async with self.session.request(method, url, **kwargs) as r:
+                return r, await r.read()
+
+        endpoint = self.resilience.endpoint(url)
+        status = "error"
+        start = time.perf_counter()
+        try:
+            r, body = await self.resilience.call_async(
+                url, send, idempotent=is_idempotent(url)
+            )
+            status = str(r.status)
+            return r, body
+        finally:
+            self.metrics.observe(
+                "api_request_seconds", time.perf_counter() - start, endpoint=endpoint
+            )
+            self.metrics.inc("api_requests_total", endpoint=endpoint, status=status)
+
+    async def __auth_get_request(self, url: str):
+        self.__check_access_token()
+        return await self._request("GET", url, headers=self.headers_with_auth)
+
+    async def __auth_get_request_with_params(self, url: str, params: dict):
+        self.__check_access_token()
+        return await self._request(
+            "GET", url, headers=self.headers_with_auth, params=params
+        )
+
+    def set_client_id(self, client_id):
+        self.client_id = client_id
+
+    def set_access_token(self, access_token):
+        self.access_token = access_token
+        self.auth = {"Authorization": f"OAuth {self.access_token}"}
+        self.headers_with_auth = {**self.headers, **self.auth}
+
+    async def validate_access_token(self) -> models.ValidateAccessTokenResponse:
+        self.__check_access_token()
+        response = await self._request(
+            "GET", VALIDATE_URL, raise_for_status=True, headers=self.headers_with_auth
+        )
+        return models.ValidateAccessTokenResponse(**response)
+
+    async def refresh_access_token(
+        self, client_secret: str, refresh_token: str
+    ) -> models.AccessTokenResponse:
+        data = build_request(
+            models.RefreshTokenRequest,
+            client_secret=client_secret,
+            refresh_token=refresh_token,
+        )
+        return await self.process_post_model(
+            REFRESH_URL, data, models.AccessTokenResponse
+        )
+
+    async def revoke_access_token(self):
+        self.__check_access_token()
+        await self._request(
+            "POST",
+            REVOKE_URL,
+            raise_for_status=True,
+            read_body=False,
+            headers=self.headers,
+            json={"access_token": self.access_token},
+        )
+
+    async def process_post_method(self, url, data):
+        return await self._request(
+            "POST", url, raise_for_status=True, headers=self.headers, json=data
+        )
+
+    async def process_post_model(self, url, data, model):
+        if not self.fast_models:
+            return model(**await self.process_post_method(url, data))
+        r, body = await self._send("POST", url, headers=self.headers, json=data)
+        r.raise_for_status()
+        return parse_model(model, body)
+
+    @cached
+    async def get_game_categories(self) -> models.GameCategoriesResponse:
+        response = await self._request(
+            "GET", GAME_CATEGORIES_URL, raise_for_status=True, headers=self.headers
+        )
+        return models.GameCategoriesResponse(**response)
+
+    async def search_game_categories(
+        self, query: str, limit: int = 20
+    ) -> models.GameCategoriesResponse:
+        data = build_request(models.CategorySearchRequest, query=query, limit=limit)
+        return await self.process_post_model(
+            SEARCH_CATEGORIES_URL, data, models.GameCategoriesResponse
+        )
+
+    async def get_top_channels(
+        self,
+        *,
+        limit: int = 20,
+        after: Optional[bool] = None,
+        token: Optional[str] = None,
+        cursor: Optional[int] = None,
+        category_id: Optional[str] = None,
+    ) -> models.TopChannelsResponse:
+        data = build_request(
+            models.TopChannelsRequest,
+            exclude_none=True,
+            limit=limit,
+            after=after,
+            token=token,
+            cursor=cursor,
+            category_id=category_id,
+        )
+        return await self.process_post_model(
+            TOP_CHANNELS_URL, data, models.TopChannelsResponse
+        )
+
+    @cached
+    async def get_users_by_username(self, users: List[str]):
+        data = {"users": users}
+        return await self.process_post_model(
+            GET_USERS_URL, data, models.UserSearchResponse
+        )
+
+    @cached
+    async def get_channel_info_by_id(
+        self, channel_id: Optional[str] = None, username: Optional[str] = None
+    ) -> models.ChannelInfoResponse:
+        data = build_request(
+            models.ChannelInfoRequest,
+            exclude_none=True,
+            channel_id=channel_id,
+            username=username,
+        )
+        return await self.process_post_model(
+            GET_CHANNEL_INFO_URL, data, models.ChannelInfoResponse
+        )
+
+    async def get_channel_info_by_streamkey(self):
+        response = await self.__auth_get_request(READ_CHANNEL_INFO_URL)
+        return models.ChannelStreamKeyResponse(**response)
+
+    async def edit_channel_info(
+        self,
+        channel_id: int,
+        live_title: Optional[str] = None,
+        category: Optional[str] = None,
+        language_code: Optional[str] = None,
+        audi_type: Optional[str] = None,
+    ):
+        data = build_request(
+            models.ChannelEditInfoRequest,
+            exclude_none=True,
+            channel_id=channel_id,
+            live_title=live_title,
+            category=category,
+            language_code=language_code,
+            audi_type=audi_type,
+        )
+        await self._request(
+            "POST",
+            EDIT_CHANNEL_INTO_URL,
+            raise_for_status=True,
+            read_body=False,
+            headers=self.headers_with_auth,
+            json=data,
+        )
+
+    async def get_user_info(self):
+        response = await self.__auth_get_request(GET_USER_INFO_URL)
+        return models.UserInfoResponse(**response)
+
+    async def get_subscribers(
+        self, channel_id: int, limit: int = 25, offset: int = 0, direction: str = "asc"
+    ):
+        data = build_request(
+            models.GetSubsRequest, limit=limit, offset=offset, direction=direction
+        )
+        url = CHANNEL_URL + f"/{channel_id}/subscriptions"
+        response = await self.__auth_get_request_with_params(url, data)
+        return models.GetSubsResponse(**response)
+
+    @cached
+    async def get_emotes(self, emote_type: int, channel_id: List[int]):
+        data = build_request(
+            models.GetEmotesRequest,
+            exclude_none=True,
+            emote_type=emote_type,
+            channel_id=channel_id,
+        )
+        return await self.process_post_method(GET_EMOTES_URL, data=data)
+
+    async def get_channel_viewers(
+        self, channel_id: int, limit: int = 20, cursor: int = 0, raw: bool = False
+    ):
+        data = build_request(
+            models.GetChannelViewersRequest, limit=limit, cursor=cursor
+        )
+        url = CHANNEL_URL + f"/{channel_id}/viewers"
+        if raw:
+            return await self.process_post_method(url, data)
+        return await self.process_post_model(
+            url, data, models.GetChannelViewersResponse
+        )
+
+    async def get_channel_followers(
+        self, channel_id: int, limit: int = 20, cursor: int = 0, direction: str = "asc"
+    ):
+        data = build_request(
+            models.GetChannelFollowersRequest,
+            limit=limit,
+            cursor=cursor,
+            direction=direction,
+        )
+        url = CHANNEL_URL + f"/{channel_id}/followers"
+        return await self.process_post_model(
+            url, data, models.GetChannelFollowersResponse
+        )
+
+    @cached
+    async def get_live_stream_urls(self, channel_id: int):
+        data = {"channel_id": channel_id}
+        headers = {**self.headers, "Referer": "http://openplatform.trovo.live"}
+        response = await self._request(
+            "POST", GET_LIVESTREAMS_URL, headers=headers, json=data
+        )
+        return models.GetLiveStreamsUrlsResponse(**response)
+
+    async def get_clips_info(
+        self,
+        channel_id: int,
+        category_id: Optional[str] = None,
+        period: Optional[str] = "week",
+        clip_id: Optional[str] = None,
+        limit: Optional[int] = 20,
+        cursor: Optional[int] = 0,
+        direction: Optional[str] = "asc",
+    ):
+        data = build_request(
+            models.GetClipsRequest,
+            exclude_none=True,
+            channel_id=channel_id,
+            category_id=category_id,
+            period=period,
+            clip_id=clip_id,
+            limit=limit,
+            cursor=cursor,
+            direction=direction,
+        )
+        return await self.process_post_model(
+            GET_CLIPS_INFO_URL, data, models.GetClipsResponse
+        )
+
+    async def get_past_streams_info(
+        self,
+        channel_id: int,
+        category_id: Optional[str] = None,
+        period: Optional[str] = "week",
+        past_stream_id: Optional[str] = None,
+        limit: Optional[int] = 20,
+        cursor: Optional[int] = 0,
+        direction: Optional[str] = "asc",
+    ):
+        data = build_request(
+            models.GetPastStreamsInfo,
+            exclude_none=True,
+            channel_id=channel_id,
+            category_id=category_id,
+            period=period,
+            past_stream_id=past_stream_id,
+            limit=limit,
+            cursor=cursor,
+            direction=direction,
+        )
+        return await self.process_post_model(
+            GET_PAST_STREAMS_URL, data, models.GetPastStreamsResponse
+        )
+
+    async def send_chat_to_my_channel(self, content: str):
+        data = {"content": content}
+        await self._request(
+            "POST",
+            CHAT_SEND_URL,
+            raise_for_status=True,
+            read_body=False,
+            headers=self.headers_with_auth,
+            json=data,
+        )
+
+    async def send_chat_to_selected_channel(self, content: str, channel_id: int):
+        data = {"content": content, "channel_id": channel_id}
+        await self._request(
+            "POST",
+            CHAT_SEND_URL,
+            raise_for_status=True,
+            read_body=False,
+            headers=self.headers_with_auth,
+            json=data,
+        )
+
+    async def perform_chat_commannd(self, command: str, channel_id: int):
+        data = {"command": command, "channel_id": channel_id}
+        await self._request(
+            "POST",
+            CHAT_COMMAND_URL,
+            raise_for_status=True,
+            read_body=False,
+            headers=self.headers_with_auth,
+            json=data,
+        )
+
+    @cached(store="token_cache")
+    async def get_chat_token(self):
+        self.__check_access_token()
+        return await self._request(
+            "GET",
+            GET_CHAT_TOKEN_URL,
+            raise_for_status=True,
+            headers=self.headers_with_auth,
+        )
+
+    @cached(store="token_cache")
+    async def get_chat_channel_token(self, channel_id: int):
+        url = GET_CHAT_CHANNEL_TOKEN_URL + f"/{channel_id}"
+        return await self._request(
+            "GET", url, raise_for_status=True, headers=self.headers
+        )
+
+    @cached(store="token_cache")
+    async def get_chat_shard_token(self, total_shard: int, current_shard: int):
+        data = {"current_shard": current_shard, "total_shard": total_shard}
+        return await self._request(
+            "GET",
+            GET_CHAT_SHARD_TOKEN_URL,
+            raise_for_status=True,
+            headers=self.headers,
+            params=data,
+        )
+
+    def iter_top_channels(
+        self,
+        *,
+        limit: int = 100,
+        category_id: Optional[str] = None,
+        prefetch: bool = True,
+    ):
+        async def fetch(index, previous):
+            return await self.get_top_channels(
+                limit=limit,
+                token=previous.token if previous is not None else None,
+                cursor=index if previous is not None else None,
+                category_id=category_id,
+            )
+
+        return aiter_pages(
+            fetch, lambda page: page.top_channels_lists, by_total_page, prefetch
+        )
+
+    def iter_channel_viewers(
+        self, channel_id: int, limit: int = 200, prefetch: bool = True
+    ):
+        async def fetch(index, previous):
+            return await self.get_channel_viewers(channel_id, limit=limit, cursor=index)
+
+        def has_next(page, index):
+            if getattr(page, "total_page", None) is not None:
+                return by_total_page(page, index)
+            return len(page.chatters.all.viewers) >= limit
+
+        return aiter_pages(
+            fetch, lambda page: page.chatters.all.viewers, has_next, prefetch
+        )
+
+    def iter_channel_followers(
+        self,
+        channel_id: int,
+        limit: int = 100,
+        direction: str = "asc",
+        prefetch: bool = True,
+    ):
+        async def fetch(index, previous):
+            return await self.get_channel_followers(
+                channel_id, limit=limit, cursor=index, direction=direction
+            )
+
+        return aiter_pages(fetch, lambda page: page.follower, by_total_page, prefetch)
+
+    def iter_subscribers(
+        self,
+        channel_id: int,
+        limit: int = 100,
+        direction: str = "asc",
+        prefetch: bool = True,
+    ):
+        async def fetch(index, previous):
+            return await self.get_subscribers(
+                channel_id, limit=limit, offset=index * limit, direction=direction
+            )
+
+        return aiter_pages(
+            fetch,
+            lambda page: page.subscriptions,
+            lambda page, index: (index + 1) * limit < page.total,
+            prefetch,
+        )
+
+    def iter_clips_info(
+        self,
+        channel_id: int,
+        category_id: Optional[str] = None,
+        period: Optional[str] = "week",
+        limit: int = 100,
+        direction: Optional[str] = "asc",
+        prefetch: bool = True,
+    ):
+        async def fetch(index, previous):
+            return await self.get_clips_info(
+                channel_id,
+                category_id=category_id,
+                period=period,
+                limit=limit,
+                cursor=index,
+                direction=direction,
+            )
+
+        return aiter_pages(fetch, lambda page: page.clips_info, by_total_page, prefetch)
+
+    def iter_past_streams_info(
+        self,
+        channel_id: int,
+        category_id: Optional[str] = None,
+        period: Optional[str] = "week",
+        limit: int = 100,
+        direction: Optional[str] = "asc",
+        prefetch: bool = True,
+    ):
+        async def fetch(index, previous):
+            return await self.get_past_streams_info(
+                channel_id,
+                category_id=category_id,
+                period=period,
+                limit=limit,
+                cursor=index,
+                direction=direction,
+            )
+
+        return aiter_pages(
+            fetch, lambda page: page.past_streams_info, by_total_page, prefetch
+        )
+
+
+def __getattr__(name: str):
+    # Models used to be star-imported here; dunders are probed by the
+    # import system and must not load them.
+    if not name.startswith("__") and name in models.__all__:
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .helper_functions import LazyModule
+
+# Only the asyncio code paths need it, and it is slow to import.
+asyncio = LazyModule("asyncio")
+
+__all__ = ["DEFAULT_TTLS", "CHAT_TOKEN_TTLS", "TTLCache", "ResponseCache", "cached"]
+
+# Seconds a response of each cacheable TrovoClient method stays fresh.
+DEFAULT_TTLS = {
+    "get_game_categories": 3600.0,
+    "get_channel_info_by_id": 60.0,
+    "get_users_by_username": 600.0,
+    "get_emotes": 600.0,
+    "get_live_stream_urls": 30.0,
+}
+
+# Chat tokens are not returned with an expiry; they are kept this long by
+# TokenManager and dropped early when the chat server rejects one.
+CHAT_TOKEN_TTLS = {
+    "get_chat_token": 1800.0,
+    "get_chat_channel_token": 1800.0,
+    "get_chat_shard_token": 1800.0,
+}
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return False, None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self.data[key]
+                return False, None
+            self.data.move_to_end(key)
+            return True, value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self.data[key] = (expires_at, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class ResponseCache:
+    """Cache of API responses keyed by client method and arguments.
+
+    Each method gets its own :class:`TTLCache` with the TTL from ``ttls``
+    (methods missing from it are not cached). Concurrent calls with the
+    same key share one request (single-flight): the first caller fetches,
+    the others wait for its result. ``cache_factory(maxsize, ttl)`` can
+    swap the storage, e.g. for a shared external cache with the same
+    ``get``/``set`` interface.
+
+    Values are not copied: every hit returns the same model or dict, so
+    callers must treat them as read-only (``model_copy(deep=True)`` or
+    ``copy.deepcopy`` one before changing it).
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        maxsize: int = 1024,
+        cache_factory: Callable[[int, float], TTLCache] = TTLCache,
+    ):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.caches = {
+            endpoint: cache_factory(maxsize, ttl) for endpoint, ttl in self.ttls.items()
+        }
+        self.lock = threading.Lock()
+        self.in_flight: Dict[Tuple[str, Hashable], Future] = {}
+        self.async_in_flight: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self.counters: Dict[str, Dict[str, int]] = {
+            endpoint: {"hits": 0, "misses": 0, "coalesced": 0} for endpoint in self.ttls
+        }
+
+    def _count(self, endpoint: str, counter: str):
+        with self.lock:
+            self.counters[endpoint][counter] += 1
+
+    def get_or_call(self, endpoint: str, key: Hashable, fetch: Callable[[], Any]):
+        cache = self.caches.get(endpoint)
+        if cache is None:
+            return fetch()
+        hit, value = cache.get(key)
+        if hit:
+            self._count(endpoint, "hits")
+            return value
+        with self.lock:
+            future = self.in_flight.get((endpoint, key))
+            leader = future is None
+            if leader:
+                future = self.in_flight[(endpoint, key)] = Future()
+                self.counters[endpoint]["misses"] += 1
+            else:
+                self.counters[endpoint]["coalesced"] += 1
+        if not leader:
+            return future.result()
+        try:
+            value = fetch()
+            cache.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[(endpoint, key)]
+
+    async def get_or_call_async(
+        self, endpoint: str, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ):
+        cache = self.caches.get(endpoint)
+        if cache is None:
+            return await fetch()
+        hit, value = cache.get(key)
+        if hit:
+            self._count(endpoint, "hits")
+            return value
+        task = self.async_in_flight.get((endpoint, key))
+        if task is not None:
+            self._count(endpoint, "coalesced")
+            return await asyncio.shield(task)
+        self._count(endpoint, "misses")
+        task = self.async_in_flight[(endpoint, key)] = asyncio.ensure_future(fetch())
+        try:
+            value = await asyncio.shield(task)
+            cache.set(key, value)
+            return value
+        finally:
+            self.async_in_flight.pop((endpoint, key), None)
+
+    def invalidate(self, endpoint: Optional[str] = None):
+        with self.lock:
+            caches = [
+                cache
+                for name, cache in self.caches.items()
+                if endpoint is None or name == endpoint
+            ]
+        for cache in caches:
+            cache.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            return {
+                endpoint: {
+                    **counters,
+                    "size": len(self.caches[endpoint]),
+                    "evictions": self.caches[endpoint].evictions,
+                }
+                for endpoint, counters in self.counters.items()
+            }
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def cached(method=None, *, store: str = "cache"):
+    """Serve a client method from ``self.cache`` when the client has one.
+
+    The method name selects the TTL and the bound arguments (defaults
+    applied, so positional and keyword calls share entries) form the key;
+    works for the methods of both TrovoClient and AsyncTrovoClient.
+    Cached results are shared between callers and must not be modified.
+    ``store`` names another client attribute holding the ResponseCache.
+    """
+    if method is None:
+        return functools.partial(cached, store=store)
+    endpoint = method.__name__
+    signature = inspect.signature(method)
+
+    def make_key(self, args, kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        return _freeze(list(bound.arguments.values())[1:])
+
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            cache = getattr(self, store)
+            if cache is None:
+                return await method(self, *args, **kwargs)
+            key = make_key(self, args, kwargs)
+            return await cache.get_or_call_async(
+                endpoint, key, lambda: method(self, *args, **kwargs)
+            )
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = getattr(self, store)
+        if cache is None:
+            return method(self, *args, **kwargs)
+        key = make_key(self, args, kwargs)
+        return cache.get_or_call(endpoint, key, lambda: method(self, *args, **kwargs))
+
+    return wrapper
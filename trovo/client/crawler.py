@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+from .async_trovo_client import AsyncTrovoClient
+from .rate_limit import TokenBucket
+
+__all__ = ["TopChannelsCrawler"]
+
+
+class TopChannelsCrawler:
+    """Snapshot the top channels of every game category.
+
+    Categories are crawled by ``concurrency`` workers sharing one request
+    rate limit. Every page is appended to ``output`` as newline-delimited
+    JSON (one channel per line) and the position of each category is then
+    saved to ``checkpoint``, so a crawl that failed or was interrupted
+    resumes where it stopped when run again. A crawl that completed every
+    category removes the checkpoint, the next run appends a new snapshot
+    to ``output``. A page written just before a crash may be written
+    twice, consumers should deduplicate on ``channel_id`` if that matters.
+    """
+
+    def __init__(
+        self,
+        trovo: AsyncTrovoClient,
+        output: str,
+        checkpoint: Optional[str] = None,
+        *,
+        concurrency: int = 8,
+        rate: float = 10.0,
+        burst: float = 10.0,
+        limit: int = 100,
+    ):
+        self.trovo = trovo
+        self.output = output
+        self.checkpoint = checkpoint or output + ".checkpoint"
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.limit = limit
+        # category_id -> {"token": ..., "cursor": next page, "done": bool}
+        self.state: Dict[str, dict] = {}
+        self.failed: Dict[str, str] = {}
+        self.channels = 0
+
+    def load_checkpoint(self):
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as f:
+                self.state = json.load(f)
+
+    def save_checkpoint(self):
+        tmp = self.checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.checkpoint)
+
+    def clear_checkpoint(self):
+        self.state = {}
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    async def category_ids(self) -> Iterable[str]:
+        await self.bucket.acquire()
+        response = await self.trovo.get_game_categories()
+        return [category.id for category in response.category_info]
+
+    async def crawl_category(self, category_id: str, out):
+        position = self.state.setdefault(
+            category_id, {"token": None, "cursor": 0, "done": False}
+        )
+        while not position["done"]:
+            await self.bucket.acquire()
+            page = await self.trovo.get_top_channels(
+                limit=self.limit,
+                token=position["token"],
+                cursor=position["cursor"] if position["token"] else None,
+                category_id=category_id,
+            )
+            for channel in page.top_channels_lists:
+                out.write(channel.model_dump_json())
+                out.write("\n")
+            out.flush()
+            self.channels += len(page.top_channels_lists)
+            position["token"] = page.token
+            position["cursor"] += 1
+            position["done"] = (
+                not page.top_channels_lists or position["cursor"] >= page.total_page
+            )
+            self.save_checkpoint()
+
+    async def worker(self, queue: asyncio.Queue, out):
+        while True:
+            try:
+                category_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await self.crawl_category(category_id, out)
+            except Exception as e:
+                self.failed[category_id] = str(e)
+
+    async def run(self, category_ids: Optional[Iterable[str]] = None) -> dict:
+        """Crawl and return ``{"channels": written, "failed": {id: error}}``."""
+        self.load_checkpoint()
+        if category_ids is None:
+            category_ids = await self.category_ids()
+        category_ids = list(category_ids)
+        queue: asyncio.Queue = asyncio.Queue()
+        for category_id in category_ids:
+            if not self.state.get(category_id, {}).get("done"):
+                queue.put_nowait(category_id)
+        self.failed = {}
+        with open(self.output, "a") as out:
+            await asyncio.gather(
+                *(self.worker(queue, out) for _ in range(self.concurrency))
+            )
+        if not self.failed and all(
+            self.state.get(category_id, {}).get("done") for category_id in category_ids
+        ):
+            self.clear_checkpoint()
+        return {"channels": self.channels, "failed": dict(self.failed)}
@@ -1,3 +1,34 @@
+__all__ = [
+    "AUTH_URL",
+    "API_URL",
+    "VALIDATE_URL",
+    "REVOKE_URL",
+    "REFRESH_URL",
+    "GAME_CATEGORIES_URL",
+    "SEARCH_CATEGORIES_URL",
+    "TOP_CHANNELS_URL",
+    "GET_USERS_URL",
+    "GET_USER_INFO_URL",
+    "CHANNEL_URL",
+    "GET_CHANNEL_INFO_URL",
+    "EDIT_CHANNEL_INTO_URL",
+    "GET_CHANNEL_SUBS",
+    "READ_CHANNEL_INFO_URL",
+    "GET_EMOTES_URL",
+    "GET_LIVESTREAMS_URL",
+    "GET_CLIPS_INFO_URL",
+    "GET_PAST_STREAMS_URL",
+    "GET_DROPS_URL",
+    "UPDATE_DROPS_URL",
+    "CHAT_SEND_URL",
+    "CHAT_COMMAND_URL",
+    "EXCHANGE_TOKEN_URL",
+    "GET_CHAT_TOKEN_URL",
+    "GET_CHAT_CHANNEL_TOKEN_URL",
+    "GET_CHAT_SHARD_TOKEN_URL",
+    "CHAT_WS_URL",
+]
+
 AUTH_URL = "https://open.trovo.live/page/login.html"
 
 API_URL = "https://open-api.trovo.live/openplatform"
@@ -36,3 +67,5 @@ EXCHANGE_TOKEN_URL = f"{API_URL}/exchangetoken"
 GET_CHAT_TOKEN_URL = f"{API_URL}/chat/token"
 GET_CHAT_CHANNEL_TOKEN_URL = f"{API_URL}/chat/channel-token"
 GET_CHAT_SHARD_TOKEN_URL = f"{API_URL}/chat/shard-token"
+
+CHAT_WS_URL = "wss://open-chat.trovo.live/chat"
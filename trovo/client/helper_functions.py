@@ -0,0 +1,54 @@
+import importlib
+import json
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
+    def json_dumps(value) -> bytes:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+__all__ = ["LazyModule", "json_dumps", "json_loads", "parse_model"]
+
+
+class LazyModule:
+    """Stand-in for module ``name``, imported on first attribute access.
+
+    Keeps pydantic models and the HTTP/websocket libraries out of the
+    import of modules that only need them once a client is built or a
+    call is made. Attributes are cached on the instance after the first
+    lookup, so later accesses cost a plain attribute read.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        value = getattr(module, attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}>"
+
+
+def parse_model(model, body: bytes):
+    """Build ``model`` from a raw JSON response body.
+
+    orjson plus ``model_validate`` is the fastest route when orjson is
+    installed; otherwise pydantic-core parses the bytes itself, which still
+    skips building and splatting an intermediate dict.
+    """
+    if orjson is not None:
+        return model.model_validate(orjson.loads(body))
+    return model.model_validate_json(body)
@@ -1,7 +1,61 @@
-from pydantic import BaseModel, validator, Field
-from typing import List, Optional, Dict
+from pydantic import BaseModel, field_validator, Field
+from typing import List, Literal, Optional, Dict
 import warnings
 
+__all__ = [
+    "AudienceType",
+    "Direction",
+    "Period",
+    "EmoteType",
+    "GameCategory",
+    "GameCategoriesResponse",
+    "CategorySearchRequest",
+    "TopChannelsRequest",
+    "ChannelSocials",
+    "BaseChannel",
+    "Channel",
+    "TopChannelsResponse",
+    "User",
+    "UserSearchResponse",
+    "ChannelInfoResponse",
+    "ChannelInfoRequest",
+    "ChannelStreamKeyResponse",
+    "ChannelEditInfoRequest",
+    "UserInfoResponse",
+    "UserSub",
+    "SubList",
+    "GetSubsResponse",
+    "GetSubsRequest",
+    "GetEmotesRequest",
+    "GetChannelViewersRequest",
+    "Viewers",
+    "Chatters",
+    "GetChannelViewersResponse",
+    "GetChannelFollowersRequest",
+    "ChannelFollower",
+    "GetChannelFollowersResponse",
+    "StreamUrls",
+    "GetLiveStreamsUrlsResponse",
+    "GetClipsRequest",
+    "ClipInfo",
+    "GetClipsResponse",
+    "GetPastStreamsInfo",
+    "PastStreamInfo",
+    "GetPastStreamsResponse",
+    "ValidateAccessTokenResponse",
+    "RefreshTokenRequest",
+    "AccessTokenResponse",
+]
+
+AudienceType = Literal[
+    "CHANNEL_AUDIENCE_TYPE_FAMILYFRIENDLY",
+    "CHANNEL_AUDIENCE_TYPE_TEEN",
+    "CHANNEL_AUDIENCE_TYPE_EIGHTEENPLUS",
+]
+Direction = Literal["asc", "desc"]
+Period = Literal["day", "week", "month", "all"]
+EmoteType = Literal[0, 1, 2]
+
 
 class GameCategory(BaseModel):
     id: str
@@ -106,19 +160,10 @@ class ChannelEditInfoRequest(BaseModel):
     live_title: Optional[str] = None
     category: Optional[str] = None
     language_code: Optional[str] = None
-    audi_type: Optional[str] = None
-
-    @validator("audi_type")
-    def check_audi_type(cls, v):
-        if v is not None and v not in [
-            "CHANNEL_AUDIENCE_TYPE_FAMILYFRIENDLY",
-            "CHANNEL_AUDIENCE_TYPE_TEEN",
-            "CHANNEL_AUDIENCE_TYPE_EIGHTEENPLUS",
-        ]:
-            raise ValueError("Incorrect audi_type: ", v)
-        return v
+    audi_type: Optional[AudienceType] = None
 
-    @validator("language_code")
+    @field_validator("language_code")
+    @classmethod
     def check_language_code(cls, v):
         if v is not None and len(v) != 2:
             raise ValueError("Incorrect country language code: ", v)
@@ -159,31 +204,13 @@ class GetSubsResponse(BaseModel):
 class GetSubsRequest(BaseModel):
     limit: int = Field(default=25, ge=0, le=100)
     offset: int = Field(default=0, ge=0)
-    direction: str = "asc"
-
-    @validator("direction")
-    def check_direction_variable(cls, v):
-        if v not in ["asc", "desc"]:
-            raise ValueError(
-                "Incorrect value for direction: it can only be 'asc' or 'desc', provided value: ",
-                v,
-            )
-        return v
+    direction: Direction = "asc"
 
 
 class GetEmotesRequest(BaseModel):
-    emote_type: int
+    emote_type: EmoteType
     channel_id: List[int]
 
-    @validator("emote_type")
-    def check_emote_type(cls, v):
-        if v not in [0, 1, 2]:
-            raise ValueError(
-                "Incorrect value for emote_type: it can only be 0/1/2, provided value: ",
-                v,
-            )
-        return v
-
 
 class GetChannelViewersRequest(BaseModel):
     limit: Optional[int] = Field(default=20, ge=20, le=200)
@@ -221,16 +248,7 @@ class GetChannelViewersResponse(BaseModel):
 
 
 class GetChannelFollowersRequest(GetChannelViewersRequest):
-    direction: str = "asc"
-
-    @validator("direction")
-    def check_direction(cls, v):
-        if v not in ["asc", "desc"]:
-            raise ValueError(
-                "Incorrect value for direction: it can only be 'asc' or 'desc', provided value: ",
-                v,
-            )
-        return v
+    direction: Direction = "asc"
 
 
 class ChannelFollower(BaseModel):
@@ -259,28 +277,11 @@ class GetLiveStreamsUrlsResponse(BaseModel):
 class GetClipsRequest(BaseModel):
     channel_id: int
     category_id: Optional[str] = None
-    period: Optional[str] = "week"
+    period: Optional[Period] = "week"
     clip_id: Optional[str] = None
     limit: Optional[int] = Field(default=20, ge=0, le=100)
     cursor: Optional[int] = Field(default=0, ge=0)
-    direction: Optional[str] = "asc"
-
-    @validator("direction")
-    def check_direction(cls, v):
-        if v not in ["asc", "desc"]:
-            raise ValueError(
-                "Incorrect value for direction: it can only be 'asc' or 'desc', provided value: ",
-                v,
-            )
-        return v
-
-    @validator("period")
-    def check_period(cls, v):
-        if v not in ["day", "week", "month", "all"]:
-            raise ValueError(
-                "Incorrect value for period: it can only be day/week/month/all, provided value: ",
-                v,
-            )
+    direction: Optional[Direction] = "asc"
 
 
 class ClipInfo(BaseModel):
@@ -338,3 +339,24 @@ class GetPastStreamsResponse(BaseModel):
     past_streams_info: List[PastStreamInfo]
     total_page: int
     cursor: int
+
+
+class ValidateAccessTokenResponse(BaseModel):
+    uid: str
+    client_id: str
+    nick_name: str
+    scopes: List[str]
+    expire_ts: int
+
+
+class RefreshTokenRequest(BaseModel):
+    client_secret: str
+    grant_type: Literal["refresh_token"] = "refresh_token"
+    refresh_token: str
+
+
+class AccessTokenResponse(BaseModel):
+    access_token: str
+    token_type: str
+    expires_in: int
+    refresh_token: str
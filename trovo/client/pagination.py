@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+)
+
+from .helper_functions import LazyModule
+
+asyncio = LazyModule("asyncio")
+
+__all__ = [
+    "FetchPage",
+    "AsyncFetchPage",
+    "PageItems",
+    "HasNext",
+    "by_total_page",
+    "iter_pages",
+    "aiter_pages",
+]
+
+# fetch(index, previous_page) -> page; items(page) -> items of the page;
+# has_next(page, index) -> whether a page follows the one at ``index``.
+FetchPage = Callable[[int, Optional[Any]], Any]
+AsyncFetchPage = Callable[[int, Optional[Any]], Awaitable[Any]]
+PageItems = Callable[[Any], Iterable]
+HasNext = Callable[[Any, int], bool]
+
+
+def by_total_page(page, index: int) -> bool:
+    return index + 1 < page.total_page
+
+
+def iter_pages(
+    fetch: FetchPage, items: PageItems, has_next: HasNext, prefetch: bool = True
+) -> Iterator:
+    """Yield the items of every page, one page at a time.
+
+    With ``prefetch`` the next page is requested on a helper thread as soon
+    as the current one arrives, so its latency overlaps the consumer's
+    work; at most two pages are held in memory either way. An error
+    fetching a page is raised after the items of the previous page were
+    yielded, whether or not it was prefetched.
+    """
+    executor = ThreadPoolExecutor(1) if prefetch else None
+    upcoming = None
+    try:
+        index, page = 0, fetch(0, None)
+        while True:
+            page_items = items(page)
+            more = bool(page_items) and has_next(page, index)
+            if more and executor is not None:
+                upcoming = executor.submit(fetch, index + 1, page)
+            yield from page_items
+            if not more:
+                return
+            index += 1
+            page = upcoming.result() if upcoming is not None else fetch(index, page)
+            upcoming = None
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def aiter_pages(
+    fetch: AsyncFetchPage, items: PageItems, has_next: HasNext, prefetch: bool = True
+) -> AsyncIterator:
+    """asyncio version of :func:`iter_pages`, prefetching with a task."""
+    index, page = 0, await fetch(0, None)
+    upcoming: Optional[asyncio.Task] = None
+    try:
+        while True:
+            page_items = items(page)
+            more = bool(page_items) and has_next(page, index)
+            if more and prefetch:
+                upcoming = asyncio.ensure_future(fetch(index + 1, page))
+            for item in page_items:
+                yield item
+            if not more:
+                return
+            index += 1
+            page = await upcoming if prefetch else await fetch(index, page)
+            upcoming = None
+    finally:
+        if upcoming is not None:
+            upcoming.cancel()
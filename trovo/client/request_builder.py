@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import functools
+from typing import TYPE_CHECKING, Tuple, Type
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+__all__ = ["build_request"]
+
+
+@functools.lru_cache(maxsize=2048)
+def _build(model: Type[BaseModel], exclude_none: bool, fields: Tuple) -> dict:
+    return model(**dict(fields)).model_dump(exclude_none=exclude_none)
+
+
+def build_request(model: Type[BaseModel], exclude_none: bool = False, **fields):
+    """Validate ``fields`` with ``model`` and return the request dict.
+
+    Hot calls repeat the same few argument combinations (a viewer poll is
+    always ``limit=200, cursor=0``), so the validated dump is memoised on
+    the arguments and later calls cost a dict copy. Arguments that are not
+    hashable (lists) are validated every time; invalid ones raise as usual
+    and are never cached.
+    """
+    key = tuple(fields.items())
+    try:
+        data = _build(model, exclude_none, key)
+    except TypeError:
+        return model(**fields).model_dump(exclude_none=exclude_none)
+    return dict(data)
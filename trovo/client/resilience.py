@@ -0,0 +1,398 @@
+import functools
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from trovo.metrics import Metrics, get_metrics
+
+from .endpoints import (
+    API_URL,
+    CHAT_COMMAND_URL,
+    CHAT_SEND_URL,
+    EDIT_CHANNEL_INTO_URL,
+    REFRESH_URL,
+    REVOKE_URL,
+    UPDATE_DROPS_URL,
+)
+from .helper_functions import LazyModule
+
+# For call_async only.
+asyncio = LazyModule("asyncio")
+
+__all__ = [
+    "NON_IDEMPOTENT_PATHS",
+    "API_PATH",
+    "api_path",
+    "is_idempotent",
+    "transport_errors",
+    "CircuitOpenError",
+    "parse_retry_after",
+    "RetryPolicy",
+    "CircuitBreaker",
+    "Resilience",
+]
+
+# Calls with side effects: they are only retried when the request can not
+# have been processed (connection never made, 429, 503 with Retry-After).
+# Matched on the path below API_URL, so a client pointed at another host
+# (a proxy, a local stub) classifies calls the same way.
+NON_IDEMPOTENT_PATHS = frozenset(
+    url[len(API_URL) :]
+    for url in (
+        CHAT_SEND_URL,
+        CHAT_COMMAND_URL,
+        EDIT_CHANNEL_INTO_URL,
+        UPDATE_DROPS_URL,
+        REFRESH_URL,
+        REVOKE_URL,
+    )
+)
+API_PATH = urlsplit(API_URL).path
+
+
+def api_path(url: str) -> str:
+    path = urlsplit(url).path
+    if path.startswith(API_PATH):
+        path = path[len(API_PATH) :]
+    return path
+
+
+def is_idempotent(url: str) -> bool:
+    return api_path(url) not in NON_IDEMPOTENT_PATHS
+
+
+@functools.lru_cache(maxsize=None)
+def transport_errors(transport: str) -> Tuple[Tuple[type, ...], Tuple[type, ...]]:
+    """Errors of ``"requests"`` or ``"aiohttp"``: (request not sent, transient).
+
+    Imported on first call, so the blocking client never loads aiohttp and
+    the asyncio one never loads requests.
+    """
+    if transport == "requests":
+        import requests
+
+        return (requests.exceptions.ConnectTimeout,), (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        )
+    import aiohttp
+
+    return (aiohttp.ClientConnectorError,), (
+        aiohttp.ClientConnectionError,
+        asyncio.TimeoutError,
+    )
+
+
+def __getattr__(name: str):
+    # NOT_SENT_ERRORS and TRANSIENT_ERRORS of both transports.
+    if name in ("NOT_SENT_ERRORS", "TRANSIENT_ERRORS"):
+        index = name == "TRANSIENT_ERRORS"
+        return tuple(
+            dict.fromkeys(
+                error
+                for transport in ("requests", "aiohttp")
+                for error in transport_errors(transport)[index]
+            )
+        )
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # An HTTP date: rare enough not to import the email package up front.
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, capped at ``max_backoff``.
+
+    A ``Retry-After`` header from the server replaces the computed delay
+    (capped at ``max_retry_after``).
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        backoff: float = 0.25,
+        max_backoff: float = 8.0,
+        jitter: bool = True,
+        statuses: Tuple[int, ...] = (429, 500, 502, 503, 504),
+        max_retry_after: float = 30.0,
+    ):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+class CircuitBreaker:
+    """Fail fast after ``failure_threshold`` consecutive failures.
+
+    The circuit stays open for ``recovery_time`` seconds, then lets a
+    single trial call through (half-open): its success closes the circuit,
+    its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.recovery_time:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Settle a trial that was cancelled or failed on the caller's side."""
+        with self.lock:
+            self.trial = False
+
+
+def _status(response) -> int:
+    if isinstance(response, tuple):
+        response = response[0]
+    status = getattr(response, "status_code", None)
+    return status if status is not None else response.status
+
+
+class Resilience:
+    """Retries, per-endpoint circuit breakers and hedged reads for a client.
+
+    ``call``/``call_async`` take a ``send`` function performing one HTTP
+    attempt and returning the response, or a ``(response, body)`` tuple.
+    Endpoints are keyed by their path below API_URL with numeric segments
+    folded, so ``/channels/1/viewers`` and ``/channels/2/viewers`` share a
+    breaker (and a metrics label).
+    With ``hedge_after`` an idempotent call that has not answered within
+    that many seconds is sent a second time and the first answer wins; an
+    error only if both requests fail.
+    Pass ``retry=None`` or ``failure_threshold=None`` to turn either off.
+    """
+
+    def __init__(
+        self,
+        retry: Optional[RetryPolicy] = RetryPolicy(),
+        failure_threshold: Optional[int] = 5,
+        recovery_time: float = 30.0,
+        hedge_after: Optional[float] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.retry = retry
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.hedge_after = hedge_after
+        self.metrics = metrics or get_metrics()
+        self.lock = threading.Lock()
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.hedge_pool: Optional[ThreadPoolExecutor] = None
+
+    def close(self):
+        if self.hedge_pool is not None:
+            self.hedge_pool.shutdown(wait=False)
+            self.hedge_pool = None
+
+    @staticmethod
+    def endpoint(url: str) -> str:
+        return re.sub(r"/\d+(?=/|$)", "/{id}", api_path(url))
+
+    def breaker(self, url: str) -> Optional[CircuitBreaker]:
+        if self.failure_threshold is None:
+            return None
+        key = self.endpoint(url)
+        with self.lock:
+            breaker = self.breakers.get(key)
+            if breaker is None:
+                breaker = self.breakers[key] = CircuitBreaker(
+                    self.failure_threshold, self.recovery_time
+                )
+            return breaker
+
+    def _check(self, breaker: Optional[CircuitBreaker], url: str):
+        if breaker is not None and not breaker.allow():
+            self.metrics.inc("api_circuit_open_total", endpoint=self.endpoint(url))
+            raise CircuitOpenError(f"Circuit open for {self.endpoint(url)}")
+
+    def _outcome(
+        self,
+        breaker,
+        idempotent: bool,
+        attempt: int,
+        response=None,
+        error=None,
+        not_sent: Tuple[type, ...] = (),
+    ) -> Optional[float]:
+        """Record one attempt; return the delay before retrying or None."""
+        retry = self.retry
+        can_retry = retry is not None and attempt + 1 < retry.attempts
+        if error is not None:
+            if breaker is not None:
+                breaker.failure()
+            if can_retry and (idempotent or isinstance(error, not_sent)):
+                return retry.delay(attempt)
+            return None
+        status = _status(response)
+        if breaker is not None:
+            if status >= 500:
+                breaker.failure()
+            else:
+                breaker.success()
+        if not can_retry or status not in retry.statuses:
+            return None
+        if isinstance(response, tuple):
+            response = response[0]
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if idempotent or status == 429 or (status == 503 and retry_after is not None):
+            return retry.delay(attempt, retry_after)
+        return None
+
+    def _hedged(self, send: Callable):
+        if self.hedge_pool is None:
+            self.hedge_pool = ThreadPoolExecutor(thread_name_prefix="trovo-hedge")
+        first = self.hedge_pool.submit(send)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        pending = {first, self.hedge_pool.submit(send)}
+        # The first success wins; an error only once both attempts failed.
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+        # Both failed: report the error of the original request.
+        return first.result()
+
+    def call(self, url: str, send: Callable, idempotent: bool = True):
+        not_sent, transient = transport_errors("requests")
+        breaker = self.breaker(url)
+        hedge = idempotent and self.hedge_after is not None
+        attempt = 0
+        while True:
+            self._check(breaker, url)
+            try:
+                response = self._hedged(send) if hedge else send()
+            except transient as e:
+                delay = self._outcome(
+                    breaker, idempotent, attempt, error=e, not_sent=not_sent
+                )
+                if delay is None:
+                    raise
+            except BaseException:
+                if breaker is not None:
+                    breaker.release()
+                raise
+            else:
+                delay = self._outcome(breaker, idempotent, attempt, response=response)
+                if delay is None:
+                    return response
+            self.metrics.inc("api_retries_total", endpoint=self.endpoint(url))
+            time.sleep(delay)
+            attempt += 1
+
+    async def _hedged_async(self, send: Callable[[], Awaitable]):
+        tasks = [asyncio.ensure_future(send())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if done:
+                return tasks[0].result()
+            tasks.append(asyncio.ensure_future(send()))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both failed: report the error of the original request.
+            return tasks[0].result()
+        finally:
+            # The losing request, or both when this call is cancelled.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call_async(
+        self, url: str, send: Callable[[], Awaitable], idempotent: bool = True
+    ):
+        not_sent, transient = transport_errors("aiohttp")
+        breaker = self.breaker(url)
+        hedge = idempotent and self.hedge_after is not None
+        attempt = 0
+        while True:
+            self._check(breaker, url)
+            try:
+                response = await (self._hedged_async(send) if hedge else send())
+            except transient as e:
+                delay = self._outcome(
+                    breaker, idempotent, attempt, error=e, not_sent=not_sent
+                )
+                if delay is None:
+                    raise
+            except BaseException:
+                if breaker is not None:
+                    breaker.release()
+                raise
+            else:
+                delay = self._outcome(breaker, idempotent, attempt, response=response)
+                if delay is None:
+                    return response
+            self.metrics.inc("api_retries_total", endpoint=self.endpoint(url))
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Dict, Optional, Set, Tuple
+
+from .cache import CHAT_TOKEN_TTLS, ResponseCache
+from .trovo_client import TrovoClient
+
+if TYPE_CHECKING:
+    from .models import ValidateAccessTokenResponse
+
+log = logging.getLogger(__name__)
+
+__all__ = ["TokenManager"]
+
+
+class TokenManager:
+    """Keep one OAuth access token valid for every client of the process.
+
+    ``start`` validates the token to learn its expiry and a background
+    timer refreshes it ``refresh_margin`` seconds before it runs out (this
+    needs ``refresh_token`` and ``client_secret``). Attached clients, sync
+    or async, get every new token through ``set_access_token`` and share
+    ``cache``, so chat, channel and shard tokens are fetched once and
+    reused by reconnects until they expire or are invalidated.
+
+    A manager belongs to one account: clients holding a token it never
+    held are refused by :meth:`attach`.
+    """
+
+    managers: Dict[Tuple[str, Optional[str]], "TokenManager"] = {}
+    managers_lock = threading.Lock()
+
+    def __init__(
+        self,
+        trovo: TrovoClient,
+        *,
+        refresh_token: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        refresh_margin: float = 300.0,
+        retry_interval: float = 60.0,
+        chat_token_ttls: Optional[Dict[str, float]] = None,
+    ):
+        self.trovo = trovo
+        self.refresh_token = refresh_token
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self.cache = ResponseCache(
+            CHAT_TOKEN_TTLS if chat_token_ttls is None else chat_token_ttls
+        )
+        self.lock = threading.RLock()
+        self.clients: "weakref.WeakSet" = weakref.WeakSet()
+        self.info: Optional[ValidateAccessTokenResponse] = None
+        self.expires_at: Optional[float] = None
+        self.timer: Optional[threading.Timer] = None
+        self.started = False
+        # Every access token of the account seen by this manager.
+        self.known_tokens: Set[str] = set()
+        if trovo.access_token is not None:
+            self.known_tokens.add(trovo.access_token)
+        self.attach(trovo)
+
+    @classmethod
+    def shared(
+        cls, client_id: str, access_token: Optional[str] = None, **kwargs
+    ) -> "TokenManager":
+        """Return the manager of ``access_token``, creating it on first use.
+
+        Keyed by ``client_id`` and token, so two bot accounts of the same
+        application never share tokens; tokens obtained by refreshing map
+        to the same manager.
+        """
+        with cls.managers_lock:
+            manager = cls.managers.get((client_id, access_token))
+            if manager is None:
+                manager = cls.managers[(client_id, access_token)] = cls(
+                    TrovoClient(client_id, access_token), **kwargs
+                )
+            return manager
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.trovo.access_token
+
+    @property
+    def can_refresh(self) -> bool:
+        return self.refresh_token is not None and self.client_secret is not None
+
+    def attach(self, client):
+        """Share the access token and chat token cache with ``client``.
+
+        ``client`` may come without a token or with one of this account;
+        a client with another account's token raises ValueError.
+        """
+        with self.lock:
+            token = client.access_token
+            if token is not None and token not in self.known_tokens:
+                raise ValueError(
+                    "Client has the access token of another account, "
+                    "it needs its own TokenManager"
+                )
+            self.clients.add(client)
+            client.tokens = self
+            client.token_cache = self.cache
+            if client is not self.trovo and self.access_token is not None:
+                client.set_access_token(self.access_token)
+
+    def start(self):
+        """Validate the token once and schedule its refresh; idempotent."""
+        with self.lock:
+            if self.started:
+                return
+            if self.access_token is not None:
+                self.validate()
+            elif self.can_refresh:
+                self.refresh()
+            self.started = True
+
+    def validate(self) -> ValidateAccessTokenResponse:
+        info = self.trovo.validate_access_token()
+        with self.lock:
+            self.info = info
+            self.expires_at = float(info.expire_ts)
+            self._schedule()
+        return info
+
+    def refresh(self):
+        if not self.can_refresh:
+            raise ValueError("refresh_token and client_secret are required")
+        with self.lock:
+            response = self.trovo.refresh_access_token(
+                self.client_secret, self.refresh_token
+            )
+            self.refresh_token = response.refresh_token
+            self.expires_at = time.time() + response.expires_in
+            self.known_tokens.add(response.access_token)
+            with self.managers_lock:
+                if self in self.managers.values():
+                    key = (self.trovo.client_id, response.access_token)
+                    self.managers.setdefault(key, self)
+            for client in list(self.clients):
+                client.set_access_token(response.access_token)
+            # The chat token belongs to the user, channel and shard tokens don't.
+            self.cache.invalidate("get_chat_token")
+            self._schedule()
+
+    def revoke(self):
+        with self.lock:
+            self.close()
+            self.trovo.revoke_access_token()
+            self.expires_at = None
+            self.cache.invalidate()
+
+    def invalidate_chat_tokens(self):
+        """Forget cached chat tokens, e.g. after the chat server refused one."""
+        self.cache.invalidate()
+
+    def expires_in(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.time()
+
+    def _schedule(self, delay: Optional[float] = None):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if delay is None:
+            if self.expires_at is None:
+                return
+            delay = max(0.0, self.expires_in() - self.refresh_margin)
+        self.timer = threading.Timer(delay, self._on_timer)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _on_timer(self):
+        if not self.can_refresh:
+            log.warning(
+                "Access token expires in %.0f seconds and cannot be refreshed "
+                "without refresh_token and client_secret",
+                self.expires_in(),
+            )
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            log.warning("Access token refresh failed: %s", e)
+            with self.lock:
+                self._schedule(self.retry_interval)
+
+    def close(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.started = False
@@ -1,15 +1,125 @@
-import requests
+from __future__ import annotations
+
+import time
+from typing import List, Optional
+
+from trovo.metrics import Metrics, get_metrics
+from .cache import ResponseCache, cached
 from .endpoints import *
-from .models import *
+from .helper_functions import LazyModule, parse_model
+from .request_builder import build_request
+from .resilience import Resilience, is_idempotent
+from .pagination import iter_pages, by_total_page
+
+# Imported on first use: the pydantic models and the HTTP library cost far
+# more than the rest of the package to import.
+requests = LazyModule("requests")
+models = LazyModule("trovo.client.models")
+
+__all__ = ["TrovoClient"]
 
 
 class TrovoClient:
-    def __init__(self, client_id: str, access_token: Optional[str] = None):
+    def __init__(
+        self,
+        client_id: str,
+        access_token: Optional[str] = None,
+        *,
+        pool_connections: int = 4,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        max_retries: int = 0,
+        timeout: Optional[float] = 10.0,
+        cache: Optional[ResponseCache] = None,
+        fast_models: bool = False,
+        resilience: Optional[Resilience] = None,
+        metrics: Optional[Metrics] = None,
+        session: Optional[requests.Session] = None,
+    ):
         self.client_id = client_id
         self.access_token = access_token
         self.headers = {"Accept": "application/json", "Client-ID": self.client_id}
         self.auth = {"Authorization": f"OAuth {self.access_token}"}
         self.headers_with_auth = {**self.headers, **self.auth}
+        self.timeout = timeout
+        self.cache = cache
+        self.fast_models = fast_models
+        # Set by TokenManager.attach: chat tokens are then shared process-wide.
+        self.tokens = None
+        self.token_cache: Optional[ResponseCache] = None
+        # Retries and circuit breakers are on by default, see Resilience.
+        self.metrics = metrics or get_metrics()
+        if resilience is None:
+            resilience = Resilience(metrics=self.metrics)
+        self.resilience = resilience
+        if session is None:
+            session = self.create_session(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
+                max_retries=max_retries,
+            )
+        self.session = session
+
+    @staticmethod
+    def create_session(
+        pool_connections: int = 4,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        max_retries: int = 0,
+    ) -> requests.Session:
+        """Build a keep-alive session shared by every call of the client.
+
+        ``pool_connections`` is the number of hosts kept in the pool,
+        ``pool_maxsize`` the number of idle connections kept per host and
+        ``max_retries`` only retries failed connection attempts, so a POST
+        is never sent twice.
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=max_retries,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        self.session.close()
+        self.resilience.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        endpoint = self.resilience.endpoint(url)
+        status = "error"
+        start = time.perf_counter()
+        try:
+            response = self.resilience.call(
+                url,
+                lambda: self.session.request(method, url, **kwargs),
+                idempotent=is_idempotent(url),
+            )
+            status = str(response.status_code)
+            return response
+        finally:
+            self.metrics.observe(
+                "api_request_seconds", time.perf_counter() - start, endpoint=endpoint
+            )
+            self.metrics.inc("api_requests_total", endpoint=endpoint, status=status)
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        return self._request("GET", url, **kwargs)
+
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        return self._request("POST", url, **kwargs)
 
     def __check_access_token(self):
         if self.access_token is None:
@@ -17,12 +127,12 @@ class TrovoClient:
 
     def __auth_get_request(self, url: str):
         self.__check_access_token()
-        r = requests.get(url, headers=self.headers_with_auth)
+        r = self._get(url, headers=self.headers_with_auth)
         return r.json()
 
     def __auth_get_request_with_params(self, url: str, params: dict):
         self.__check_access_token()
-        r = requests.get(url, headers=self.headers_with_auth, params=params)
+        r = self._get(url, headers=self.headers_with_auth, params=params)
         return r.json()
 
     def set_client_id(self, client_id):
@@ -30,28 +140,66 @@ class TrovoClient:
 
     def set_access_token(self, access_token):
         self.access_token = access_token
+        self.auth = {"Authorization": f"OAuth {self.access_token}"}
+        self.headers_with_auth = {**self.headers, **self.auth}
+
+    def validate_access_token(self) -> models.ValidateAccessTokenResponse:
+        self.__check_access_token()
+        request = self._get(VALIDATE_URL, headers=self.headers_with_auth)
+        request.raise_for_status()
+        return models.ValidateAccessTokenResponse(**request.json())
+
+    def refresh_access_token(
+        self, client_secret: str, refresh_token: str
+    ) -> models.AccessTokenResponse:
+        data = build_request(
+            models.RefreshTokenRequest,
+            client_secret=client_secret,
+            refresh_token=refresh_token,
+        )
+        return self.process_post_model(REFRESH_URL, data, models.AccessTokenResponse)
+
+    def revoke_access_token(self):
+        self.__check_access_token()
+        data = {"access_token": self.access_token}
+        request = self._post(REVOKE_URL, headers=self.headers, json=data)
+        request.raise_for_status()
 
     def process_post_method(self, url, data):
-        request = requests.post(url, headers=self.headers, json=data)
+        request = self._post(url, headers=self.headers, json=data)
         request.raise_for_status()
         response = request.json()
 
         return response
 
-    def get_game_categories(self) -> GameCategoriesResponse:
-        request = requests.get(GAME_CATEGORIES_URL, headers=self.headers)
+    def process_post_model(self, url, data, model):
+        """POST ``data`` and build ``model`` from the response.
+
+        With ``fast_models`` the raw response bytes go through
+        :func:`parse_model` instead of ``requests``' JSON decoding and
+        ``Model(**dict)``, which saves CPU and memory on large pages.
+        """
+        if not self.fast_models:
+            return model(**self.process_post_method(url, data))
+        request = self._post(url, headers=self.headers, json=data)
+        request.raise_for_status()
+        return parse_model(model, request.content)
+
+    @cached
+    def get_game_categories(self) -> models.GameCategoriesResponse:
+        request = self._get(GAME_CATEGORIES_URL, headers=self.headers)
         request.raise_for_status()
         response = request.json()
 
-        return GameCategoriesResponse(**response)
+        return models.GameCategoriesResponse(**response)
 
     def search_game_categories(
         self, query: str, limit: int = 20
-    ) -> GameCategoriesResponse:
-        data_validation = CategorySearchRequest(query=query, limit=limit)
-        data = data_validation.model_dump()
-        response = self.process_post_method(SEARCH_CATEGORIES_URL, data)
-        return GameCategoriesResponse(**response)
+    ) -> models.GameCategoriesResponse:
+        data = build_request(models.CategorySearchRequest, query=query, limit=limit)
+        return self.process_post_model(
+            SEARCH_CATEGORIES_URL, data, models.GameCategoriesResponse
+        )
 
     def get_top_channels(
         self,
@@ -61,37 +209,43 @@ class TrovoClient:
         token: Optional[str] = None,
         cursor: Optional[int] = None,
         category_id: Optional[str] = None,
-    ) -> TopChannelsResponse:
-        data_validation = TopChannelsRequest(
+    ) -> models.TopChannelsResponse:
+        data = build_request(
+            models.TopChannelsRequest,
+            exclude_none=True,
             limit=limit,
             after=after,
             token=token,
             cursor=cursor,
             category_id=category_id,
         )
-        data = data_validation.model_dump(exclude_none=True)
-        response = self.process_post_method(TOP_CHANNELS_URL, data)
-        return TopChannelsResponse(**response)
+        return self.process_post_model(
+            TOP_CHANNELS_URL, data, models.TopChannelsResponse
+        )
 
+    @cached
     def get_users_by_username(self, users: List[str]):
         data = {"users": users}
-        response = self.process_post_method(GET_USERS_URL, data=data)
-        return UserSearchResponse(**response)
+        return self.process_post_model(GET_USERS_URL, data, models.UserSearchResponse)
 
+    @cached
     def get_channel_info_by_id(
         self, channel_id: Optional[str] = None, username: Optional[str] = None
-    ) -> ChannelInfoResponse:
-        request_data_validation = ChannelInfoRequest(
-            channel_id=channel_id, username=username
+    ) -> models.ChannelInfoResponse:
+        data = build_request(
+            models.ChannelInfoRequest,
+            exclude_none=True,
+            channel_id=channel_id,
+            username=username,
+        )
+        return self.process_post_model(
+            GET_CHANNEL_INFO_URL, data, models.ChannelInfoResponse
         )
-        data = request_data_validation.model_dump(exclude_none=True)
-        response = self.process_post_method(GET_CHANNEL_INFO_URL, data=data)
-        return ChannelInfoResponse(**response)
 
     # FINISH TESTING
     def get_channel_info_by_streamkey(self):
         response = self.__auth_get_request(READ_CHANNEL_INFO_URL)
-        return ChannelStreamKeyResponse(**response)
+        return models.ChannelStreamKeyResponse(**response)
 
     def edit_channel_info(
         self,
@@ -101,64 +255,75 @@ class TrovoClient:
         language_code: Optional[str] = None,
         audi_type: Optional[str] = None,
     ):
-        data_validation = ChannelEditInfoRequest(
+        data = build_request(
+            models.ChannelEditInfoRequest,
+            exclude_none=True,
             channel_id=channel_id,
             live_title=live_title,
             category=category,
             language_code=language_code,
             audi_type=audi_type,
         )
-        data = data_validation.model_dump(exclude_none=True)
-        response = requests.post(
+        response = self._post(
             EDIT_CHANNEL_INTO_URL, headers=self.headers_with_auth, json=data
         )
+        response.raise_for_status()
 
     def get_user_info(self):
         response = self.__auth_get_request(GET_USER_INFO_URL)
-        return UserInfoResponse(**response)
+        return models.UserInfoResponse(**response)
 
     def get_subscribers(
         self, channel_id: int, limit: int = 25, offset: int = 0, direction: str = "asc"
     ):
-        data_validation = GetSubsRequest(
-            limit=limit, offset=offset, direction=direction
+        data = build_request(
+            models.GetSubsRequest, limit=limit, offset=offset, direction=direction
         )
         url = CHANNEL_URL + f"/{channel_id}/subscriptions"
-        data = data_validation.model_dump()
         response = self.__auth_get_request_with_params(url, data)
-        return GetSubsResponse(**response)
+        return models.GetSubsResponse(**response)
 
+    @cached
     def get_emotes(self, emote_type: int, channel_id: List[int]):
-        data_validation = GetEmotesRequest(emote_type=emote_type, channel_id=channel_id)
-        data = data_validation.model_dump(exclude_none=True)
+        data = build_request(
+            models.GetEmotesRequest,
+            exclude_none=True,
+            emote_type=emote_type,
+            channel_id=channel_id,
+        )
         response = self.process_post_method(GET_EMOTES_URL, data=data)
         return response
 
-    def get_channel_viewers(self, channel_id: int, limit: int = 20, cursor: int = 0):
-        data_validation = GetChannelViewersRequest(limit=limit, cursor=cursor)
-        data = data_validation.model_dump()
+    def get_channel_viewers(
+        self, channel_id: int, limit: int = 20, cursor: int = 0, raw: bool = False
+    ):
+        """Viewers of ``channel_id``; with ``raw`` the decoded JSON dict."""
+        data = build_request(
+            models.GetChannelViewersRequest, limit=limit, cursor=cursor
+        )
         url = CHANNEL_URL + f"/{channel_id}/viewers"
-        response = self.process_post_method(url, data=data)
-        return GetChannelViewersResponse(**response)
+        if raw:
+            return self.process_post_method(url, data)
+        return self.process_post_model(url, data, models.GetChannelViewersResponse)
 
     def get_channel_followers(
         self, channel_id: int, limit: int = 20, cursor: int = 0, direction: str = "asc"
     ):
-        data_validation = GetChannelFollowersRequest(
-            limit=limit, cursor=cursor, direction=direction
+        data = build_request(
+            models.GetChannelFollowersRequest,
+            limit=limit,
+            cursor=cursor,
+            direction=direction,
         )
-
-        data = data_validation.model_dump()
         url = CHANNEL_URL + f"/{channel_id}/followers"
-        response = self.process_post_method(url, data=data)
-        return GetChannelFollowersResponse(**response)
+        return self.process_post_model(url, data, models.GetChannelFollowersResponse)
 
+    @cached
     def get_live_stream_urls(self, channel_id: int):
         data = {"channel_id": channel_id}
-        headers = self.headers
-        headers["Referer"] = "http://openplatform.trovo.live"
-        r = requests.post(GET_LIVESTREAMS_URL, headers=headers, json=data)
-        return GetLiveStreamsUrlsResponse(**r.json())
+        headers = {**self.headers, "Referer": "http://openplatform.trovo.live"}
+        r = self._post(GET_LIVESTREAMS_URL, headers=headers, json=data)
+        return models.GetLiveStreamsUrlsResponse(**r.json())
 
     def get_clips_info(
         self,
@@ -170,7 +335,9 @@ class TrovoClient:
         cursor: Optional[int] = 0,
         direction: Optional[str] = "asc",
     ):
-        data_validation = GetClipsRequest(
+        data = build_request(
+            models.GetClipsRequest,
+            exclude_none=True,
             channel_id=channel_id,
             category_id=category_id,
             period=period,
@@ -179,9 +346,9 @@ class TrovoClient:
             cursor=cursor,
             direction=direction,
         )
-        data = data_validation.model_dump(exclude_none=True)
-        response = self.process_post_method(GET_CLIPS_INFO_URL, data=data)
-        return GetClipsResponse(**response)
+        return self.process_post_model(
+            GET_CLIPS_INFO_URL, data, models.GetClipsResponse
+        )
 
     def get_past_streams_info(
         self,
@@ -193,7 +360,9 @@ class TrovoClient:
         cursor: Optional[int] = 0,
         direction: Optional[str] = "asc",
     ):
-        data_validation = GetPastStreamsInfo(
+        data = build_request(
+            models.GetPastStreamsInfo,
+            exclude_none=True,
             channel_id=channel_id,
             category_id=category_id,
             period=period,
@@ -202,36 +371,167 @@ class TrovoClient:
             cursor=cursor,
             direction=direction,
         )
-
-        data = data_validation.model_dump(exclude_none=True)
-        response = self.process_post_method(GET_PAST_STREAMS_URL, data=data)
-        return GetPastStreamsResponse(**response)
+        return self.process_post_model(
+            GET_PAST_STREAMS_URL, data, models.GetPastStreamsResponse
+        )
 
     def send_chat_to_my_channel(self, content: str):
         data = {"content": content}
-        requests.post(CHAT_SEND_URL, headers=self.headers_with_auth, json=data)
+        request = self._post(CHAT_SEND_URL, headers=self.headers_with_auth, json=data)
+        request.raise_for_status()
 
     def send_chat_to_selected_channel(self, content: str, channel_id: int):
         data = {"content": content, "channel_id": channel_id}
-        requests.post(CHAT_SEND_URL, headers=self.headers_with_auth, json=data)
+        request = self._post(CHAT_SEND_URL, headers=self.headers_with_auth, json=data)
+        request.raise_for_status()
 
     def perform_chat_commannd(self, command: str, channel_id: int):
         data = {"command": command, "channel_id": channel_id}
-        requests.post(CHAT_COMMAND_URL, headers=self.headers_with_auth, json=data)
+        request = self._post(
+            CHAT_COMMAND_URL, headers=self.headers_with_auth, json=data
+        )
+        request.raise_for_status()
 
+    @cached(store="token_cache")
     def get_chat_token(self):
-        return self.__auth_get_request(GET_CHAT_TOKEN_URL)
+        self.__check_access_token()
+        r = self._get(GET_CHAT_TOKEN_URL, headers=self.headers_with_auth)
+        r.raise_for_status()
+        return r.json()
 
+    @cached(store="token_cache")
     def get_chat_channel_token(self, channel_id: int):
         url = GET_CHAT_CHANNEL_TOKEN_URL + f"/{channel_id}"
-        r = requests.get(url, headers=self.headers)
+        r = self._get(url, headers=self.headers)
+        r.raise_for_status()
         return r.json()
 
     # DOUBLE CHECK
+    @cached(store="token_cache")
     def get_chat_shard_token(self, total_shard: int, current_shard: int):
         data = {"current_shard": current_shard, "total_shard": total_shard}
         url = GET_CHAT_SHARD_TOKEN_URL
-        request = requests.get(url, headers=self.headers, params=data)
+        request = self._get(url, headers=self.headers, params=data)
+        request.raise_for_status()
 
         response = request.json()
         return response
+
+    def iter_top_channels(
+        self,
+        *,
+        limit: int = 100,
+        category_id: Optional[str] = None,
+        prefetch: bool = True,
+    ):
+        def fetch(index, previous):
+            return self.get_top_channels(
+                limit=limit,
+                token=previous.token if previous is not None else None,
+                cursor=index if previous is not None else None,
+                category_id=category_id,
+            )
+
+        return iter_pages(
+            fetch, lambda page: page.top_channels_lists, by_total_page, prefetch
+        )
+
+    def iter_channel_viewers(
+        self, channel_id: int, limit: int = 200, prefetch: bool = True
+    ):
+        def fetch(index, previous):
+            return self.get_channel_viewers(channel_id, limit=limit, cursor=index)
+
+        def has_next(page, index):
+            if getattr(page, "total_page", None) is not None:
+                return by_total_page(page, index)
+            return len(page.chatters.all.viewers) >= limit
+
+        return iter_pages(
+            fetch, lambda page: page.chatters.all.viewers, has_next, prefetch
+        )
+
+    def iter_channel_followers(
+        self,
+        channel_id: int,
+        limit: int = 100,
+        direction: str = "asc",
+        prefetch: bool = True,
+    ):
+        def fetch(index, previous):
+            return self.get_channel_followers(
+                channel_id, limit=limit, cursor=index, direction=direction
+            )
+
+        return iter_pages(fetch, lambda page: page.follower, by_total_page, prefetch)
+
+    def iter_subscribers(
+        self,
+        channel_id: int,
+        limit: int = 100,
+        direction: str = "asc",
+        prefetch: bool = True,
+    ):
+        def fetch(index, previous):
+            return self.get_subscribers(
+                channel_id, limit=limit, offset=index * limit, direction=direction
+            )
+
+        return iter_pages(
+            fetch,
+            lambda page: page.subscriptions,
+            lambda page, index: (index + 1) * limit < page.total,
+            prefetch,
+        )
+
+    def iter_clips_info(
+        self,
+        channel_id: int,
+        category_id: Optional[str] = None,
+        period: Optional[str] = "week",
+        limit: int = 100,
+        direction: Optional[str] = "asc",
+        prefetch: bool = True,
+    ):
+        def fetch(index, previous):
+            return self.get_clips_info(
+                channel_id,
+                category_id=category_id,
+                period=period,
+                limit=limit,
+                cursor=index,
+                direction=direction,
+            )
+
+        return iter_pages(fetch, lambda page: page.clips_info, by_total_page, prefetch)
+
+    def iter_past_streams_info(
+        self,
+        channel_id: int,
+        category_id: Optional[str] = None,
+        period: Optional[str] = "week",
+        limit: int = 100,
+        direction: Optional[str] = "asc",
+        prefetch: bool = True,
+    ):
+        def fetch(index, previous):
+            return self.get_past_streams_info(
+                channel_id,
+                category_id=category_id,
+                period=period,
+                limit=limit,
+                cursor=index,
+                direction=direction,
+            )
+
+        return iter_pages(
+            fetch, lambda page: page.past_streams_info, by_total_page, prefetch
+        )
+
+
+def __getattr__(name: str):
+    # Models used to be star-imported here; dunders are probed by the
+    # import system and must not load them.
+    if not name.startswith("__") and name in models.__all__:
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
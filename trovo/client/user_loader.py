@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from .cache import TTLCache
+
+if TYPE_CHECKING:
+    from .models import User, UserSearchResponse
+
+__all__ = ["UserLoader", "AsyncUserLoader"]
+
+
+def _by_username(response: UserSearchResponse) -> Dict[str, User]:
+    return {user.username.lower(): user for user in response.users}
+
+
+class UserLoader:
+    """Batch ``get_users_by_username`` lookups made from many threads.
+
+    Usernames requested within ``window`` seconds of the first pending one
+    are deduplicated and resolved with one request per ``max_batch_size``
+    names; every caller gets the :class:`User` it asked for, or ``None``
+    for unknown names. An optional ``cache`` (e.g. ``TTLCache(ttl=600)``)
+    keeps resolved users between batches.
+    """
+
+    def __init__(
+        self,
+        trovo,
+        *,
+        window: float = 0.01,
+        max_batch_size: int = 100,
+        cache: Optional[TTLCache] = None,
+    ):
+        self.trovo = trovo
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.pending: Dict[str, Future] = {}
+        self.timer: Optional[threading.Timer] = None
+        self.requests = 0
+
+    def load_future(self, username: str) -> Future:
+        key = username.lower()
+        if self.cache is not None:
+            hit, user = self.cache.get(key)
+            if hit:
+                future: Future = Future()
+                future.set_result(user)
+                return future
+        with self.lock:
+            future = self.pending.get(key)
+            if future is not None:
+                return future
+            future = self.pending[key] = Future()
+            if len(self.pending) >= self.max_batch_size:
+                batch = self._take_batch()
+            else:
+                batch = None
+                if self.timer is None:
+                    self.timer = threading.Timer(self.window, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+        if batch:
+            self._resolve(batch)
+        return future
+
+    def load(self, username: str) -> Optional[User]:
+        return self.load_future(username).result()
+
+    def load_many(self, usernames: Iterable[str]) -> List[Optional[User]]:
+        futures = [self.load_future(username) for username in usernames]
+        return [future.result() for future in futures]
+
+    def _take_batch(self) -> Dict[str, Future]:
+        batch, self.pending = self.pending, {}
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return batch
+
+    def flush(self):
+        with self.lock:
+            batch = self._take_batch()
+        if batch:
+            self._resolve(batch)
+
+    def _resolve(self, batch: Dict[str, Future]):
+        self.requests += 1
+        try:
+            users = _by_username(self.trovo.get_users_by_username(list(batch)))
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        for key, future in batch.items():
+            user = users.get(key)
+            if self.cache is not None and user is not None:
+                self.cache.set(key, user)
+            future.set_result(user)
+
+
+class AsyncUserLoader:
+    """asyncio version of :class:`UserLoader` for AsyncTrovoClient."""
+
+    def __init__(
+        self,
+        trovo,
+        *,
+        window: float = 0.01,
+        max_batch_size: int = 100,
+        cache: Optional[TTLCache] = None,
+    ):
+        self.trovo = trovo
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.requests = 0
+        # The loop only keeps weak references to tasks.
+        self._tasks = set()
+
+    def load_future(self, username: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        key = username.lower()
+        if self.cache is not None:
+            hit, user = self.cache.get(key)
+            if hit:
+                future = loop.create_future()
+                future.set_result(user)
+                return future
+        future = self.pending.get(key)
+        if future is not None:
+            return future
+        future = self.pending[key] = loop.create_future()
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return future
+
+    async def load(self, username: str) -> Optional[User]:
+        return await self.load_future(username)
+
+    async def load_many(self, usernames: Iterable[str]) -> List[Optional[User]]:
+        return list(
+            await asyncio.gather(*(self.load_future(name) for name in usernames))
+        )
+
+    def flush(self):
+        batch, self.pending = self.pending, {}
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if batch:
+            task = asyncio.ensure_future(self._resolve(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: Dict[str, asyncio.Future]):
+        self.requests += 1
+        try:
+            response = await self.trovo.get_users_by_username(list(batch))
+            users = _by_username(response)
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            user = users.get(key)
+            if self.cache is not None and user is not None:
+                self.cache.set(key, user)
+            if not future.done():
+                future.set_result(user)
@@ -0,0 +1,379 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from trovo.metrics import Metrics, get_metrics
+from .async_trovo_client import AsyncTrovoClient
+from .rate_limit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+__all__ = ["ROLES", "Interner", "ViewerDelta", "ChannelViewers", "ViewerWatcher"]
+
+# Role groups of Chatters besides "all", in bit order.
+ROLES = (
+    "VIPS",
+    "ace",
+    "aceplus",
+    "admins",
+    "creators",
+    "editors",
+    "followers",
+    "moderators",
+    "subscribers",
+    "supermods",
+    "wardens",
+)
+
+
+class Interner:
+    """One string object per nick name, shared by every watched channel.
+
+    Trovo lists viewers by nick name, not user id, so the names themselves
+    are interned: a set of shared strings costs a pointer per viewer like
+    a set of ints would, and two polls are diffed without mapping names
+    to ids. A name is dropped when the last channel holding it releases it.
+    """
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}
+        self.refs: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def acquire(self, names: Iterable[str]) -> List[str]:
+        """Take a reference to each of ``names`` and return the shared copies."""
+        shared, refs = self.names, self.refs
+        acquired = []
+        for name in names:
+            name = shared.setdefault(name, name)
+            refs[name] = refs.get(name, 0) + 1
+            acquired.append(name)
+        return acquired
+
+    def release(self, names: Iterable[str]):
+        shared, refs = self.names, self.refs
+        for name in names:
+            count = refs[name] - 1
+            if count:
+                refs[name] = count
+            else:
+                del refs[name]
+                del shared[name]
+
+
+class ViewerDelta:
+    """What changed in a channel between two polls.
+
+    ``roles_changed`` maps a viewer present in both polls to its
+    ``(old_roles, new_roles)``; the roles of ``joined`` viewers are in
+    ``joined_roles``.
+    """
+
+    __slots__ = ("channel_id", "joined", "left", "joined_roles", "roles_changed")
+
+    def __init__(
+        self,
+        channel_id: int,
+        joined: List[str],
+        left: List[str],
+        joined_roles: Dict[str, FrozenSet[str]],
+        roles_changed: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]],
+    ):
+        self.channel_id = channel_id
+        self.joined = joined
+        self.left = left
+        self.joined_roles = joined_roles
+        self.roles_changed = roles_changed
+
+    def __bool__(self) -> bool:
+        return bool(self.joined or self.left or self.roles_changed)
+
+    def __repr__(self) -> str:
+        return (
+            f"ViewerDelta(channel_id={self.channel_id}, joined={len(self.joined)}, "
+            f"left={len(self.left)}, roles_changed={len(self.roles_changed)})"
+        )
+
+
+class ChannelViewers:
+    __slots__ = ("channel_id", "viewers", "roles", "pages", "interval", "due", "polls")
+
+    def __init__(self, channel_id: int, interval: float):
+        self.channel_id = channel_id
+        # Interned names of the viewers and the role bits of those with roles.
+        self.viewers: Set[str] = set()
+        self.roles: Dict[str, int] = {}
+        self.pages = 0
+        self.interval = interval
+        self.due = 0.0
+        self.polls = 0
+
+
+class ViewerWatcher:
+    """Poll the viewers of many channels and report joins, leaves and roles.
+
+    Pages of ``get_channel_viewers`` are read as plain JSON, never as
+    models: each channel keeps a set of interned names (see
+    :class:`Interner`) and a role bitmask per viewer that has a role, so
+    a channel costs a few dozen bytes per viewer and names are shared
+    between channels. The first poll of a channel is its baseline; later
+    polls call ``on_delta`` with a :class:`ViewerDelta` when anything
+    changed.
+
+    A channel is polled every ``min_interval`` seconds per page of viewers
+    and that interval grows by ``idle_factor`` (up to ``max_interval``)
+    while nothing changes. ``run`` keeps at most ``concurrency`` polls in
+    flight and sends at most ``rate`` requests per second; ``max_pages``
+    bounds the requests and memory spent on one huge channel. A poll cut
+    short by ``max_pages`` reports joins and role changes of the viewers
+    it saw but no leaves, since the others may be on the pages not read.
+    """
+
+    def __init__(
+        self,
+        trovo: AsyncTrovoClient,
+        on_delta: Optional[Callable[[ViewerDelta], None]] = None,
+        *,
+        min_interval: float = 30.0,
+        max_interval: float = 300.0,
+        idle_factor: float = 1.5,
+        page_size: int = 200,
+        max_pages: int = 50,
+        concurrency: int = 16,
+        rate: float = 10.0,
+        burst: float = 10.0,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.trovo = trovo
+        self.on_delta = on_delta
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_factor = idle_factor
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.metrics = metrics or get_metrics()
+        self.interner = Interner()
+        self.role_bits: Dict[str, int] = {role: 1 << i for i, role in enumerate(ROLES)}
+        self.channels: Dict[int, ChannelViewers] = {}
+        # (due, channel_id); entries whose due no longer matches are stale.
+        self.schedule: List[Tuple[float, int]] = []
+        self.wakeup: Optional[asyncio.Event] = None
+        self.stopped = False
+
+    def watch(self, channel_id: int):
+        if channel_id in self.channels:
+            return
+        state = self.channels[channel_id] = ChannelViewers(
+            channel_id, self.min_interval
+        )
+        # Spread the first polls so thousands of channels don't start at once.
+        self._reschedule(state, random.uniform(0, self.min_interval))
+        self.metrics.set("viewer_watched_channels", len(self.channels))
+
+    def unwatch(self, channel_id: int):
+        state = self.channels.pop(channel_id, None)
+        if state is None:
+            return
+        self.interner.release(state.viewers)
+        self.metrics.set("viewer_watched_channels", len(self.channels))
+        self.metrics.set("viewer_interned_names", len(self.interner))
+
+    def viewers(self, channel_id: int) -> Set[str]:
+        return set(self.channels[channel_id].viewers)
+
+    def roles_of(self, channel_id: int, name: str) -> FrozenSet[str]:
+        return self.role_names(self.channels[channel_id].roles.get(name, 0))
+
+    def role_names(self, bits: int) -> FrozenSet[str]:
+        return frozenset(role for role, bit in self.role_bits.items() if bits & bit)
+
+    def _role_bit(self, role: str) -> int:
+        bit = self.role_bits.get(role)
+        if bit is None:
+            bit = self.role_bits[role] = 1 << len(self.role_bits)
+        return bit
+
+    async def fetch(
+        self, channel_id: int
+    ) -> Tuple[Set[str], Dict[str, int], int, bool]:
+        """Names of every page of ``channel_id``, role bits and page count.
+
+        The last value is False when ``max_pages`` stopped before the end.
+        """
+        names: Set[str] = set()
+        roles: Dict[str, int] = {}
+        pages = 0
+        complete = False
+        while pages < self.max_pages:
+            await self.bucket.acquire()
+            page = await self.trovo.get_channel_viewers(
+                channel_id, limit=self.page_size, cursor=pages, raw=True
+            )
+            pages += 1
+            chatters = page.get("chatters") or {}
+            everyone = (chatters.get("all") or {}).get("viewers") or []
+            names.update(everyone)
+            groups = [(role, chatters.get(role)) for role in ROLES]
+            groups += (page.get("custome_roles") or {}).items()
+            for role, group in groups:
+                members = (group or {}).get("viewers")
+                if not members:
+                    continue
+                bit = self._role_bit(role)
+                names.update(members)
+                for name in members:
+                    roles[name] = roles.get(name, 0) | bit
+            total_page = page.get("total_page")
+            if total_page is not None:
+                complete = pages >= int(total_page)
+            else:
+                complete = len(everyone) < self.page_size
+            if complete:
+                break
+        return names, roles, pages, complete
+
+    async def poll(self, channel_id: int) -> ViewerDelta:
+        """Poll ``channel_id`` now and return what changed since last time."""
+        names, roles, pages, complete = await self.fetch(channel_id)
+        state = self.channels.get(channel_id)
+        if state is None:
+            # Unwatched while the pages were being read.
+            return ViewerDelta(channel_id, [], [], {}, {})
+        if not complete:
+            self.metrics.inc("viewer_truncated_polls_total")
+        delta = self._apply(state, names, roles, complete)
+        state.pages = pages
+        state.polls += 1
+        self.metrics.set("viewer_interned_names", len(self.interner))
+        return delta
+
+    def _apply(
+        self,
+        state: ChannelViewers,
+        names: Set[str],
+        role_bits: Dict[str, int],
+        complete: bool = True,
+    ) -> ViewerDelta:
+        # Only the viewers who joined or left touch the interner.
+        interner = self.interner
+        viewers = state.viewers
+        joined = names - viewers
+        left = viewers - names if complete else set()
+        if joined or left:
+            interner.release(left)
+            viewers.difference_update(left)
+            viewers.update(interner.acquire(joined))
+        shared = interner.names
+        roles = {shared[name]: bits for name, bits in role_bits.items()}
+        old_roles = state.roles
+        if not complete:
+            # Viewers on the pages not read keep the roles seen last time.
+            for name, bits in old_roles.items():
+                if name not in names:
+                    roles[name] = bits
+        roles_changed = {}
+        if old_roles != roles:
+            for name in old_roles.keys() | roles.keys():
+                before, after = old_roles.get(name, 0), roles.get(name, 0)
+                if before != after and name in names and name not in joined:
+                    roles_changed[name] = (
+                        self.role_names(before),
+                        self.role_names(after),
+                    )
+        baseline = not state.polls
+        state.roles = roles
+        if baseline:
+            return ViewerDelta(state.channel_id, [], [], {}, {})
+        joined = [shared[name] for name in joined]
+        joined_roles = {
+            name: self.role_names(roles[name]) for name in joined if name in roles
+        }
+        self.metrics.inc("viewer_joins_total", len(joined))
+        self.metrics.inc("viewer_leaves_total", len(left))
+        self.metrics.inc("viewer_role_changes_total", len(roles_changed))
+        return ViewerDelta(
+            state.channel_id, joined, list(left), joined_roles, roles_changed
+        )
+
+    def next_interval(self, state: ChannelViewers, changed: bool) -> float:
+        by_size = self.min_interval * max(1, state.pages)
+        if changed:
+            interval = by_size
+        else:
+            interval = max(by_size, state.interval * self.idle_factor)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _reschedule(self, state: ChannelViewers, delay: float):
+        state.due = time.monotonic() + delay
+        heapq.heappush(self.schedule, (state.due, state.channel_id))
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def _poll_scheduled(self, state: ChannelViewers):
+        try:
+            delta = await self.poll(state.channel_id)
+        except Exception as e:
+            self.metrics.inc("viewer_polls_total", result="error")
+            log.warning("Polling viewers of %s failed: %s", state.channel_id, e)
+            state.interval = self.next_interval(state, changed=False)
+        else:
+            self.metrics.inc("viewer_polls_total", result="ok")
+            state.interval = self.next_interval(state, changed=bool(delta))
+            if delta and self.on_delta is not None:
+                try:
+                    self.on_delta(delta)
+                except Exception:
+                    log.exception("on_delta failed for channel %s", state.channel_id)
+        if self.channels.get(state.channel_id) is state:
+            self._reschedule(state, state.interval)
+
+    async def run(self):
+        """Poll the watched channels until :meth:`stop` is called."""
+        self.stopped = False
+        self.wakeup = asyncio.Event()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: Set[asyncio.Task] = set()
+
+        def done(task: asyncio.Task):
+            tasks.discard(task)
+            slots.release()
+
+        try:
+            while not self.stopped:
+                self.wakeup.clear()
+                timeout = None
+                if self.schedule:
+                    due, channel_id = self.schedule[0]
+                    timeout = due - time.monotonic()
+                    if timeout <= 0:
+                        heapq.heappop(self.schedule)
+                        state = self.channels.get(channel_id)
+                        if state is None or state.due != due:
+                            continue
+                        await slots.acquire()
+                        task = asyncio.ensure_future(self._poll_scheduled(state))
+                        tasks.add(task)
+                        task.add_done_callback(done)
+                        continue
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.wakeup = None
+
+    def stop(self):
+        self.stopped = True
+        if self.wakeup is not None:
+            self.wakeup.set()
@@ -0,0 +1,260 @@
+import bisect
+import logging
+import random
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "Labels",
+    "Key",
+    "Metrics",
+    "Histogram",
+    "InMemoryMetrics",
+    "to_prometheus",
+    "PrometheusExporter",
+    "get_metrics",
+    "set_metrics",
+    "SampledLogger",
+]
+
+# Latency buckets in seconds, from a frame parse (~10us) to a slow API call.
+DEFAULT_BUCKETS = (
+    0.00001,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Labels = Tuple[Tuple[str, object], ...]
+Key = Tuple[str, Labels]
+
+
+class Metrics:
+    """What the library reports to: counters, gauges and histograms.
+
+    Names are plain strings (``chat_frames_total``), labels keyword
+    arguments. This base class drops everything and is the default, so
+    instrumentation costs a method call until :func:`set_metrics` installs
+    a real implementation such as :class:`InMemoryMetrics`.
+    """
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        pass
+
+    def set(self, name: str, value: float, **labels):
+        pass
+
+    def observe(self, name: str, value: float, **labels):
+        pass
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    # Sorted so keyword order at the call site does not split a series;
+    # values are converted when exported.
+    return tuple(sorted(labels.items()))
+
+
+class InMemoryMetrics(Metrics):
+    """Thread-safe metrics kept in memory, exportable with :func:`to_prometheus`."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counters: Dict[Key, float] = {}
+        self.gauges: Dict[Key, float] = {}
+        self.histograms: Dict[Key, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        with self.lock:
+            return self.counters.get((name, _labels(labels)), 0.0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self.lock:
+            return self.histograms.get((name, _labels(labels)))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _series_order(item) -> Tuple[str, str]:
+    name, labels = item[0]
+    return name, str(labels)
+
+
+def to_prometheus(metrics: InMemoryMetrics, prefix: str = "trovo_") -> str:
+    """Render ``metrics`` in the Prometheus text exposition format."""
+    lines: List[str] = []
+    with metrics.lock:
+        counters = list(metrics.counters.items())
+        gauges = list(metrics.gauges.items())
+        histograms = [
+            (key, (list(h.counts), h.sum, h.count))
+            for key, h in metrics.histograms.items()
+        ]
+    # Label values may be of any type; order series by their text.
+    counters.sort(key=_series_order)
+    gauges.sort(key=_series_order)
+    histograms.sort(key=_series_order)
+    typed = set()
+
+    def declare(name: str, kind: str):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in counters:
+        declare(prefix + name, "counter")
+        lines.append(f"{prefix}{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), value in gauges:
+        declare(prefix + name, "gauge")
+        lines.append(f"{prefix}{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), (counts, total, count) in histograms:
+        declare(prefix + name, "histogram")
+        cumulative = 0
+        for bound, bucket in zip(metrics.buckets + (float("inf"),), counts):
+            cumulative += bucket
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            bucket_labels = _format_labels(labels, (("le", le),))
+            lines.append(f"{prefix}{name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{prefix}{name}_sum{_format_labels(labels)} {total:g}")
+        lines.append(f"{prefix}{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """Serve :func:`to_prometheus` output over HTTP for a Prometheus scraper."""
+
+    def __init__(
+        self, metrics: InMemoryMetrics, host: str = "127.0.0.1", port: int = 9464
+    ):
+        # Imported here: http.server pulls in email and socketserver.
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        def do_GET(handler: BaseHTTPRequestHandler):
+            body = to_prometheus(metrics).encode()
+            handler.send_response(200)
+            handler.send_header("Content-Type", "text/plain; version=0.0.4")
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+
+        handler = type(
+            "Handler",
+            (BaseHTTPRequestHandler,),
+            {"do_GET": do_GET, "log_message": lambda *args: None},
+        )
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_metrics: Metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def set_metrics(metrics: Metrics):
+    """Install the process-wide metrics; clients created afterwards use it."""
+    global _metrics
+    _metrics = metrics
+
+
+class SampledLogger:
+    """Log only a ``rate`` fraction of the records, for per-frame logs."""
+
+    def __init__(self, logger: logging.Logger, rate: float = 0.0):
+        self.logger = logger
+        self.rate = rate
+
+    def log(self, level: int, msg: str, *args, **kwargs):
+        if self.rate and random.random() < self.rate:
+            self.logger.log(level, msg, *args, **kwargs)